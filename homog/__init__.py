@@ -10,3 +10,11 @@ __version__ = '0.1.14'
 from .homog import *
 from . import sym
 from . import quat
+from . import parallel
+from . import io
+from . import sample
+from . import grid
+from . import binning
+from . import spatial
+from . import pairs
+from . import validate
@@ -0,0 +1,225 @@
+"""benchmarks for the public homog functions
+
+run:      python -m homog.bench run -o results.json
+compare:  python -m homog.bench compare old.json new.json
+
+each case is timed for every size N, dtype and available backend ('numpy',
+'numba' serial gufuncs/kernels, 'parallel' prange kernels). Results are
+stored as JSON; compare flags cases whose time per call grew by more than
+the tolerance and exits nonzero if any did."""
+
+import sys
+import json
+import time
+import argparse
+import platform
+import numpy as np
+import homog
+from homog import quat, parallel
+
+_cases = []
+
+
+def case(name, backend, inputs):
+    """register func(*inputs(n, dtype)) as benchmark name/backend"""
+
+    def deco(func):
+        if func is not None:
+            _cases.append((name, backend, inputs, func))
+        return func
+
+    return deco
+
+
+def _numba_case(name, inputs, func):
+    case(name, 'numba', inputs)(func)
+
+
+def _parallel_case(name, inputs, func):
+    if parallel.default_backend() == 'numba':
+        case(name, 'parallel', inputs)(func)
+
+
+def xforms(n, dtype):
+    return homog.rand_xform(n, dtype=dtype),
+
+
+def two_xforms(n, dtype):
+    return homog.rand_xform(n, dtype=dtype), homog.rand_xform(n, dtype=dtype)
+
+
+def xforms_points(n, dtype):
+    return homog.rand_xform(n, dtype=dtype), homog.rand_point(n, dtype=dtype)
+
+
+def quats(n, dtype):
+    return quat.rand_quat(n, dtype=dtype),
+
+
+def two_quats(n, dtype):
+    return quat.rand_quat(n, dtype=dtype), quat.rand_quat(n, dtype=dtype)
+
+
+def axis_angle(n, dtype):
+    return (homog.rand_unit(n, dtype=dtype),
+            (np.random.rand(n) * np.pi).astype(dtype))
+
+
+def two_rays(n, dtype):
+    return homog.rand_ray(n, dtype=dtype), homog.rand_ray(n, dtype=dtype)
+
+
+def four_points(n, dtype):
+    return tuple(homog.rand_point(n, dtype=dtype) for i in range(4))
+
+
+def _register_cases():
+    hm = homog.homog
+    case('rot', 'numpy', axis_angle)(lambda a, t: hm.rot(a, t, degrees=False))
+    case('hrot', 'numpy', axis_angle)(
+        lambda a, t: hm.hrot(a, t, degrees=False))
+    case('hinv', 'numpy', xforms)(hm.hinv)
+    case('hinv_rigid', 'numpy', xforms)(hm.hinv_rigid)
+    case('hxform', 'numpy', xforms_points)(hm.hxform)
+    case('hcompose', 'numpy', two_xforms)(hm.hcompose)
+    case('hinv_compose', 'numpy', two_xforms)(hm.hinv_compose)
+    case('axis_angle_of', 'numpy', xforms)(hm.axis_angle_of)
+    case('angle_of', 'numpy', xforms)(hm.angle_of)
+    case('axis_ang_cen_of', 'numpy', xforms)(hm.axis_ang_cen_of)
+    case('intersect_planes', 'numpy', two_rays)(hm.intersect_planes)
+    case('line_line_distance', 'numpy', two_rays)(hm.line_line_distance)
+    case('dihedral', 'numpy', four_points)(hm.dihedral)
+    case('rot_to_quat', 'numpy', xforms)(quat.rot_to_quat)
+    case('quat_to_xform', 'numpy', quats)(quat.quat_to_xform)
+    case('quat_multiply', 'numpy', two_quats)(quat.quat_multiply)
+
+    _numba_case('hinv', xforms, hm.gu_hinv)
+    _numba_case('hxform', xforms_points, hm.gu_hxform)
+    _numba_case('hcompose', two_xforms, hm.gu_hcompose)
+    _numba_case('hinv_compose', two_xforms, hm.gu_hinv_compose)
+    _numba_case('axis_angle_of', xforms, hm.numba_axis_angle_of)
+    _numba_case('axis_ang_cen_of', xforms, hm.gu_axis_angle_cen)
+    _numba_case('rot_to_quat', xforms, quat.gu_rot_to_quat)
+    _numba_case('quat_multiply', two_quats, quat.gu_quat_multiply)
+    _numba_case('dihedral', four_points, hm.gu_dihedral)
+
+    _parallel_case('axis_angle_of', xforms, parallel.axis_angle_of)
+    _parallel_case('axis_ang_cen_of', xforms, parallel.axis_ang_cen_of)
+    _parallel_case('rot_to_quat', xforms, parallel.rot_to_quat)
+    _parallel_case('intersect_planes', two_rays, parallel.intersect_planes)
+    _parallel_case('line_line_distance', two_rays,
+                   parallel.line_line_distance)
+    _parallel_case('hxform', xforms_points, parallel.hxform)
+
+
+def timeit(func, args, min_time=0.2, repeat=3):
+    """best seconds per call over repeat batches of at least min_time"""
+    func(*args)  # warm up, includes any jit compilation
+    number, elapsed = 1, 0
+    while True:
+        t = time.perf_counter()
+        for i in range(number):
+            func(*args)
+        elapsed = time.perf_counter() - t
+        if elapsed >= min_time / repeat: break
+        number *= 10
+    best = elapsed / number
+    for r in range(repeat - 1):
+        t = time.perf_counter()
+        for i in range(number):
+            func(*args)
+        best = min(best, (time.perf_counter() - t) / number)
+    return best
+
+
+def run(sizes=tuple(10**k for k in range(8)), dtypes=('f4', 'f8'),
+        names=None, backends=None, min_time=0.2, verbose=True):
+    if not _cases: _register_cases()
+    results = list()
+    for name, backend, inputs, func in _cases:
+        if names and name not in names: continue
+        if backends and backend not in backends: continue
+        for dtype in dtypes:
+            for n in sizes:
+                np.random.seed(0)
+                args = inputs(n, np.dtype(dtype))
+                sec = timeit(func, args, min_time=min_time)
+                results.append(
+                    dict(name=name, backend=backend, dtype=dtype, n=n,
+                         seconds=sec, ns_per_element=sec / n * 1e9))
+                if verbose:
+                    print('%-20s %-8s %s n=%-9i %12.3f ns/elem' %
+                          (name, backend, dtype, n, sec / n * 1e9))
+    return dict(meta=_meta(), results=results)
+
+
+def _meta():
+    try:
+        import numba
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+    return dict(homog=homog.__version__, numpy=np.__version__,
+                numba=numba_version, python=platform.python_version(),
+                machine=platform.machine(), processor=platform.processor(),
+                nthreads=parallel.get_num_threads(), time=time.time())
+
+
+def compare(old, new, tolerance=0.1):
+    """returns [(key, old_sec, new_sec, ratio, is_regression)] for cases in
+    both result dicts; regression if new is > (1 + tolerance) times slower"""
+    key = lambda r: (r['name'], r['backend'], r['dtype'], r['n'])
+    oldres = {key(r): r['seconds'] for r in old['results']}
+    report = list()
+    for r in new['results']:
+        k = key(r)
+        if k not in oldres: continue
+        ratio = r['seconds'] / oldres[k]
+        report.append((k, oldres[k], r['seconds'], ratio,
+                       ratio > 1 + tolerance))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m homog.bench')
+    sub = parser.add_subparsers(dest='command')
+    prun = sub.add_parser('run', help='run benchmarks, write json')
+    prun.add_argument('-o', '--output', default='homog_bench.json')
+    prun.add_argument('--sizes', type=int, nargs='+',
+                      default=[10**k for k in range(8)])
+    prun.add_argument('--dtypes', nargs='+', default=['f4', 'f8'])
+    prun.add_argument('--names', nargs='+')
+    prun.add_argument('--backends', nargs='+',
+                      choices=['numpy', 'numba', 'parallel'])
+    prun.add_argument('--min-time', type=float, default=0.2)
+    pcmp = sub.add_parser('compare', help='flag regressions between runs')
+    pcmp.add_argument('old')
+    pcmp.add_argument('new')
+    pcmp.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        res = run(args.sizes, args.dtypes, args.names, args.backends,
+                  args.min_time)
+        with open(args.output, 'w') as out:
+            json.dump(res, out, indent=1)
+        return 0
+    if args.command == 'compare':
+        with open(args.old) as inp:
+            old = json.load(inp)
+        with open(args.new) as inp:
+            new = json.load(inp)
+        report = compare(old, new, args.tolerance)
+        for (name, backend, dtype, n), o, nw, ratio, bad in report:
+            print('%-20s %-8s %s n=%-9i %10.3g -> %10.3g %6.2fx %s' %
+                  (name, backend, dtype, n, o, nw, ratio,
+                   'REGRESSION' if bad else ''))
+        nbad = sum(r[-1] for r in report)
+        print('%i of %i cases regressed' % (nbad, len(report)))
+        return 1 if nbad else 0
+    parser.print_help()
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
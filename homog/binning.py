@@ -0,0 +1,159 @@
+"""SE(3) binning: rigid xforms to int64 hash keys and back
+
+orientations are binned on the faces of the hypercube around the quaternion
+sphere: face f is the component of largest magnitude, and the other three
+components divided by it, each in [-1, 1], are binned into nside cells.
+Dividing by the largest component also identifies q and -q. Translations
+are binned on a cubic lattice of spacing cart_resl centered on the origin.
+
+key bits, most significant first (63 used, keys are nonnegative):
+
+    face (2) | 3 x orientation cell (ori_bits) | 3 x cartesian cell (cart_bits)
+
+translations beyond cart_bound in any coordinate get key -1."""
+
+import numpy as np
+from homog import quat
+from homog.util import jit, guvec, float32, float64, int64
+
+_face_others = np.array([[1, 2, 3], [0, 2, 3], [0, 1, 3], [0, 1, 2]])
+
+
+class XformBinner:
+    """maps (..., 4, 4) xforms to int64 keys of cells ~cart_resl wide and
+    ~ori_resl degrees across (at the face centers) and back to cell centers
+
+    >>> binner = XformBinner(cart_resl=1, ori_resl=15)
+    >>> keys = binner.key(xforms)
+    >>> near = binner.neighbor_keys(keys)  # (..., 729) keys within 1 cell"""
+
+    def __init__(self, cart_resl=1.0, ori_resl=15.0):
+        self.cart_resl, self.ori_resl = float(cart_resl), float(ori_resl)
+        # quat arc is half the rotation angle, face width is 2
+        self.nside = max(1, int(np.ceil(4 / np.radians(ori_resl))))
+        self.ori_bits = max(1, int(np.ceil(np.log2(self.nside))))
+        self.cart_bits = (61 - 3 * self.ori_bits) // 3
+        if self.cart_bits < 2:
+            raise ValueError('ori_resl too fine to fit in 63 bits')
+        self.cart_bound = 2**(self.cart_bits - 1) * self.cart_resl
+
+    def __repr__(self):
+        return 'XformBinner(cart_resl=%g, ori_resl=%g)' % (self.cart_resl,
+                                                           self.ori_resl)
+
+    def key(self, xforms, use_numba='auto'):
+        """int64 key of the bin of each xform, -1 if out of bounds"""
+        xforms = np.asarray(xforms)
+        if use_numba == 'auto': use_numba = gu_xform_key is not None
+        if use_numba:
+            if xforms.dtype not in (np.float32, np.float64):
+                xforms = xforms.astype('f8')
+            return gu_xform_key(xforms, self.cart_resl, self.nside,
+                                self.ori_bits, self.cart_bits)
+        face, oi = self._ori_cells(quat.rot_to_quat(xforms))
+        ci = np.floor(xforms[..., :3, 3] / self.cart_resl)
+        ci = ci.astype('i8') + 2**(self.cart_bits - 1)
+        key = self._ori_key(face, oi) << 3 * self.cart_bits
+        key |= self._cart_key(ci)
+        valid = np.all((0 <= ci) & (ci < 2**self.cart_bits), axis=-1)
+        return np.where(valid, key, -1)
+
+    def split_key(self, keys):
+        """(face, (..., 3) orientation cells, (..., 3) cartesian cells)"""
+        keys = np.asarray(keys, dtype='i8')
+        cb, ob = self.cart_bits, self.ori_bits
+        ci = np.stack([keys >> cb * (2 - i) & (2**cb - 1) for i in range(3)],
+                      axis=-1)
+        keys = keys >> 3 * cb
+        oi = np.stack([keys >> ob * (2 - i) & (2**ob - 1) for i in range(3)],
+                      axis=-1)
+        return keys >> 3 * ob, oi, ci
+
+    def center(self, keys, dtype='f8'):
+        """(..., 4, 4) xforms at the centers of the bins"""
+        face, oi, ci = self.split_key(keys)
+        return self._xforms(face, (oi + 0.5) * 2 / self.nside - 1,
+                            (ci - 2**(self.cart_bits - 1) + 0.5), dtype)
+
+    def neighbor_keys(self, keys, radius=1):
+        """(..., (2 radius + 1)**6) keys of the bins within radius cells of
+        each key in all six dimensions, including the key itself. Cells past
+        a face edge are mapped onto the neighboring face, so rows may
+        contain duplicate keys (and -1 past cart_bound)"""
+        keys = np.asarray(keys, dtype='i8')
+        face, oi, ci = self.split_key(keys)
+        d = np.arange(-radius, radius + 1)
+        delta = np.stack(np.meshgrid(d, d, d, indexing='ij'), axis=-1)
+        delta = delta.reshape(-1, 3)
+        # only the (2 radius + 1)**3 orientation cells need projecting back
+        # onto the hypercube, the cartesian cells are plain key arithmetic
+        c = (oi[..., None, :] + delta + 0.5) * 2 / self.nside - 1
+        q = np.empty(c.shape[:-1] + (4, ))
+        np.put_along_axis(q, face[..., None, None], 1, axis=-1)
+        np.put_along_axis(q, _face_others[face][..., None, :], c, axis=-1)
+        ori = self._ori_key(*self._ori_cells(q))
+        ci = ci[..., None, :] + delta
+        valid = np.all((0 <= ci) & (ci < 2**self.cart_bits), axis=-1)
+        near = (ori[..., :, None] << 3 * self.cart_bits |
+                self._cart_key(ci)[..., None, :])
+        near = np.where(valid[..., None, :], near, -1)
+        return near.reshape(keys.shape + (len(delta)**2, ))
+
+    def _ori_cells(self, q):
+        # face and orientation cells of (..., 4) quats, any norm or sign
+        face = np.argmax(np.abs(q), axis=-1)
+        qf = np.take_along_axis(q, face[..., None], axis=-1)
+        c = np.take_along_axis(q / qf, _face_others[face], axis=-1)
+        oi = np.clip(np.floor((c + 1) * self.nside / 2), 0, self.nside - 1)
+        return face, oi.astype('i8')
+
+    def _ori_key(self, face, oi):
+        key = face.astype('i8')
+        for i in range(3):
+            key = key << self.ori_bits | oi[..., i]
+        return key
+
+    def _cart_key(self, ci):
+        key = ci[..., 0]
+        for i in range(1, 3):
+            key = key << self.cart_bits | ci[..., i]
+        return key
+
+    def _xforms(self, face, c, t, dtype):
+        # inverse of the face projection, c may extend past the face
+        q = np.empty(c.shape[:-1] + (4, ))
+        np.put_along_axis(q, face[..., None], 1, axis=-1)
+        np.put_along_axis(q, _face_others[face], c, axis=-1)
+        q /= np.linalg.norm(q, axis=-1)[..., None]
+        x = quat.quat_to_xform(q, dtype=dtype)
+        x[..., :3, 3] = t * self.cart_resl
+        return x
+
+
+@jit
+def kernel_xform_key(xform, cart_resl, nside, ori_bits, cart_bits, key):
+    q0, q1, q2, q3 = quat.scalar_rot_to_quat(xform)
+    face, qf = 0, q0
+    if abs(q1) > abs(qf): face, qf = 1, q1
+    if abs(q2) > abs(qf): face, qf = 2, q2
+    if abs(q3) > abs(qf): face, qf = 3, q3
+    k = face
+    for i in range(4):
+        if i == face: continue
+        qi = q0 if i == 0 else q1 if i == 1 else q2 if i == 2 else q3
+        cell = int(np.floor((qi / qf + 1) * nside / 2))
+        k = k << ori_bits | min(max(cell, 0), nside - 1)
+    half = 2**(cart_bits - 1)
+    for i in range(3):
+        cell = int(np.floor(xform[i, 3] / cart_resl)) + half
+        if cell < 0 or cell >= 2 * half:
+            key[0] = -1
+            return
+        k = k << cart_bits | cell
+    key[0] = k
+
+
+gu_xform_key = guvec([
+    (float64[:, :], float64, int64, int64, int64, int64[:]),
+    (float32[:, :], float64, int64, int64, int64, int64[:]),
+], '(n,m),(),(),(),()->()', kernel_xform_key)
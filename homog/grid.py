@@ -0,0 +1,223 @@
+"""deterministic near-uniform SO(3) grids from the hopf fibration
+
+a rotation is a point on the base sphere S2 (theta, phi) and an angle psi on
+the fiber S1, as in yershova et al. 2010 'generating uniform incremental
+grids on SO(3) using the hopf fibration':
+
+    q = (cos(theta/2) cos(psi/2), cos(theta/2) sin(psi/2),
+         sin(theta/2) cos(phi + psi/2), sin(theta/2) sin(phi + psi/2))
+
+S2 is covered by equal area latitude rings of spacing ~resolution, S1 by
+psi in [0, 2pi) at the same spacing, ~8 pi^2 / resolution^3 rotations in
+all. Grid index is s2_index * n_psi + psi_index, s2 points numbered ring by
+ring. The ring structure gives O(1) nearest lookup, comparing only 8
+candidate grid points per rotation.
+
+grids are cached in memory and as .npy files in grid_cache_dir, set by
+HOMOG_GRID_CACHE (default ~/.cache/homog/grids, '' disables)."""
+
+import os
+import functools
+import numpy as np
+from homog import quat
+from homog.util import jit, guvec, float32, float64, int64
+
+grid_cache_dir = os.environ.get(
+    'HOMOG_GRID_CACHE', os.path.join('~', '.cache', 'homog', 'grids'))
+
+
+def hopf_grid_params(resolution, degrees=True):
+    """(ring_offset, ring_nphi, n_psi) for a grid of the given spacing"""
+    if degrees: resolution = np.radians(resolution)
+    if not 0 < resolution <= np.pi:
+        raise ValueError('resolution must be in (0, 180] degrees')
+    n_rings = int(np.ceil(np.pi / resolution))
+    dtheta = np.pi / n_rings
+    theta = (np.arange(n_rings) + 0.5) * dtheta
+    ring_nphi = np.maximum(1, np.round(2 * np.pi * np.sin(theta) / dtheta))
+    ring_nphi = ring_nphi.astype('i8')
+    ring_offset = np.concatenate([[0], np.cumsum(ring_nphi)[:-1]])
+    n_psi = int(np.ceil(2 * np.pi / resolution))
+    return ring_offset, ring_nphi, n_psi
+
+
+def so3_grid(resolution, dtype='f8', degrees=True):
+    """(n, 4) unit quats of the hopf grid, read-only and cached"""
+    if not degrees: resolution = np.degrees(resolution)
+    return _so3_grid(float(resolution), np.dtype(dtype).str)
+
+
+def so3_grid_xforms(resolution, dtype='f8', degrees=True):
+    return quat.quat_to_xform(so3_grid(resolution, dtype, degrees))
+
+
+def _cache_path(resolution, dtype):
+    if not grid_cache_dir: return None
+    name = 'so3_hopf_%.9gdeg_%s.npy' % (resolution, np.dtype(dtype).name)
+    return os.path.join(os.path.expanduser(grid_cache_dir), name)
+
+
+@functools.lru_cache(maxsize=None)
+def _so3_grid(resolution, dtype):
+    path = _cache_path(resolution, dtype)
+    if path and os.path.exists(path):
+        q = np.load(path)
+    else:
+        q = _hopf_quats(*hopf_grid_params(resolution)).astype(dtype)
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = '%s.%i.tmp.npy' % (path[:-4], os.getpid())
+                np.save(tmp, q)
+                os.replace(tmp, path)  # atomic, safe with parallel writers
+            except OSError:
+                pass  # read-only cache dir, just don't persist
+    q.flags.writeable = False
+    return q
+
+
+def _hopf_quats(ring_offset, ring_nphi, n_psi):
+    dtheta = np.pi / len(ring_nphi)
+    ring = np.repeat(np.arange(len(ring_nphi)), ring_nphi)
+    theta = (ring + 0.5) * dtheta
+    phi = (np.arange(len(ring)) - ring_offset[ring] + 0.5)
+    phi *= 2 * np.pi / ring_nphi[ring]
+    psi = (np.arange(n_psi) + 0.5) * 2 * np.pi / n_psi
+    theta, phi, psi = theta[:, None], phi[:, None], psi[None]
+    q = np.empty((len(ring), n_psi, 4))
+    q[..., 0] = np.cos(theta / 2) * np.cos(psi / 2)
+    q[..., 1] = np.cos(theta / 2) * np.sin(psi / 2)
+    q[..., 2] = np.sin(theta / 2) * np.cos(phi + psi / 2)
+    q[..., 3] = np.sin(theta / 2) * np.sin(phi + psi / 2)
+    return q.reshape(-1, 4)
+
+
+def _hopf_candidates(q, ring_offset, ring_nphi, n_psi):
+    """(..., 8) grid indices around each quat in q, including the nearest
+    except on very coarse (~90 degree) grids. With a = theta / 2 and
+    chi = phi + psi / 2, for a grid point g
+
+        q . g = cos(a) cos(a_g) cos((psi - psi_g) / 2) +
+                sin(a) sin(a_g) cos(chi - phi_g - psi_g / 2)
+
+    a sinusoid in psi_g / 2, so for each S2 point (the two rings and two
+    phis around q) the best psi_g has a closed form, checked on both sides"""
+    w, x, y, z = np.moveaxis(q, -1, 0)
+    a = np.arctan2(np.hypot(y, z), np.hypot(w, x))
+    chi, halfpsi = np.arctan2(z, y), np.arctan2(x, w)
+    phi = np.mod(chi - halfpsi, 2 * np.pi)
+    n_rings = len(ring_nphi)
+    dtheta, dpsi = np.pi / n_rings, 2 * np.pi / n_psi
+    r0 = np.floor(2 * a / dtheta - 0.5).astype('i8')
+    cand = list()
+    for r in (r0, r0 + 1):
+        r = np.clip(r, 0, n_rings - 1)
+        nphi = ring_nphi[r]
+        ag = (r + 0.5) * dtheta / 2
+        cosw, sinw = np.cos(a) * np.cos(ag), np.sin(a) * np.sin(ag)
+        p0 = np.floor(phi * nphi / (2 * np.pi) - 0.5).astype('i8')
+        for p in (p0, p0 + 1):
+            p = np.mod(p, nphi)
+            phig = (p + 0.5) * 2 * np.pi / nphi
+            u = cosw * np.cos(halfpsi) + sinw * np.cos(chi - phig)
+            v = cosw * np.sin(halfpsi) + sinw * np.sin(chi - phig)
+            k0 = np.floor(2 * np.arctan2(v, u) / dpsi - 0.5).astype('i8')
+            for k in (k0, k0 + 1):
+                # k outside [0, n_psi) wraps to -g, the same rotation
+                cand.append((ring_offset[r] + p) * n_psi + np.mod(k, n_psi))
+    return np.stack(cand, axis=-1)
+
+
+class SO3Grid:
+    """hopf grid with O(1) nearest grid point lookup for rotations"""
+
+    def __init__(self, resolution, dtype='f8', degrees=True):
+        self.resolution = resolution if degrees else np.degrees(resolution)
+        self.quats = so3_grid(self.resolution, dtype)
+        self.ring_offset, self.ring_nphi, self.n_psi = hopf_grid_params(
+            self.resolution)
+
+    def __len__(self):
+        return len(self.quats)
+
+    def xforms(self, idx=slice(None)):
+        return quat.quat_to_xform(self.quats[idx])
+
+    def nearest(self, xforms, quats=False, use_numba='auto',
+                chunksize=2**16):
+        """(grid index, rotational distance in radians) for each xform or
+        3x3 rotation, or for each (..., 4) quat if quats"""
+        xforms = np.asarray(xforms)
+        q = xforms if quats else quat.rot_to_quat(xforms)
+        q = q.astype(self.quats.dtype, copy=False)
+        if use_numba == 'auto': use_numba = gu_hopf_nearest is not None
+        if use_numba:
+            idx, maxdot = gu_hopf_nearest(q, self.quats, self.ring_offset,
+                                          self.ring_nphi, self.n_psi)
+        else:
+            shape, q = q.shape[:-1], q.reshape(-1, 4)
+            idx = np.empty(len(q), dtype='i8')
+            maxdot = np.empty(len(q), dtype=q.dtype)
+            for lb in range(0, len(q), chunksize):
+                qc = q[lb:lb + chunksize]
+                cand = _hopf_candidates(qc, self.ring_offset, self.ring_nphi,
+                                        self.n_psi)
+                dots = np.abs(np.sum(self.quats[cand] * qc[:, None], axis=-1))
+                best = np.argmax(dots, axis=-1)
+                rows = np.arange(len(qc))
+                idx[lb:lb + chunksize] = cand[rows, best]
+                maxdot[lb:lb + chunksize] = dots[rows, best]
+            idx, maxdot = idx.reshape(shape), maxdot.reshape(shape)
+        return idx, 2 * np.arccos(np.clip(maxdot, -1, 1))
+
+
+@functools.lru_cache(maxsize=None)
+def grid_index(resolution, dtype='f8'):
+    """cached SO3Grid, resolution in degrees"""
+    return SO3Grid(resolution, dtype)
+
+
+def nearest_grid_index(xforms, resolution, dtype='f8', **kw):
+    return grid_index(resolution, dtype).nearest(xforms, **kw)
+
+
+@jit
+def kernel_hopf_nearest(q, gquats, ring_offset, ring_nphi, n_psi, idx,
+                        maxdot):
+    w, x, y, z = q[0], q[1], q[2], q[3]
+    twopi = 2 * np.pi
+    a = np.arctan2(np.sqrt(y * y + z * z), np.sqrt(w * w + x * x))
+    chi, halfpsi = np.arctan2(z, y), np.arctan2(x, w)
+    phi = (chi - halfpsi) % twopi
+    n_rings = len(ring_nphi)
+    dtheta, dpsi = np.pi / n_rings, twopi / n_psi
+    r0 = int(np.floor(2 * a / dtheta - 0.5))
+    best, ibest = -1.0, 0
+    for r in range(r0, r0 + 2):
+        r = min(max(r, 0), n_rings - 1)
+        nphi = ring_nphi[r]
+        ag = (r + 0.5) * dtheta / 2
+        cosw, sinw = np.cos(a) * np.cos(ag), np.sin(a) * np.sin(ag)
+        p0 = int(np.floor(phi * nphi / twopi - 0.5))
+        for p in range(p0, p0 + 2):
+            p = p % nphi
+            phig = (p + 0.5) * twopi / nphi
+            u = cosw * np.cos(halfpsi) + sinw * np.cos(chi - phig)
+            v = cosw * np.sin(halfpsi) + sinw * np.sin(chi - phig)
+            k0 = int(np.floor(2 * np.arctan2(v, u) / dpsi - 0.5))
+            for k in range(k0, k0 + 2):
+                i = (ring_offset[r] + p) * n_psi + k % n_psi
+                g = gquats[i]
+                dot = abs(w * g[0] + x * g[1] + y * g[2] + z * g[3])
+                if dot > best:
+                    best, ibest = dot, i
+    idx[0] = ibest
+    maxdot[0] = best
+
+
+gu_hopf_nearest = guvec([
+    (float64[:], float64[:, :], int64[:], int64[:], int64, int64[:],
+     float64[:]),
+    (float32[:], float32[:, :], int64[:], int64[:], int64, int64[:],
+     float32[:]),
+], '(n),(m,n),(r),(r),()->(),()', kernel_hopf_nearest)
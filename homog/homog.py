@@ -1,10 +1,11 @@
 import numpy as np
 from . import quat
-from homog.util import jit, guvec, float32, float64
+from homog.util import (jit, guvec, float32, float64, int64, resolve_dtype,
+                        as_rng)
 
 
-def h_rand_points(shape=(1, )):
-    pts = np.ones(shape + (4, ))
+def h_rand_points(shape=(1, ), dtype=None):
+    pts = np.ones(shape + (4, ), dtype=resolve_dtype(dtype))
     pts[..., 0] = np.random.randn(*shape)
     pts[..., 1] = np.random.randn(*shape)
     pts[..., 2] = np.random.randn(*shape)
@@ -28,17 +29,100 @@ def fast_axis_of(xforms):
     return np.stack(
         (xforms[..., 2, 1] - xforms[..., 1, 2],
          xforms[..., 0, 2] - xforms[..., 2, 0],
-         xforms[..., 1, 0] - xforms[..., 0, 1], np.zeros(xforms.shape[:-2])),
+         xforms[..., 1, 0] - xforms[..., 0, 1],
+         np.zeros(xforms.shape[:-2], dtype=xforms.dtype)),
         axis=-1)
 
 
-def is_homog_xform(xforms):
-    return ((xforms.shape[-2:] == (4, 4))
-            and (np.allclose(1, np.linalg.det(xforms[..., :3, :3])))
-            and (np.allclose(xforms[..., 3, :], [0, 0, 0, 1])))
-
-
-def hinv(xforms):
+def is_homog_xform(xforms, atol=1e-5):
+    """True if all (..., 4, 4) xforms are rigid within atol, see xform_error.
+    homog.validate.check_xforms reports per xform and can sample"""
+    xforms = np.asarray(xforms)
+    return (xforms.shape[-2:] == (4, 4)
+            and bool(np.all(xform_error(xforms) <= atol)))
+
+
+def xform_error(xforms, use_numba='auto'):
+    """largest deviation of (..., 4, 4) or (..., 3, 4) xforms from rigid:
+    max abs entry of R^T R - I, |det R - 1| and the bottom row's deviation
+    from (0, 0, 0, 1). float inputs go through gu_xform_error when numba is
+    available"""
+    xforms = np.asarray(xforms)
+    if not np.issubdtype(xforms.dtype, np.floating):
+        xforms = xforms.astype('f8')
+    if use_numba == 'auto': use_numba = gu_xform_error is not None
+    if use_numba: return gu_xform_error(xforms)
+    rot = xforms[..., :3, :3]
+    rtr = np.matmul(rot.swapaxes(-1, -2), rot)
+    rtr[..., [0, 1, 2], [0, 1, 2]] -= 1
+    err = np.max(np.abs(rtr), axis=(-1, -2))
+    det = np.sum(rot[..., 0] * np.cross(rot[..., 1], rot[..., 2]), axis=-1)
+    err = np.maximum(err, np.abs(det - 1))
+    if xforms.shape[-2] == 4:
+        bottom = np.abs(xforms[..., 3, :] - [0, 0, 0, 1])
+        err = np.maximum(err, np.max(bottom, axis=-1))
+    return err
+
+
+def xform_layout(xforms):
+    """'x44', 'x34' (compact 3x4 affine) or 'qt' (quat + translation, 7)"""
+    shape = np.shape(xforms)
+    if shape[-2:] == (4, 4): return 'x44'
+    if shape[-2:] == (3, 4): return 'x34'
+    if shape[-1:] == (7, ): return 'qt'
+    raise ValueError('not an xform layout: ' + str(shape))
+
+
+def hcompact(xforms, layout='x34'):
+    """compact form of (..., 4, 4) xforms
+
+    'x34' is a zero-copy (..., 3, 4) view, 'qt' is (..., 7) quaternion +
+    translation via rot_to_quat. hinv/hinv_rigid, hxform, hcompose and
+    hinv_compose accept compact xforms directly and return the same layout"""
+    xforms = np.asarray(xforms)
+    current = xform_layout(xforms)
+    if current == layout: return xforms
+    if layout == 'x34' and current == 'x44': return xforms[..., :3, :]
+    if layout == 'qt': return quat.xform_to_qt(xforms)
+    if layout == 'x34': return quat.qt_to_xform(xforms, shape=(3, 4))
+    if layout == 'x44': return hexpand(xforms)
+    raise ValueError('unknown layout: ' + str(layout))
+
+
+def hexpand(xforms, out=None):
+    """(..., 4, 4) xforms from any layout accepted by xform_layout"""
+    xforms = np.asarray(xforms)
+    layout = xform_layout(xforms)
+    if layout == 'x44' and out is None: return xforms
+    if layout == 'qt':
+        xforms = quat.qt_to_xform(xforms)
+        if out is None: return xforms
+    if out is None:
+        out = np.empty(xforms.shape[:-2] + (4, 4), dtype=xforms.dtype)
+    out[..., :3, :] = xforms[..., :3, :]
+    out[..., 3, :3] = 0
+    out[..., 3, 3] = 1
+    return out
+
+
+def _out_rows(*xforms):
+    return 4 if any(x.shape[-2] == 4 for x in xforms) else 3
+
+
+def _check_idx(idx, n):
+    """the numba kernels index without bounds checks, negatives included"""
+    if idx.size and (idx.min() < 0 or idx.max() >= n):
+        raise IndexError('indices out of range [0, %i)' % n)
+
+
+def _both_qt(a, b):
+    la, lb = xform_layout(a), xform_layout(b)
+    if (la == 'qt') != (lb == 'qt'):
+        raise ValueError('cannot mix qt and matrix layouts')
+    return la == 'qt'
+
+
+def hinv(xforms, check=8):
     """Invert a homogenous transform.
 
     Note:
@@ -52,35 +136,126 @@ def hinv(xforms):
         -         -      -                      -
 
     Args:
-        xf (np.array): A homogenous transform. Shape must be (4, 4)
+        xf (np.array): A homogenous transform. Shape must be (..., 4, 4)
+        check (int or bool): how many evenly spaced xforms to test with
+            is_homog_xform before taking the rigid fast path. True tests all
+            of them, False/0 trusts the input. If the check fails, falls back
+            to np.linalg.inv
 
     Returns:
         np.array: The inverted homogenous transform. Multiplying this by xf
             is I_4
     """
-    # TODO: is there a fast, smart way to ensure the input is a homogenous
-    # transform?
-    return np.linalg.inv(xforms)
-    # assert is_homog_xform(xforms)
-    # inv = np.empty_like(xforms)
-    # # invert the coordinate frame
-    # inv[..., :3, :3] = xforms[..., :3, :3].swapaxes(-1, -2)
-    # # set the last row to be[0 0 0 1]
-    # inv[..., 3, :] = xforms[..., 3, :]
-    # # calculate the translation
-    # newt = -inv[..., :3, :3] @ xforms[..., :3, 3, None]
-    # inv[..., :3, 3] = newt.squeeze()
-    # return inv
-
-
-def axis_angle_of(xforms):
-    axis = fast_axis_of(xforms)
-    four_sin2 = np.sum(axis**2, axis=-1)
-    axis = axis / np.linalg.norm(axis, axis=-1)[..., np.newaxis]
-    sin_angl = np.clip(np.sqrt(four_sin2 / 4), -1, 1)
-    cos_angl = np.clip(np.trace(xforms, axis1=-1, axis2=-2) / 2 - 1, -1, 1)
-    angl = np.arctan2(sin_angl, cos_angl)
-    return axis, angl
+    xforms = np.asarray(xforms)
+    if xform_layout(xforms) != 'x44':
+        return hinv_rigid(xforms)  # compact layouts are rigid by design
+    if check is True:
+        rigid = is_homog_xform(xforms)
+    elif check:
+        flat = xforms.reshape(-1, *xforms.shape[-2:])
+        idx = np.linspace(0, len(flat) - 1, min(check, len(flat))).astype('i8')
+        rigid = is_homog_xform(flat[idx])
+    else:
+        rigid = True
+    if not rigid:
+        return np.linalg.inv(xforms)
+    return hinv_rigid(xforms)
+
+
+def hinv_rigid(xforms, out=None):
+    """inverse of rigid xforms via (R^T, -R^T t), no validity check"""
+    xforms = np.asarray(xforms)
+    if xform_layout(xforms) == 'qt': return quat.qt_inv(xforms, out)
+    if out is None:
+        out = np.empty(xforms.shape, dtype=xforms.dtype)
+    rot, trans = xforms[..., :3, :3], xforms[..., :3, 3]
+    # R^T t without a matmul temporary per row, computed before out is
+    # written in case out is xforms
+    newt = -(rot[..., 0, :] * trans[..., 0, None] +
+             rot[..., 1, :] * trans[..., 1, None] +
+             rot[..., 2, :] * trans[..., 2, None])
+    out[..., :3, :3] = rot.swapaxes(-1, -2)
+    out[..., :3, 3] = newt
+    if out.shape[-2] == 4:
+        out[..., 3, :3] = 0
+        out[..., 3, 3] = 1
+    return out
+
+
+def hxform(xforms, pts, out=None):
+    """apply xforms to (..., 4) points/vectors using only the 3x4 part"""
+    xforms = np.asarray(xforms)
+    if xform_layout(xforms) == 'qt': return quat.qt_xform(xforms, pts, out)
+    pts = hpoint(pts)
+    shape = np.broadcast(xforms[..., 0, 0], pts[..., 0]).shape
+    if out is None:
+        out = np.empty(shape + (4, ), dtype=np.result_type(xforms, pts))
+    w = pts[..., 3].copy() if np.may_share_memory(out, pts) else pts[..., 3]
+    np.matmul(xforms[..., :3, :], pts[..., None], out=out[..., :3, None])
+    out[..., 3] = w
+    return out
+
+
+def hcompose(a, b, out=None):
+    """a @ b for homogenous xforms, skipping the constant bottom row"""
+    a, b = np.asarray(a), np.asarray(b)
+    if _both_qt(a, b): return quat.qt_compose(a, b, out)
+    shape = np.broadcast(a[..., 0, 0], b[..., 0, 0]).shape
+    if out is None:
+        out = np.empty(shape + (_out_rows(a, b), 4),
+                       dtype=np.result_type(a, b))
+    ta = a[..., :3, 3]
+    if np.may_share_memory(out, a): ta = ta.copy()
+    np.matmul(a[..., :3, :3], b[..., :3, :], out=out[..., :3, :])
+    out[..., :3, 3] += ta
+    if out.shape[-2] == 4:
+        out[..., 3, :3] = 0
+        out[..., 3, 3] = 1
+    return out
+
+
+def hinv_compose(a, b, out=None):
+    """hinv(a) @ b for rigid a without forming hinv(a)"""
+    a, b = np.asarray(a), np.asarray(b)
+    if _both_qt(a, b): return quat.qt_compose(quat.qt_inv(a), b, out)
+    shape = np.broadcast(a[..., 0, 0], b[..., 0, 0]).shape
+    if out is None:
+        out = np.empty(shape + (_out_rows(a, b), 4),
+                       dtype=np.result_type(a, b))
+    rinv = a[..., :3, :3].swapaxes(-1, -2)
+    rinv_ta = np.matmul(rinv, a[..., :3, 3, None])
+    np.matmul(rinv, b[..., :3, :], out=out[..., :3, :])
+    out[..., :3, 3] -= rinv_ta[..., 0]
+    if out.shape[-2] == 4:
+        out[..., 3, :3] = 0
+        out[..., 3, 3] = 1
+    return out
+
+
+def axis_angle_of(xforms, use_numba='auto'):
+    """unit axis (..., 4) and angle in [0, pi] of the rotations of
+    (..., 4, 4), (..., 3, 4) or (..., 3, 3) xforms
+
+    goes through the quat q = (cos(a/2), sin(a/2) axis) of rot_to_quat, so
+    both are accurate near 0 and pi, where the antisymmetric part of R
+    vanishes. Unlike earlier versions, which returned a nan axis, the axis
+    of an identity rotation is x. float (..., 4)-wide inputs go through
+    gu_axis_angle when numba is available"""
+    xforms = np.asarray(xforms)
+    if use_numba == 'auto':
+        use_numba = (gu_axis_angle is not None
+                     and xforms.dtype in (np.float32, np.float64))
+    # the gufunc's axis output is as wide as the xforms
+    if use_numba and xforms.shape[-1] == 4: return gu_axis_angle(xforms)
+    q = quat.rot_to_quat(xforms)
+    norm = np.linalg.norm(q[..., 1:], axis=-1)
+    angl = 2 * np.arctan2(norm, q[..., 0])
+    # q becomes the axis in place, v / |v| is 0 only for the identity
+    scale = 1 / np.maximum(norm, np.finfo(q.dtype).tiny)
+    q[..., :3] = q[..., 1:] * scale[..., None]
+    q[..., 0] += norm == 0
+    q[..., 3] = 0
+    return q, angl
 
 
 def angle_of(xforms):
@@ -92,10 +267,12 @@ def angle_of(xforms):
     return angl
 
 
-def rot(axis, angle, degrees='auto', dtype='f8', shape=(3, 3)):
+def rot(axis, angle, degrees='auto', dtype=None, shape=(3, 3)):
+    axis, angle = np.asarray(axis), np.asarray(angle)
+    dtype = resolve_dtype(dtype, axis, angle)
     axis = np.array(axis, dtype=dtype)
     angle = np.array(angle, dtype=dtype)
-    if degrees is 'auto': degrees = guess_is_degrees(angle)
+    if degrees == 'auto': degrees = guess_is_degrees(angle)
     angle = angle * np.pi / 180.0 if degrees else angle
     if axis.shape and angle.shape and not is_broadcastable(
             axis.shape[:-1], angle.shape):
@@ -121,7 +298,9 @@ def rot(axis, angle, degrees='auto', dtype='f8', shape=(3, 3)):
     return rot3
 
 
-def hrot(axis, angle, center=None, dtype='f8', **args):
+def hrot(axis, angle, center=None, dtype=None, **args):
+    axis, angle = np.asarray(axis), np.asarray(angle)
+    dtype = resolve_dtype(dtype, axis, angle)
     axis = np.array(axis, dtype=dtype)
     angle = np.array(angle, dtype=dtype)
     center = (np.array([0, 0, 0], dtype=dtype)
@@ -135,55 +314,123 @@ def hrot(axis, angle, center=None, dtype='f8', **args):
     return r
 
 
-def hpoint(point):
+def hpoint(point, dtype=None):
     point = np.asanyarray(point)
-    if point.shape[-1] == 4: return point
+    if point.shape[-1] == 4:
+        return point if dtype is None else point.astype(dtype, copy=False)
     elif point.shape[-1] == 3:
-        r = np.ones(point.shape[:-1] + (4, ))
+        dtype = resolve_dtype(dtype, point)
+        r = np.ones(point.shape[:-1] + (4, ), dtype=dtype)
         r[..., :3] = point
         return r
     else:
         raise ValueError('point must len 3 or 4')
 
 
-def hvec(vec):
+def hvec(vec, dtype=None):
     vec = np.asanyarray(vec)
-    if vec.shape[-1] == 4: return vec
+    if vec.shape[-1] == 4:
+        return vec if dtype is None else vec.astype(dtype, copy=False)
     elif vec.shape[-1] == 3:
-        r = np.zeros(vec.shape[:-1] + (4, ))
+        dtype = resolve_dtype(dtype, vec)
+        r = np.zeros(vec.shape[:-1] + (4, ), dtype=dtype)
         r[..., :3] = vec
         return r
     else:
         raise ValueError('vec must len 3 or 4')
 
 
-def hray(origin, direction):
+def hray(origin, direction, dtype=None):
     origin = hpoint(origin)
     direction = hnormalized(direction)
     s = np.broadcast(origin, direction).shape
-    r = np.empty(s[:-1] + (4, 2))
+    dtype = resolve_dtype(dtype, origin, direction)
+    r = np.empty(s[:-1] + (4, 2), dtype=dtype)
     r[..., :origin.shape[-1], 0] = origin
     r[..., 3, 0] = 1
     r[..., :, 1] = direction
     return r
 
 
-def hstub(u, v, w, cen=None):
-    u, v, w = hpoint(u), hpoint(v), hpoint(w)
-    assert u.shape == v.shape == w.shape
-    if not cen: cen = u
-    cen = hpoint(cen)
-    assert cen.shape == u.shape
-    stubs = np.empty(u.shape[:-1] + (4, 4))
-    stubs[..., :, 0] = hnormalized(u - v)
-    stubs[..., :, 2] = hnormalized(hcross(stubs[..., :, 0], w - v))
-    stubs[..., :, 1] = hcross(stubs[..., :, 2], stubs[..., :, 0])
-    stubs[..., :, 3] = hpoint(cen[..., :])
-    return stubs
-
-
-def htrans(trans, dtype='f8'):
+def hstub(u, v, w, cen=None, dtype=None, layout='x44', out=None,
+          use_numba='auto'):
+    """frames with x along u - v, z normal to the u v w plane, at cen (u)
+
+    points are (..., 3) or (..., 4) and broadcast. layout 'x44', 'x34' or
+    'qt' (see xform_layout) is taken from out if given. float inputs go
+    through gu_hstub when numba is available"""
+    ps = [np.asarray(p) for p in (u, v, w, u if cen is None else cen)]
+    dtype = resolve_dtype(dtype, *ps[:3]) if out is None else out.dtype
+    ps = [p[..., :3].astype(dtype, copy=False) for p in ps]
+    shape = np.broadcast_shapes(*[p.shape[:-1] for p in ps])
+    return _stub_out(shape, dtype, layout, out, use_numba, gu_hstub, ps)
+
+
+def hstub_idx(coords, idx=None, stride=None, pattern=(0, 1, 2),
+              dtype=None, layout='x44', out=None, use_numba='auto'):
+    """hstub frames from (n, 3) or (n, 4) coords without gathering points
+
+    idx is (..., 3) int indices of u, v, w per frame, or (..., 4) with the
+    index of cen last. Without idx, frames are built every stride atoms
+    from the atoms at offsets pattern, e.g. stride=4, pattern=(0, 1, 2, 1)
+    for N CA C O backbones centered on CA. See hstub for layout and out"""
+    coords = np.asarray(coords)
+    if idx is None:
+        if stride is None: raise ValueError('need idx or stride')
+        start = np.arange(0, len(coords) - max(pattern), stride)
+        idx = start[:, None] + np.asarray(pattern)
+    idx = np.asarray(idx, dtype='i8')
+    if idx.shape[-1] not in (3, 4): raise ValueError('idx must be (..., 3|4)')
+    _check_idx(idx, len(coords))
+    dtype = resolve_dtype(dtype, coords) if out is None else out.dtype
+    coords = coords[..., :3].astype(dtype, copy=False)
+    if use_numba == 'auto': use_numba = gu_hstub_idx is not None
+    if not use_numba:
+        icen = 3 if idx.shape[-1] == 4 else 0
+        ps = [coords[idx[..., i]] for i in (0, 1, 2, icen)]
+        return hstub(*ps, layout=layout, out=out, use_numba=False)
+    return _stub_out(idx.shape[:-1], dtype, layout, out, use_numba,
+                     gu_hstub_idx, (coords, idx))
+
+
+def _stub_out(shape, dtype, layout, out, use_numba, gufunc, args):
+    if out is not None: layout = xform_layout(out)
+    if layout == 'qt':
+        qt = quat.xform_to_qt(
+            _stub_out(shape, dtype, 'x34', None, use_numba, gufunc, args))
+        if out is None: return qt
+        out[...] = qt
+        return out
+    if layout not in ('x44', 'x34'):
+        raise ValueError('unknown layout: ' + str(layout))
+    if out is None:
+        out = np.empty(shape + ((4, 4) if layout == 'x44' else (3, 4)),
+                       dtype=dtype)
+    if use_numba == 'auto': use_numba = gufunc is not None
+    if not use_numba: return _hstub_numpy(*args, out=out)
+    # guvec output dims must appear in the inputs
+    rows, cols = np.empty(out.shape[-2], dtype), np.empty(4, dtype)
+    return gufunc(*args, rows, cols, out=out)
+
+
+def _hstub_numpy(u, v, w, cen, out):
+    x = u - v
+    x /= np.linalg.norm(x, axis=-1)[..., None]
+    z = np.cross(x, w - v)
+    z /= np.linalg.norm(z, axis=-1)[..., None]
+    out[..., :3, 0] = x
+    out[..., :3, 1] = np.cross(z, x)
+    out[..., :3, 2] = z
+    out[..., :3, 3] = cen
+    if out.shape[-2] == 4:
+        out[..., 3, :3] = 0
+        out[..., 3, 3] = 1
+    return out
+
+
+def htrans(trans, dtype=None):
     trans = np.asanyarray(trans)
+    dtype = resolve_dtype(dtype, trans)
     if trans.shape[-1] != 3:
         raise ValueError('trans should be shape (..., 3)')
     tileshape = trans.shape[:-1] + (1, 1)
@@ -216,36 +463,49 @@ def hnorm2(a):
     return np.sum(a[..., :3] * a[..., :3], axis=-1)
 
 
-def hnormalized(a):
+def hnormalized(a, dtype=None):
     a = np.asanyarray(a)
     if (not a.shape and len(a) == 3) or (a.shape and a.shape[-1] == 3):
-        a, tmp = np.zeros(a.shape[:-1] + (4, )), a
+        dtype = resolve_dtype(dtype, a)
+        a, tmp = np.zeros(a.shape[:-1] + (4, ), dtype=dtype), a
         a[..., :3] = tmp
+    elif dtype is not None:
+        a = a.astype(dtype, copy=False)
     return a / hnorm(a)[..., None]
 
 
-def is_valid_rays(r):
+def is_valid_rays(r, atol=1e-6):
+    """True if all (..., 4, 2) rays are valid within atol, see ray_error"""
     r = np.asanyarray(r)
     if r.shape[-2:] != (4, 2): return False
-    if np.any(r[..., 3, :] != (1, 0)): return False
-    if np.any(abs(np.linalg.norm(r[..., :3, 1], axis=-1) - 1) > 0.000001):
-        return False
-    return True
+    return bool(np.all(ray_error(r) <= atol))
+
 
+def ray_error(rays):
+    """largest deviation of (..., 4, 2) rays from a point (w = 1) and unit
+    direction (w = 0)"""
+    rays = np.asarray(rays)
+    err = np.abs(np.linalg.norm(rays[..., :3, 1], axis=-1) - 1)
+    err = np.maximum(err, np.abs(rays[..., 3, 0] - 1))
+    return np.maximum(err, np.abs(rays[..., 3, 1]))
 
-def rand_point(shape=()):
+
+def rand_point(shape=(), dtype=None, rng=None):
     if isinstance(shape, int): shape = (shape, )
-    return hpoint(np.random.randn(*(shape + (3, ))))
+    return hpoint(as_rng(rng).standard_normal(shape + (3, )),
+                 resolve_dtype(dtype))
 
 
-def rand_vec(shape=()):
+def rand_vec(shape=(), dtype=None, rng=None):
     if isinstance(shape, int): shape = (shape, )
-    return hvec(np.random.randn(*(shape + (3, ))))
+    return hvec(as_rng(rng).standard_normal(shape + (3, )),
+                 resolve_dtype(dtype))
 
 
-def rand_unit(shape=()):
+def rand_unit(shape=(), dtype=None, rng=None):
     if isinstance(shape, int): shape = (shape, )
-    return hnormalized(np.random.randn(*(shape + (3, ))))
+    dtype = resolve_dtype(dtype)
+    return hnormalized(as_rng(rng).standard_normal(shape + (3, )), dtype)
 
 
 def angle(u, v):
@@ -269,39 +529,50 @@ def line_angle_degrees(u, v):
     return a * 180 / np.pi
 
 
-def rand_ray(shape=(), cen=(0, 0, 0), sdev=1):
+def rand_ray(shape=(), cen=(0, 0, 0), sdev=1, dtype=None):
     if isinstance(shape, int): shape = (shape, )
     cen = np.asanyarray(cen)
+    dtype = resolve_dtype(dtype, cen)
     if cen.shape[-1] not in (3, 4):
         raise ValueError('cen must be len 3 or 4')
     shape = shape or cen.shape[:-1]
     cen = cen + np.random.randn(*(shape + (3, ))) * sdev
     norm = np.random.randn(*(shape + (3, )))
     norm /= np.linalg.norm(norm, axis=-1)[..., np.newaxis]
-    r = np.zeros(shape + (4, 2))
+    r = np.zeros(shape + (4, 2), dtype=dtype)
     r[..., :3, 0] = cen
     r[..., 3, 0] = 1
     r[..., :3, 1] = norm
     return r
 
 
-def rand_xform_aac(shape=(), axis=None, ang=None, cen=None):
+def rand_xform_aac(shape=(), axis=None, ang=None, cen=None, dtype=None,
+                   rng=None):
+    """rotations about axis through cen. random axes and angles are uniform
+    over SO(3): axis and angle are independent there, with the angle
+    distributed as the angle of a uniform random quat"""
     if isinstance(shape, int): shape = (shape, )
+    dtype = resolve_dtype(dtype)
+    rng = as_rng(rng)
     if axis is None:
-        axis = rand_unit(shape)
+        axis = rand_unit(shape, dtype, rng)
+    # a given ang keeps hrot's degrees guess, sampled ones are radians
+    degrees = 'auto' if ang is not None else False
     if ang is None:
-        ang = np.random.rand(*shape) * np.pi  # todo: make uniform!
+        q = quat.rand_quat(shape, dtype, rng)
+        ang = 2 * np.arccos(np.minimum(q[..., 0], 1))
     if cen is None:
-        cen = rand_point(shape)
-    q = quat.rand_quat(shape)
-    return hrot(axis, ang, cen)
+        cen = rand_point(shape, dtype, rng)
+    return hrot(axis, ang, cen, dtype=dtype, degrees=degrees)
 
 
-def rand_xform(shape=(), cart_cen=0, cart_sd=1):
+def rand_xform(shape=(), cart_cen=0, cart_sd=1, dtype=None, rng=None):
     if isinstance(shape, int): shape = (shape, )
-    q = quat.rand_quat(shape)
+    rng = as_rng(rng)
+    q = quat.rand_quat(shape, dtype, rng)
     x = quat.quat_to_xform(q)
-    x[..., :3, 3] = np.random.randn(*shape, 3) * cart_sd + cart_cen
+    x[..., :3, 3] = (rng.standard_normal(shape + (3, )) * cart_sd +
+                     cart_cen)
     return x
 
 
@@ -399,8 +670,8 @@ def axis_ang_cen_of_planes(xforms, debug=False):
     # p1 = rand_point()
     # p2 = rand_point()
     tparallel = hdot(axis, xforms[..., :, 3])[..., None] * axis
-    q1 = xforms @ p1 - tparallel
-    q2 = xforms @ p2 - tparallel
+    q1 = hxform(xforms, p1) - tparallel
+    q2 = hxform(xforms, p2) - tparallel
     n1 = hnormalized(q1 - p1)
     n2 = hnormalized(q2 - p2)
     c1 = (p1 + q1) / 2.0
@@ -414,6 +685,34 @@ def axis_ang_cen_of_planes(xforms, debug=False):
 axis_ang_cen_of = axis_ang_cen_of_planes
 
 
+def axis_ang_cen_of_chunked(xforms, chunksize=2**14, out=None):
+    """axis_ang_cen_of in fixed size chunks, peak memory independent of N
+
+    xforms may be an np.memmap, only one chunk is read at a time. out can be
+    a preallocated (axis, angle, cen) tuple, possibly memmaps, with shapes
+    (..., 4), (...), (..., 4); they must be contiguous"""
+    shape = xforms.shape[:-2]
+    if out is None:
+        out = (np.empty(shape + (4, ), dtype=xforms.dtype),
+               np.empty(shape, dtype=xforms.dtype),
+               np.empty(shape + (4, ), dtype=xforms.dtype))
+    axis, angle, cen = out
+    if (axis.shape != shape + (4, ) or angle.shape != shape
+            or cen.shape != shape + (4, )):
+        raise ValueError('bad out shapes for xforms shape ' + str(shape))
+    # flat_out must be views, checked by flags as empty arrays share nothing
+    if not all(o.flags.c_contiguous for o in out):
+        raise ValueError('out arrays must be contiguous')
+    flat = xforms.reshape(-1, 4, 4)
+    flat_out = [o.reshape(-1, *o.shape[len(shape):]) for o in out]
+    for lb in range(0, len(flat), chunksize):
+        ub = min(lb + chunksize, len(flat))
+        chunk_out = axis_ang_cen_of(np.asarray(flat[lb:ub]))
+        for o, c in zip(flat_out, chunk_out):
+            o[lb:ub] = c
+    return out
+
+
 def line_line_distance_pa(pt1, ax1, pt2, ax2):
     # point1, point2 = hpoint(point1), hpoint(point2)
     # axis1, axis2 = hnormalized(axis1), hnormalized(axis2)
@@ -462,35 +761,164 @@ def line_line_closest_points(ray1, ray2, verbose=0):
     return line_line_closest_points_pa(pt1, ax1, pt2, ax2)
 
 
-def dihedral(p1, p2, p3, p4):
-    p1, p2, p3, p4 = hpoint(p1), hpoint(p2), hpoint(p3), hpoint(p4)
-    a = hnormalized(p2 - p1)
-    b = hnormalized(p3 - p2)
-    c = hnormalized(p4 - p3)
-    x = np.clip(hdot(a, b) * hdot(b, c) - hdot(a, c), -1, 1)
-    y = np.clip(hdot(a, hcross(b, c)), -1, 1)
-    return np.arctan2(y, x)
-
-
-def align_around_axis(axis, u, v):
-    return hrot(axis, -dihedral(u, axis, [0, 0, 0, 0], v))
-
-
-def align_vector(a, b):
-    return hrot((hnormalized(a) + hnormalized(b)) / 2, np.pi)
-
-
-def align_vectors(a1, a2, b1, b2):
-    "minimizes angular error"
-    a1, a2, b1, b2 = (hnormalized(v) for v in (a1, a2, b1, b2))
-    aaxis = (a1 + a2) / 2.0
-    baxis = (b1 + b2) / 2.0
-    Xmiddle = align_vector(aaxis, baxis)
-    Xaround = align_around_axis(baxis, Xmiddle @ a1, b1)
-    X = Xaround @ Xmiddle
-    assert (angle(b1, a1) + angle(b2, a2)) >= (
-        angle(b1, X @ a1) + angle(b2, X @ a2))
-    return X
+def dihedral(p1, p2, p3=None, p4=None, out=None, use_numba='auto'):
+    """torsion angle in radians of points (..., 3) or (..., 4) p1-p2-p3-p4
+
+    dihedral(coords, idx4) is the indexed form: the torsions of the (..., 4)
+    int atom indices idx4 into (n, 3) or (n, 4) coords, without gathering
+    the points. float inputs go through gu_dihedral / gu_dihedral_idx when
+    numba is available"""
+    if p3 is None and p4 is None:
+        return _dihedral_idx(p1, p2, out, use_numba)
+    ps = [np.asarray(p) for p in (p1, p2, p3, p4)]
+    dtype = resolve_dtype(None, *ps)
+    ps = [p[..., :3].astype(dtype, copy=False) for p in ps]
+    if use_numba == 'auto': use_numba = gu_dihedral is not None
+    if use_numba:
+        if out is None: return gu_dihedral(*ps)
+        return gu_dihedral(*ps, out=out)
+    return _dihedral_numpy(*ps, out=out)
+
+
+def _dihedral_numpy(p1, p2, p3, p4, out=None):
+    a, b, c = p2 - p1, p3 - p2, p4 - p3
+    # atan2(|b| a.(b x c), (a x b).(b x c)), no normalization needed
+    bb = np.sum(b * b, axis=-1)
+    x = np.sum(a * b, axis=-1) * np.sum(b * c, axis=-1)
+    x -= np.sum(a * c, axis=-1) * bb
+    y = np.sum(a * np.cross(b, c), axis=-1) * np.sqrt(bb)
+    return np.arctan2(y, x, out=out)
+
+
+def _dihedral_idx(coords, idx4, out=None, use_numba='auto'):
+    coords, idx4 = np.asarray(coords), np.asarray(idx4, dtype='i8')
+    if idx4.shape[-1] != 4: raise ValueError('idx4 must be (..., 4)')
+    _check_idx(idx4, len(coords))
+    dtype = resolve_dtype(None, coords)
+    coords = coords[..., :3].astype(dtype, copy=False)
+    if use_numba == 'auto': use_numba = gu_dihedral_idx is not None
+    if use_numba:
+        if out is None: return gu_dihedral_idx(coords, idx4)
+        return gu_dihedral_idx(coords, idx4, out=out)
+    ps = [coords[idx4[..., i]] for i in range(4)]
+    return _dihedral_numpy(*ps, out=out)
+
+
+def _rot_cs(axis, cos, sin, out=None):
+    """rotations about unit axis by the angle with cosine cos and sine sin"""
+    shape = np.broadcast(axis[..., 0], cos, sin).shape
+    if out is None: out = np.empty(shape + (4, 4), dtype=axis.dtype)
+    x, y, z = axis[..., 0], axis[..., 1], axis[..., 2]
+    t = 1 - cos
+    out[..., 0, 0] = cos + t * x * x
+    out[..., 0, 1] = t * x * y - sin * z
+    out[..., 0, 2] = t * x * z + sin * y
+    out[..., 1, 0] = t * x * y + sin * z
+    out[..., 1, 1] = cos + t * y * y
+    out[..., 1, 2] = t * y * z - sin * x
+    out[..., 2, 0] = t * x * z - sin * y
+    out[..., 2, 1] = t * y * z + sin * x
+    out[..., 2, 2] = cos + t * z * z
+    out[..., :3, 3] = 0
+    out[..., 3, :3] = 0
+    out[..., 3, 3] = 1
+    return out
+
+
+def _unit_perp(v):
+    """some unit vector perpendicular to each v"""
+    e = np.zeros(v.shape[:-1] + (4, ), dtype=v.dtype)
+    np.put_along_axis(e, np.argmin(np.abs(v[..., :3]), axis=-1)[..., None],
+                      1, axis=-1)
+    return hnormalized(hcross(v, e))
+
+
+def _unit_or_perp(v, other):
+    """v normalized, or a unit vector perpendicular to other where v ~ 0"""
+    norm = hnorm(v)[..., None]
+    small = norm < 1e-6
+    v = v / np.where(small, 1, norm)
+    if np.any(small): v = np.where(small, _unit_perp(other), v)
+    return v
+
+
+def _vec(v, dtype=None):
+    v = np.asarray(v)
+    dtype = resolve_dtype(dtype, v)
+    if v.shape[-1] == 3: return hvec(v, dtype)
+    v = v.astype(dtype)
+    v[..., 3] = 0
+    return v
+
+
+def align_around_axis(axis, u, v, out=None):
+    """rotations about axis taking the part of u perpendicular to axis onto
+    the direction of the part of v perpendicular to axis"""
+    axis, u, v = hnormalized(_vec(axis)), _vec(u), _vec(v)
+    au, av = hdot(axis, u), hdot(axis, v)
+    ang = np.arctan2(hdot(axis, hcross(u, v)), hdot(u, v) - au * av)
+    return _rot_cs(axis, np.cos(ang), np.sin(ang), out)
+
+
+def align_vector(a, b, out=None):
+    """180 degree rotations about the bisector of a and b, taking a onto the
+    direction of b (and b onto a)"""
+    a, b = hnormalized(_vec(a)), hnormalized(_vec(b))
+    a, b = np.broadcast_arrays(a, b)
+    axis = _unit_or_perp(a + b, a)
+    return _rot_cs(axis, -1, 0, out)
+
+
+def _pair_frame(u, v):
+    """(..., 4, 4) rotation with columns bisector, u - v and their normal"""
+    x = _unit_or_perp(u + v, u)
+    y = _unit_or_perp(u - v, x)
+    y = hnormalized(y - hdot(x, y)[..., None] * x)
+    frame = np.zeros(x.shape[:-1] + (4, 4), dtype=x.dtype)
+    frame[..., :, 0], frame[..., :, 1] = x, y
+    frame[..., :, 2] = hcross(x, y)
+    frame[..., 3, 3] = 1
+    return frame
+
+
+def align_vectors(a1, a2, b1, b2, weights=None, method='closed', out=None):
+    """rotations R best taking directions a1 onto b1 and a2 onto b2
+
+    solves wahba's problem, maximizing w1 b1.R a1 + w2 b2.R a2 for unit
+    vectors. With equal weights (the default) R takes the bisector and
+    plane of (a1, a2) onto those of (b1, b2); with weights (w1, w2), R is
+    then rotated in the plane (closed form, markley 1993). method='svd'
+    solves the same problem with a batched svd, as a reference"""
+    a1, a2, b1, b2 = np.broadcast_arrays(
+        *(hnormalized(_vec(v)) for v in (a1, a2, b1, b2)))
+    w1, w2 = (1, 1) if weights is None else weights
+    if method == 'svd':
+        w1 = np.asarray(w1)[..., None, None]
+        w2 = np.asarray(w2)[..., None, None]
+        b = (w1 * b1[..., :3, None] * a1[..., None, :3] +
+             w2 * b2[..., :3, None] * a2[..., None, :3])
+        u, _, vt = np.linalg.svd(b)
+        det = np.linalg.det(u @ vt)
+        u[..., :, 2] *= det[..., None]
+        if out is None: out = np.zeros(b.shape[:-2] + (4, 4), dtype=b.dtype)
+        out[...] = 0
+        out[..., :3, :3] = u @ vt
+        out[..., 3, 3] = 1
+        return out
+    if method != 'closed': raise ValueError('unknown method: ' + str(method))
+    out = np.matmul(_pair_frame(b1, b2), _pair_frame(a1, a2).swapaxes(-1, -2),
+                    out=out)
+    if weights is not None:
+        ra1, ra2 = out @ a1[..., None], out @ a2[..., None]
+        ra1, ra2 = ra1[..., 0], ra2[..., 0]
+        normal = _unit_or_perp(hcross(b1, b2), b1 - b2)
+        w1, w2 = np.asarray(w1), np.asarray(w2)
+        sin = (w1 * hdot(normal, hcross(ra1, b1)) +
+               w2 * hdot(normal, hcross(ra2, b2)))
+        cos = w1 * hdot(ra1, b1) + w2 * hdot(ra2, b2)
+        ang = np.arctan2(sin, cos)
+        out[...] = _rot_cs(normal, np.cos(ang), np.sin(ang)) @ out
+    return out
     # not so good if angles don't match:
     # xa = Xform().from_two_vecs(a2,a1)
     # xb = Xform().from_two_vecs(b2,b1)
@@ -596,18 +1024,10 @@ def trace44(xforms):
 
 @jit
 def numba_axis_angle(xform):
-    axs = np.zeros((4, ))
-    axs[0] = xform[2, 1] - xform[1, 2]
-    axs[1] = xform[0, 2] - xform[2, 0]
-    axs[2] = xform[1, 0] - xform[0, 1]
-    four_sin2 = np.sum(axs**2, axis=-1)
-    norm = np.sqrt(four_sin2)
-    axs = axs / norm
-    sin_angl = clip(norm / 2.0, -1, 1)
-    trace = trace44(xform) / 2 - 1
-    cos_angl = clip(trace, -1, 1)
-    ang = np.arctan2(sin_angl, cos_angl)
-    return axs, ang
+    axs = np.empty((4, ), dtype=xform.dtype)
+    ang = np.empty((1, ), dtype=xform.dtype)
+    kernel_axis_angle(xform, axs, ang)
+    return axs, ang[0]
 
 
 @jit
@@ -619,7 +1039,7 @@ def numba_axis_angle_of(xforms):
     ang = np.empty((n, ), dtype=xforms.dtype)
 
     for i in range(n):
-        axs[i], ang[i] = numba_axis_angle(xforms[i])
+        kernel_axis_angle(xforms[i], axs[i], ang[i:i + 1])
 
     axs = axs.reshape(*shape, 4)
     ang = ang.reshape(*shape)
@@ -637,13 +1057,21 @@ def numba_is_valid_ray(r):
 
 @jit
 def kernel_line_line_distance_pa(pt1, ax1, pt2, ax2, out):
-    n = abs(numba_dot(pt2[:3] - pt1[:3], numba_cross(ax1, ax2)))
-    d = numba_norm(numba_cross(ax1, ax2))
-    r = n / d if abs(d) > 0.00001 else 0
-    if np.abs(numba_dot(ax1, ax2)) > 0.9999:
-        out[0] = numba_norm(numba_proj_perp(ax1, pt2 - pt1))
-    else:
-        out[0] = r
+    d0, d1, d2 = pt2[0] - pt1[0], pt2[1] - pt1[1], pt2[2] - pt1[2]
+    c0 = ax1[1] * ax2[2] - ax1[2] * ax2[1]
+    c1 = ax1[2] * ax2[0] - ax1[0] * ax2[2]
+    c2 = ax1[0] * ax2[1] - ax1[1] * ax2[0]
+    dot = ax1[0] * ax2[0] + ax1[1] * ax2[1] + ax1[2] * ax2[2]
+    if abs(dot) > 0.9999:
+        # parallel, distance from pt2 to line 1
+        a2 = ax1[0] * ax1[0] + ax1[1] * ax1[1] + ax1[2] * ax1[2]
+        f = (ax1[0] * d0 + ax1[1] * d1 + ax1[2] * d2) / a2
+        e0, e1, e2 = d0 - f * ax1[0], d1 - f * ax1[1], d2 - f * ax1[2]
+        out[0] = np.sqrt(e0 * e0 + e1 * e1 + e2 * e2)
+        return
+    d = np.sqrt(c0 * c0 + c1 * c1 + c2 * c2)
+    n = abs(d0 * c0 + d1 * c1 + d2 * c2)
+    out[0] = n / d if d > 0.00001 else 0
 
 
 @jit
@@ -658,70 +1086,471 @@ def numba_point_in_plane(plane, pt):
     return np.abs(numba_dot(plane[:3, 1], pt[:3] - plane[:3, 0])) < 0.000001
 
 
+@jit
+def kernel_intersect_planes(plane1, plane2, isect):
+    """intersect two planes (4, 2) into isect (4, 2) without allocating
+
+    returns status 0 = intersection written, 1 = planes parallel"""
+    status, x, y, z, u0, u1, u2 = _intersect_planes(
+        plane1[0, 0], plane1[1, 0], plane1[2, 0], plane1[0, 1], plane1[1, 1],
+        plane1[2, 1], plane2[0, 0], plane2[1, 0], plane2[2, 0], plane2[0, 1],
+        plane2[1, 1], plane2[2, 1])
+    if status: return status
+    isect[0, 0], isect[1, 0], isect[2, 0], isect[3, 0] = x, y, z, 1
+    isect[0, 1], isect[1, 1], isect[2, 1], isect[3, 1] = u0, u1, u2, 0
+    return 0
+
+
+@jit
+def _intersect_planes(c10, c11, c12, n10, n11, n12, c20, c21, c22, n20, n21,
+                      n22):
+    # scalar core of kernel_intersect_planes, planes as point c and normal n
+    # returns status, point x y z and unit direction u0 u1 u2
+    u0 = n11 * n22 - n12 * n21
+    u1 = n12 * n20 - n10 * n22
+    u2 = n10 * n21 - n11 * n20
+    a0, a1, a2 = abs(u0), abs(u1), abs(u2)
+    if a0 + a1 + a2 < 0.000001:
+        return 1, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0
+    d1 = -(n10 * c10 + n11 * c11 + n12 * c12)
+    d2 = -(n20 * c20 + n21 * c21 + n22 * c22)
+    if a0 >= a1 and a0 >= a2:
+        x = 0.0
+        y = (d2 * n12 - d1 * n22) / u0
+        z = (d1 * n21 - d2 * n11) / u0
+    elif a1 >= a2:
+        x = (d1 * n22 - d2 * n12) / u1
+        y = 0.0
+        z = (d2 * n10 - d1 * n20) / u1
+    else:
+        x = (d2 * n11 - d1 * n21) / u2
+        y = (d1 * n20 - d2 * n10) / u2
+        z = 0.0
+    norm = np.sqrt(u0 * u0 + u1 * u1 + u2 * u2)
+    return 0, x, y, z, u0 / norm, u1 / norm, u2 / norm
+
+
 @jit
 def numba_intersect_planes(plane1, plane2):
     """intersect_Planes: find the 3D intersection of two planes
        Input:  two planes represented by rays shape=(..., 4, 2)
        Output: *L = the intersection line (when it exists)
-       Return: rays shape=(...,4,2), status
-               0 = intersection returned
-               1 = disjoint (no intersection)
-               2 = the two planes coincide
+       Return: rays shape=(4,2), or None if the planes are parallel
     """
     if not numba_is_valid_ray(plane1): raise ValueError('invalid plane1')
     if not numba_is_valid_ray(plane2): raise ValueError('invalid plane2')
-    p1, n1 = plane1[:3, 0], plane1[:3, 1]
-    p2, n2 = plane2[:3, 0], plane2[:3, 1]
-    u = numba_cross(n1, n2)
-    abs_u = np.abs(u)
-    planes_parallel = np.sum(abs_u, axis=-1) < 0.000001
-    p2_in_plane1 = numba_point_in_plane(plane1, p2)
-    if planes_parallel:
-        return None
-    # if p2_in_plane1:
-    # return None
-    d1 = -np.sum(n1 * p1)
-    d2 = -np.sum(n2 * p2)
-    amax = np.argmax(abs_u)
-    if amax == 0:
-        x = 0
-        y = (d2 * n1[2] - d1 * n2[2]) / u[0]
-        z = (d1 * n2[1] - d2 * n1[1]) / u[0]
-    elif amax == 1:
-        x = (d1 * n2[2] - d2 * n1[2]) / u[1]
-        y = 0
-        z = (d2 * n1[0] - d1 * n2[0]) / u[1]
-
-    elif amax == 2:
-        x = (d2 * n1[1] - d1 * n2[1]) / u[2]
-        y = (d1 * n2[0] - d2 * n1[0]) / u[2]
-        z = 0
     isect = np.empty((4, 2), dtype=plane1.dtype)
-    isect[0, 0] = x
-    isect[1, 0] = y
-    isect[2, 0] = z
-    isect[3, 0] = 1
-    isect[:3, 1] = u / np.sqrt(np.sum(u * u))
-    isect[3, 1] = 0
+    if kernel_intersect_planes(plane1, plane2, isect):
+        return None
     return isect
 
 
+@jit
+def kernel_axis_angle(xform, axis, ang):
+    """axis (4) and angle via the quat, see axis_angle_of. ang is exactly 0
+    only for the identity, whose axis is set to x"""
+    quat.kernel_rot_to_quat(xform, axis)  # axis is the quat buffer
+    w, x, y, z = axis[0], axis[1], axis[2], axis[3]
+    norm = np.sqrt(x * x + y * y + z * z)
+    ang[0] = 2 * np.arctan2(norm, w)
+    # branchless, fastmath would hoist a division by zero out of an if
+    zero = norm == 0
+    inv = 1 / (norm + zero)
+    axis[0], axis[1], axis[2], axis[3] = x * inv + zero, y * inv, z * inv, 0
+
+
+@jit
+def _bisecting_plane(xform, t0, t1, t2, p0, p1, p2):
+    # plane bisecting p and xform @ p - t, as point c and unit normal n
+    q0 = xform[0, 0] * p0 + xform[0, 1] * p1 + xform[0, 2] * p2 + xform[0, 3]
+    q1 = xform[1, 0] * p0 + xform[1, 1] * p1 + xform[1, 2] * p2 + xform[1, 3]
+    q2 = xform[2, 0] * p0 + xform[2, 1] * p1 + xform[2, 2] * p2 + xform[2, 3]
+    q0, q1, q2 = q0 - t0, q1 - t1, q2 - t2
+    n0, n1, n2 = q0 - p0, q1 - p1, q2 - p2
+    norm = np.sqrt(n0 * n0 + n1 * n1 + n2 * n2)
+    return ((p0 + q0) / 2.0, (p1 + q1) / 2.0, (p2 + q2) / 2.0, n0 / norm,
+            n1 / norm, n2 / norm)
+
+
+@jit
+def kernel_axis_angle_cen(xform, axis, ang, cen):
+    kernel_axis_angle(xform, axis, ang)
+    if ang[0] == 0:
+        cen[:] = np.nan
+        return
+    # scalar locals only, no scratch arrays per element
+    t = axis[0] * xform[0, 3] + axis[1] * xform[1, 3] + axis[2] * xform[2, 3]
+    t0, t1, t2 = t * axis[0], t * axis[1], t * axis[2]
+    #  sketchy magic points, same as axis_ang_cen_of_planes
+    c10, c11, c12, n10, n11, n12 = _bisecting_plane(
+        xform, t0, t1, t2, -32.09501046777237, 03.36227004372687,
+        35.34672781477340)
+    c20, c21, c22, n20, n21, n22 = _bisecting_plane(
+        xform, t0, t1, t2, 21.15113978202345, 12.55664537217840,
+        -37.48294301885574)
+    status, x, y, z, u0, u1, u2 = _intersect_planes(
+        c10, c11, c12, n10, n11, n12, c20, c21, c22, n20, n21, n22)
+    if status:
+        cen[:] = np.nan
+    else:
+        cen[0], cen[1], cen[2], cen[3] = x, y, z, 1
+
+
 @jit
 def numba_axis_angle_cen(xform):
-    axis, angle = numba_axis_angle(xform)
-    #  sketchy magic points...
-    p1 = (-32.09501046777237, 03.36227004372687, 35.34672781477340, 1)
-    p2 = (21.15113978202345, 12.55664537217840, -37.48294301885574, 1)
-    # p1 = rand_point()
-    # p2 = rand_point()
-    tparallel = hdot(axis, xforms[..., :, 3])[..., None] * axis
-    q1 = xform @ p1 - tparallel
-    q2 = xform @ p2 - tparallel
-    n1 = hnormalized(q1 - p1)
-    n2 = hnormalized(q2 - p2)
-    c1 = (p1 + q1) / 2.0
-    c2 = (p2 + q2) / 2.0
-    plane1 = hray(c1, n1)
-    plane2 = hray(c2, n2)
-    isect, status = intersect_planes(plane1, plane2)
-    return axis, angle, isect[..., :, 0]
+    axis = np.empty(4, dtype=xform.dtype)
+    ang = np.empty(1, dtype=xform.dtype)
+    cen = np.empty(4, dtype=xform.dtype)
+    kernel_axis_angle_cen(xform, axis, ang, cen)
+    return axis, ang[0], cen
+
+
+gu_axis_angle = guvec([
+    (float64[:, :], float64[:], float64[:]),
+    (float32[:, :], float32[:], float32[:]),
+], '(n,m)->(m),()', kernel_axis_angle)
+
+gu_axis_angle_cen = guvec([
+    (float64[:, :], float64[:], float64[:], float64[:]),
+    (float32[:, :], float32[:], float32[:], float32[:]),
+], '(n,n)->(n),(),(n)', kernel_axis_angle_cen)
+
+
+@jit
+def kernel_hinv(xform, out):
+    t0, t1, t2 = xform[0, 3], xform[1, 3], xform[2, 3]
+    for i in range(3):
+        for j in range(i, 3):
+            rij, rji = xform[i, j], xform[j, i]
+            out[i, j], out[j, i] = rji, rij
+    for i in range(3):
+        out[i, 3] = -(out[i, 0] * t0 + out[i, 1] * t1 + out[i, 2] * t2)
+        out[3, i] = 0
+    out[3, 3] = 1
+
+
+@jit
+def numba_hinv(xform):
+    out = np.empty((4, 4), dtype=xform.dtype)
+    kernel_hinv(xform, out)
+    return out
+
+
+gu_hinv = guvec([
+    (float64[:, :], float64[:, :]),
+    (float32[:, :], float32[:, :]),
+], '(n,n)->(n,n)', kernel_hinv)
+
+
+@jit
+def kernel_hxform(xform, pt, out):
+    p0, p1, p2, p3 = pt[0], pt[1], pt[2], pt[3]
+    for i in range(3):
+        out[i] = (xform[i, 0] * p0 + xform[i, 1] * p1 + xform[i, 2] * p2 +
+                  xform[i, 3] * p3)
+    out[3] = p3
+
+
+@jit
+def kernel_hcompose(a, b, out):
+    for j in range(4):
+        b0, b1, b2 = b[0, j], b[1, j], b[2, j]
+        for i in range(3):
+            out[i, j] = a[i, 0] * b0 + a[i, 1] * b1 + a[i, 2] * b2
+    for i in range(3):
+        out[i, 3] += a[i, 3]
+        out[3, i] = 0
+    out[3, 3] = 1
+
+
+@jit
+def kernel_hinv_compose(a, b, out):
+    for j in range(4):
+        b0, b1, b2 = b[0, j], b[1, j], b[2, j]
+        if j == 3:
+            b0, b1, b2 = b0 - a[0, 3], b1 - a[1, 3], b2 - a[2, 3]
+        for i in range(3):
+            out[i, j] = a[0, i] * b0 + a[1, i] * b1 + a[2, i] * b2
+    for i in range(3):
+        out[3, i] = 0
+    out[3, 3] = 1
+
+
+gu_hxform = guvec([
+    (float64[:, :], float64[:], float64[:]),
+    (float32[:, :], float32[:], float32[:]),
+], '(n,n),(n)->(n)', kernel_hxform)
+
+gu_hcompose = guvec([
+    (float64[:, :], float64[:, :], float64[:, :]),
+    (float32[:, :], float32[:, :], float32[:, :]),
+], '(n,n),(n,n)->(n,n)', kernel_hcompose)
+
+gu_hinv_compose = guvec([
+    (float64[:, :], float64[:, :], float64[:, :]),
+    (float32[:, :], float32[:, :], float32[:, :]),
+], '(n,n),(n,n)->(n,n)', kernel_hinv_compose)
+
+
+@jit
+def kernel_rot_cs(x, y, z, cos, sin, out):
+    t = 1 - cos
+    out[0, 0] = cos + t * x * x
+    out[0, 1] = t * x * y - sin * z
+    out[0, 2] = t * x * z + sin * y
+    out[1, 0] = t * x * y + sin * z
+    out[1, 1] = cos + t * y * y
+    out[1, 2] = t * y * z - sin * x
+    out[2, 0] = t * x * z - sin * y
+    out[2, 1] = t * y * z + sin * x
+    out[2, 2] = cos + t * z * z
+    for i in range(3):
+        out[i, 3] = 0
+        out[3, i] = 0
+    out[3, 3] = 1
+
+
+@jit
+def _scalar_unit_or_perp(x, y, z, ox, oy, oz):
+    """(x, y, z) normalized, or a unit vector perpendicular to other if ~ 0
+    """
+    norm = np.sqrt(x * x + y * y + z * z)
+    if norm >= 1e-6:
+        return x / norm, y / norm, z / norm
+    # cross other with the basis vector it is least aligned with
+    ax, ay, az = abs(ox), abs(oy), abs(oz)
+    if ax <= ay and ax <= az:
+        x, y, z = 0.0, oz, -oy
+    elif ay <= az:
+        x, y, z = -oz, 0.0, ox
+    else:
+        x, y, z = oy, -ox, 0.0
+    norm = np.sqrt(x * x + y * y + z * z)
+    return x / norm, y / norm, z / norm
+
+
+@jit
+def kernel_align_around_axis(axis, u, v, out):
+    n = np.sqrt(axis[0]**2 + axis[1]**2 + axis[2]**2)
+    x, y, z = axis[0] / n, axis[1] / n, axis[2] / n
+    au = x * u[0] + y * u[1] + z * u[2]
+    av = x * v[0] + y * v[1] + z * v[2]
+    c = u[0] * v[0] + u[1] * v[1] + u[2] * v[2] - au * av
+    s = (x * (u[1] * v[2] - u[2] * v[1]) + y * (u[2] * v[0] - u[0] * v[2]) +
+         z * (u[0] * v[1] - u[1] * v[0]))
+    h = np.sqrt(c * c + s * s)
+    if h == 0: c, s, h = 1.0, 0.0, 1.0
+    kernel_rot_cs(x, y, z, c / h, s / h, out)
+
+
+@jit
+def kernel_align_vector(a, b, out):
+    na = np.sqrt(a[0]**2 + a[1]**2 + a[2]**2)
+    nb = np.sqrt(b[0]**2 + b[1]**2 + b[2]**2)
+    ax, ay, az = a[0] / na, a[1] / na, a[2] / na
+    x, y, z = _scalar_unit_or_perp(ax + b[0] / nb, ay + b[1] / nb,
+                                   az + b[2] / nb, ax, ay, az)
+    kernel_rot_cs(x, y, z, -1.0, 0.0, out)
+
+
+@jit
+def _scalar_pair_frame(ux, uy, uz, vx, vy, vz):
+    """columns of the 3x3 frame of unit u and v, flattened: bisector, u - v
+    and normal"""
+    sx, sy, sz = _scalar_unit_or_perp(ux + vx, uy + vy, uz + vz, ux, uy, uz)
+    dx, dy, dz = _scalar_unit_or_perp(ux - vx, uy - vy, uz - vz, sx, sy, sz)
+    dot = sx * dx + sy * dy + sz * dz
+    dx, dy, dz = dx - dot * sx, dy - dot * sy, dz - dot * sz
+    n = np.sqrt(dx * dx + dy * dy + dz * dz)
+    dx, dy, dz = dx / n, dy / n, dz / n
+    return (sx, sy, sz, dx, dy, dz, sy * dz - sz * dy, sz * dx - sx * dz,
+            sx * dy - sy * dx)
+
+
+@jit
+def _scalar_unit(v):
+    n = np.sqrt(v[0]**2 + v[1]**2 + v[2]**2)
+    return v[0] / n, v[1] / n, v[2] / n
+
+
+@jit
+def _wahba_cs(m, ax, ay, az, bx, by, bz, nx, ny, nz):
+    # cos, sin terms of the in plane rotation about n taking m a onto b
+    rx = m[0, 0] * ax + m[0, 1] * ay + m[0, 2] * az
+    ry = m[1, 0] * ax + m[1, 1] * ay + m[1, 2] * az
+    rz = m[2, 0] * ax + m[2, 1] * ay + m[2, 2] * az
+    c = rx * bx + ry * by + rz * bz
+    s = (nx * (ry * bz - rz * by) + ny * (rz * bx - rx * bz) +
+         nz * (rx * by - ry * bx))
+    return c, s
+
+
+@jit
+def kernel_align_vectors(a1, a2, b1, b2, w1, w2, out):
+    """closed form wahba, see align_vectors. scalar locals only, out is the
+    only buffer"""
+    a1x, a1y, a1z = _scalar_unit(a1)
+    a2x, a2y, a2z = _scalar_unit(a2)
+    b1x, b1y, b1z = _scalar_unit(b1)
+    b2x, b2y, b2z = _scalar_unit(b2)
+    fa0, fa1, fa2, fa3, fa4, fa5, fa6, fa7, fa8 = _scalar_pair_frame(
+        a1x, a1y, a1z, a2x, a2y, a2z)
+    fb = _scalar_pair_frame(b1x, b1y, b1z, b2x, b2y, b2z)
+    fb0, fb1, fb2, fb3, fb4, fb5, nx, ny, nz = fb
+    # out = fb @ fa.T, fb rows are (fb[i], fb[i + 3], fb[i + 6])
+    out[0, 0] = fb0 * fa0 + fb3 * fa3 + nx * fa6
+    out[0, 1] = fb0 * fa1 + fb3 * fa4 + nx * fa7
+    out[0, 2] = fb0 * fa2 + fb3 * fa5 + nx * fa8
+    out[1, 0] = fb1 * fa0 + fb4 * fa3 + ny * fa6
+    out[1, 1] = fb1 * fa1 + fb4 * fa4 + ny * fa7
+    out[1, 2] = fb1 * fa2 + fb4 * fa5 + ny * fa8
+    out[2, 0] = fb2 * fa0 + fb5 * fa3 + nz * fa6
+    out[2, 1] = fb2 * fa1 + fb5 * fa4 + nz * fa7
+    out[2, 2] = fb2 * fa2 + fb5 * fa5 + nz * fa8
+    for i in range(3):
+        out[i, 3] = 0
+        out[3, i] = 0
+    out[3, 3] = 1
+    if w1 == w2: return
+    # in plane rotation about the b normal n, applied to out in place
+    c1, s1 = _wahba_cs(out, a1x, a1y, a1z, b1x, b1y, b1z, nx, ny, nz)
+    c2, s2 = _wahba_cs(out, a2x, a2y, a2z, b2x, b2y, b2z, nx, ny, nz)
+    c, s = w1 * c1 + w2 * c2, w1 * s1 + w2 * s2
+    h = np.sqrt(c * c + s * s)
+    c, s = c / h, s / h
+    t = 1 - c
+    r00, r01, r02 = c + t * nx * nx, t * nx * ny - s * nz, t * nx * nz + s * ny
+    r10, r11, r12 = t * nx * ny + s * nz, c + t * ny * ny, t * ny * nz - s * nx
+    r20, r21, r22 = t * nx * nz - s * ny, t * ny * nz + s * nx, c + t * nz * nz
+    for j in range(3):
+        x, y, z = out[0, j], out[1, j], out[2, j]
+        out[0, j] = r00 * x + r01 * y + r02 * z
+        out[1, j] = r10 * x + r11 * y + r12 * z
+        out[2, j] = r20 * x + r21 * y + r22 * z
+
+
+gu_align_around_axis = guvec([
+    (float64[:], float64[:], float64[:], float64[:, :]),
+    (float32[:], float32[:], float32[:], float32[:, :]),
+], '(n),(n),(n)->(n,n)', kernel_align_around_axis)
+
+gu_align_vector = guvec([
+    (float64[:], float64[:], float64[:, :]),
+    (float32[:], float32[:], float32[:, :]),
+], '(n),(n)->(n,n)', kernel_align_vector)
+
+gu_align_vectors = guvec([
+    (float64[:], float64[:], float64[:], float64[:], float64, float64,
+     float64[:, :]),
+    (float32[:], float32[:], float32[:], float32[:], float32, float32,
+     float32[:, :]),
+], '(n),(n),(n),(n),(),()->(n,n)', kernel_align_vectors)
+
+
+@jit
+def kernel_dihedral(p1, p2, p3, p4, out):
+    a0, a1, a2 = p2[0] - p1[0], p2[1] - p1[1], p2[2] - p1[2]
+    b0, b1, b2 = p3[0] - p2[0], p3[1] - p2[1], p3[2] - p2[2]
+    c0, c1, c2 = p4[0] - p3[0], p4[1] - p3[1], p4[2] - p3[2]
+    bb = b0 * b0 + b1 * b1 + b2 * b2
+    ab = a0 * b0 + a1 * b1 + a2 * b2
+    bc = b0 * c0 + b1 * c1 + b2 * c2
+    ac = a0 * c0 + a1 * c1 + a2 * c2
+    y = (a0 * (b1 * c2 - b2 * c1) + a1 * (b2 * c0 - b0 * c2) + a2 *
+         (b0 * c1 - b1 * c0)) * np.sqrt(bb)
+    out[0] = np.arctan2(y, ab * bc - ac * bb)
+
+
+@jit
+def kernel_dihedral_idx(coords, idx, out):
+    kernel_dihedral(coords[idx[0]], coords[idx[1]], coords[idx[2]],
+                    coords[idx[3]], out)
+
+
+gu_dihedral = guvec([
+    (float64[:], float64[:], float64[:], float64[:], float64[:]),
+    (float32[:], float32[:], float32[:], float32[:], float32[:]),
+], '(n),(n),(n),(n)->()', kernel_dihedral)
+
+gu_dihedral_idx = guvec([
+    (float64[:, :], int64[:], float64[:]),
+    (float32[:, :], int64[:], float32[:]),
+], '(m,n),(k)->()', kernel_dihedral_idx)
+
+
+@jit
+def kernel_hstub(u, v, w, cen, out):
+    """frame of u, v, w at cen, out (3|4, 4)"""
+    x0, x1, x2 = u[0] - v[0], u[1] - v[1], u[2] - v[2]
+    d = np.sqrt(x0 * x0 + x1 * x1 + x2 * x2)
+    x0, x1, x2 = x0 / d, x1 / d, x2 / d
+    e0, e1, e2 = w[0] - v[0], w[1] - v[1], w[2] - v[2]
+    z0, z1, z2 = x1 * e2 - x2 * e1, x2 * e0 - x0 * e2, x0 * e1 - x1 * e0
+    d = np.sqrt(z0 * z0 + z1 * z1 + z2 * z2)
+    z0, z1, z2 = z0 / d, z1 / d, z2 / d
+    out[0, 0], out[1, 0], out[2, 0] = x0, x1, x2
+    out[0, 1], out[1, 1] = z1 * x2 - z2 * x1, z2 * x0 - z0 * x2
+    out[2, 1] = z0 * x1 - z1 * x0
+    out[0, 2], out[1, 2], out[2, 2] = z0, z1, z2
+    out[0, 3], out[1, 3], out[2, 3] = cen[0], cen[1], cen[2]
+    if out.shape[0] == 4:
+        out[3, 0], out[3, 1], out[3, 2], out[3, 3] = 0, 0, 0, 1
+
+
+@jit
+def kernel_hstub_idx(coords, idx, out):
+    """frame of coords at idx, (3) u, v, w or (4) with cen"""
+    icen = idx[3] if len(idx) == 4 else idx[0]
+    kernel_hstub(coords[idx[0]], coords[idx[1]], coords[idx[2]],
+                 coords[icen], out)
+
+
+# rows, cols only carry the output shape for guvec
+@jit
+def _kernel_hstub_rc(u, v, w, cen, rows, cols, out):
+    kernel_hstub(u, v, w, cen, out)
+
+
+@jit
+def _kernel_hstub_idx_rc(coords, idx, rows, cols, out):
+    kernel_hstub_idx(coords, idx, out)
+
+
+gu_hstub = guvec([
+    (float64[:], float64[:], float64[:], float64[:], float64[:], float64[:],
+     float64[:, :]),
+    (float32[:], float32[:], float32[:], float32[:], float32[:], float32[:],
+     float32[:, :]),
+], '(n),(n),(n),(n),(r),(c)->(r,c)', _kernel_hstub_rc, 'gu_hstub')
+
+gu_hstub_idx = guvec([
+    (float64[:, :], int64[:], float64[:], float64[:], float64[:, :]),
+    (float32[:, :], int64[:], float32[:], float32[:], float32[:, :]),
+], '(m,n),(k),(r),(c)->(r,c)', _kernel_hstub_idx_rc, 'gu_hstub_idx')
+
+
+@jit
+def kernel_xform_error(xform, out):
+    err = 0.0
+    for i in range(3):
+        for j in range(i, 3):
+            d = (xform[0, i] * xform[0, j] + xform[1, i] * xform[1, j] +
+                 xform[2, i] * xform[2, j])
+            err = max(err, abs(d - 1) if i == j else abs(d))
+    det = (xform[0, 0] * (xform[1, 1] * xform[2, 2] - xform[2, 1] *
+                          xform[1, 2]) - xform[0, 1] *
+           (xform[1, 0] * xform[2, 2] - xform[2, 0] * xform[1, 2]) +
+           xform[0, 2] * (xform[1, 0] * xform[2, 1] - xform[2, 0] *
+                          xform[1, 1]))
+    err = max(err, abs(det - 1))
+    if xform.shape[0] == 4:
+        for j in range(3):
+            err = max(err, abs(xform[3, j]))
+        err = max(err, abs(xform[3, 3] - 1))
+    out[0] = err
+
+
+gu_xform_error = guvec([
+    (float64[:, :], float64[:]),
+    (float32[:, :], float32[:]),
+], '(n,m)->()', kernel_xform_error)
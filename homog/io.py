@@ -0,0 +1,172 @@
+"""on-disk transform archives with np.memmap random access
+
+file layout: 8 byte magic, then a json header padded with spaces to
+HEADER_SIZE bytes, then count records of the archive's layout and dtype
+('x44' (4, 4), 'x34' (3, 4) or 'qt' (7, ), see homog.xform_layout). The file
+grows in chunks of chunksize records, so appends from streaming producers
+don't resize it every call; only the first count records are valid."""
+
+import os
+import json
+import numpy as np
+from homog import homog as hm
+
+MAGIC = b'HOMOGXF\0'
+HEADER_SIZE = 4096
+VERSION = 1
+record_shapes = dict(x44=(4, 4), x34=(3, 4), qt=(7, ))
+
+
+class XformArchive:
+    """memmap-backed stack of xforms, see module docstring for the format
+
+    mode is 'r' (read only), 'r+' (read/append existing), 'w' (create or
+    truncate) or 'a' (append, create if missing). layout, dtype, chunksize and
+    metadata (a json-able dict) are only used when creating a file. Indexing
+    and slicing return zero-copy memmap views"""
+
+    def __init__(self, path, mode='r', layout='x44', dtype='f8',
+                 chunksize=2**16, metadata=None):
+        if mode not in ('r', 'r+', 'w', 'a'):
+            raise ValueError('bad mode: ' + str(mode))
+        self.path, self.mode = path, mode
+        if mode == 'w' or (mode == 'a' and not os.path.exists(path)):
+            if layout not in record_shapes:
+                raise ValueError('unknown layout: ' + str(layout))
+            self.header = dict(version=VERSION, layout=layout,
+                               dtype=np.dtype(dtype).str, count=0,
+                               chunksize=int(chunksize),
+                               metadata=metadata or dict())
+            with open(path, 'wb') as out:
+                out.write(self._encode_header())
+            self.mode = 'r+'
+        else:
+            self.header = read_header(path)
+        self._mmap = None
+        self._remap()
+
+    @property
+    def layout(self):
+        return self.header['layout']
+
+    @property
+    def dtype(self):
+        return np.dtype(self.header['dtype'])
+
+    @property
+    def metadata(self):
+        return self.header['metadata']
+
+    @property
+    def record_shape(self):
+        return record_shapes[self.layout]
+
+    @property
+    def capacity(self):
+        return 0 if self._mmap is None else len(self._mmap)
+
+    def __len__(self):
+        return self.header['count']
+
+    def __getitem__(self, index):
+        return self.array[index]
+
+    def __iter__(self):
+        return iter(self.array)
+
+    @property
+    def array(self):
+        """memmap of all valid records"""
+        if self._mmap is None:
+            return np.empty((0, ) + self.record_shape, dtype=self.dtype)
+        return self._mmap[:len(self)]
+
+    def chunks(self, chunksize=None):
+        """yield memmap views of consecutive chunks of records"""
+        chunksize = chunksize or self.header['chunksize']
+        for lb in range(0, len(self), chunksize):
+            yield self.array[lb:lb + chunksize]
+
+    def map_chunks(self, func, chunksize=None):
+        """func applied to each chunk, for kernels too big for the archive"""
+        for chunk in self.chunks(chunksize):
+            yield func(chunk)
+
+    def append(self, xforms):
+        """append xforms of any layout, converted to the archive's layout"""
+        if self.mode == 'r': raise IOError('archive opened read only')
+        xforms = np.asarray(xforms)
+        if xforms.shape[-len(self.record_shape):] != self.record_shape:
+            xforms = hm.hcompact(xforms, self.layout)
+        xforms = xforms.reshape((-1, ) + self.record_shape)
+        n0, n = len(self), len(xforms)
+        if n0 + n > self.capacity:
+            chunk = self.header['chunksize']
+            self._remap(-(-(n0 + n) // chunk) * chunk)
+        self._mmap[n0:n0 + n] = xforms
+        self.header['count'] = n0 + n
+        return self
+
+    def flush(self):
+        if self.mode == 'r': return
+        if self._mmap is not None: self._mmap.flush()
+        with open(self.path, 'r+b') as out:
+            out.write(self._encode_header())
+
+    def close(self):
+        self.flush()
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _encode_header(self):
+        js = json.dumps(self.header).encode()
+        if len(MAGIC) + len(js) > HEADER_SIZE:
+            raise ValueError('archive metadata too large')
+        return MAGIC + js.ljust(HEADER_SIZE - len(MAGIC))
+
+    def _remap(self, capacity=None):
+        rsize = self.dtype.itemsize * int(np.prod(self.record_shape))
+        if capacity is not None:
+            if self._mmap is not None: self._mmap.flush()
+            with open(self.path, 'r+b') as out:
+                out.truncate(HEADER_SIZE + capacity * rsize)
+        nbytes = os.path.getsize(self.path) - HEADER_SIZE
+        capacity = nbytes // rsize
+        if capacity == 0:
+            self._mmap = None
+            return
+        self._mmap = np.memmap(
+            self.path, dtype=self.dtype, offset=HEADER_SIZE,
+            mode='r' if self.mode == 'r' else 'r+',
+            shape=(capacity, ) + self.record_shape)
+
+
+def read_header(path):
+    with open(path, 'rb') as inp:
+        raw = inp.read(HEADER_SIZE)
+    if raw[:len(MAGIC)] != MAGIC:
+        raise IOError('not a homog xform archive: ' + str(path))
+    header = json.loads(raw[len(MAGIC):].decode())
+    if header['version'] > VERSION:
+        raise IOError('archive version %i is newer than supported %i' %
+                      (header['version'], VERSION))
+    return header
+
+
+def save_archive(path, xforms, layout=None, dtype=None, **kw):
+    """write xforms to a new archive, layout and dtype default to those of
+    the input"""
+    xforms = np.asarray(xforms)
+    layout = layout or hm.xform_layout(xforms)
+    dtype = dtype or xforms.dtype
+    with XformArchive(path, 'w', layout=layout, dtype=dtype, **kw) as arc:
+        arc.append(xforms)
+
+
+def load_archive(path, mode='r'):
+    return XformArchive(path, mode)
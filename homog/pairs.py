@@ -0,0 +1,152 @@
+"""all-pairs relative xforms hinv(a[i]) @ b[j], reduced tile by tile
+
+the (n, m, 4, 4) array of relative xforms between two large sets of rigid
+xforms / stubs doesn't fit in memory, and is usually reduced right away to
+an axis and angle, a bin key or a yes / no. pair_map and pair_hits compute
+it in tiles of at most tilesize x tilesize pairs, hand each tile to a
+reducer and keep only the reduced output. Tiles run in a thread pool of
+parallel.get_num_threads() threads; the tile kernel releases the GIL, and
+so do most numpy reducers, at least in part.
+
+reducers are plain callables on a (n, m, 4, 4) tile, e.g. homog.axis_angle_of
+or XformBinner(...).key for pair_map, within(...) for pair_hits."""
+
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from homog import homog as hm
+from homog import parallel
+from homog.util import jit
+
+
+def pair_xforms(a, b, out=None, use_numba='auto'):
+    """(n, m, 4, 4) relative xforms hinv(a[i]) @ b[j] of rigid (n, 4, 4) a
+    and (m, 4, 4) b, for a single tile"""
+    a, b = _xforms(a), _xforms(b)
+    dtype = np.result_type(a, b)
+    if out is None: out = np.empty((len(a), len(b), 4, 4), dtype=dtype)
+    if use_numba == 'auto': use_numba = _kernel_pair_xforms is not None
+    if use_numba:
+        _kernel_pair_xforms(a.astype(dtype, copy=False),
+                            b.astype(dtype, copy=False), out)
+        return out
+    return hm.hinv_compose(a[:, None], b[None], out=out)
+
+
+def pair_map(a, b, reducer, tilesize=256, nthreads=None, use_numba='auto'):
+    """reducer applied to all pairs, reducer(rel) maps a (n, m, 4, 4) tile to
+    an array (or tuple of arrays) with leading dims (n, m), assembled into
+    (len(a), len(b), ...) outputs
+
+    >>> axis, ang = pair_map(stubs_a, stubs_b, homog.axis_angle_of)
+    >>> keys = pair_map(stubs_a, stubs_b, XformBinner(1, 15).key)"""
+    a, b = _xforms(a), _xforms(b)
+    tiles = _tiles(len(a), len(b), tilesize)
+    if not tiles: return reducer(pair_xforms(a, b, use_numba=use_numba))
+    first = _reduce(a, b, tiles[0], reducer, use_numba)
+    istuple = isinstance(first, tuple)
+    first = first if istuple else (first, )
+    out = tuple(
+        np.empty((len(a), len(b)) + r.shape[2:], dtype=r.dtype)
+        for r in first)
+
+    def work(tile, result=None):
+        if result is None: result = _reduce(a, b, tile, reducer, use_numba)
+        result = result if isinstance(result, tuple) else (result, )
+        for o, r in zip(out, result):
+            o[tile] = r
+
+    work(tiles[0], first)
+    _run(work, tiles[1:], nthreads)
+    return out if istuple else out[0]
+
+
+def pair_hits(a, b, select, tilesize=256, nthreads=None, use_numba='auto'):
+    """sparse (i, j, *values) of the pairs picked by select, sorted by i then
+    j. select(rel) maps a (n, m, 4, 4) tile to a (n, m) bool mask or to a
+    tuple (mask, *values), values with leading dims (n, m)
+
+    >>> i, j = pair_hits(stubs_a, stubs_b, within(cart=5, ori=0.3))"""
+    a, b = _xforms(a), _xforms(b)
+
+    def work(tile):
+        result = _reduce(a, b, tile, select, use_numba)
+        mask, *values = result if isinstance(result, tuple) else (result, )
+        i, j = np.nonzero(mask)
+        hits = [i + tile[0].start, j + tile[1].start]
+        return hits + [v[mask] for v in values]
+
+    results = _run(work, _tiles(len(a), len(b), tilesize), nthreads)
+    if not results: return work((slice(0, 0), slice(0, 0)))
+    hits = [np.concatenate(h) for h in zip(*results)]
+    order = np.lexsort((hits[1], hits[0]))
+    return tuple(h[order] for h in hits)
+
+
+def within(cart=None, ori=None):
+    """select for pair_hits: translation within cart and rotation angle
+    (radians) within ori, either may be None"""
+
+    cart2 = np.inf if cart is None else cart * cart
+    mintrace = -np.inf if ori is None else 1 + 2 * np.cos(ori)
+
+    def select(rel):
+        if _kernel_within is not None and rel.ndim == 4:
+            mask = np.empty(rel.shape[:-2], dtype='?')
+            _kernel_within(rel, cart2, mintrace, mask)
+            return mask
+        trace = rel[..., 0, 0] + rel[..., 1, 1] + rel[..., 2, 2]
+        return ((np.sum(rel[..., :3, 3]**2, axis=-1) <= cart2) &
+                (trace >= mintrace))
+
+    return select
+
+
+def _xforms(x):
+    x = hm.hexpand(x)
+    if x.ndim != 3: raise ValueError('need (n, 4, 4) xforms')
+    return x
+
+
+def _tiles(n, m, tilesize):
+    return [(slice(i, min(i + tilesize, n)), slice(j, min(j + tilesize, m)))
+            for i in range(0, n, tilesize) for j in range(0, m, tilesize)]
+
+
+def _reduce(a, b, tile, reducer, use_numba):
+    return reducer(pair_xforms(a[tile[0]], b[tile[1]], use_numba=use_numba))
+
+
+def _run(work, tiles, nthreads):
+    nthreads = nthreads or parallel.get_num_threads()
+    if nthreads == 1 or len(tiles) < 2: return [work(t) for t in tiles]
+    with ThreadPoolExecutor(nthreads) as pool:
+        return list(pool.map(work, tiles))
+
+
+@jit
+def _kernel_pair_xforms(a, b, out):
+    ainv = np.empty((3, 4), dtype=out.dtype)
+    for i in range(len(a)):
+        for r in range(3):
+            for c in range(3):
+                ainv[r, c] = a[i, c, r]
+            ainv[r, 3] = -(a[i, 0, r] * a[i, 0, 3] + a[i, 1, r] * a[i, 1, 3] +
+                           a[i, 2, r] * a[i, 2, 3])
+        for j in range(len(b)):
+            for r in range(3):
+                for c in range(4):
+                    out[i, j, r, c] = (ainv[r, 0] * b[j, 0, c] +
+                                       ainv[r, 1] * b[j, 1, c] +
+                                       ainv[r, 2] * b[j, 2, c])
+                out[i, j, r, 3] += ainv[r, 3]
+            out[i, j, 3, 0] = out[i, j, 3, 1] = out[i, j, 3, 2] = 0
+            out[i, j, 3, 3] = 1
+
+
+@jit
+def _kernel_within(rel, cart2, mintrace, mask):
+    for i in range(rel.shape[0]):
+        for j in range(rel.shape[1]):
+            t2 = rel[i, j, 0, 3]**2 + rel[i, j, 1, 3]**2 + rel[i, j, 2, 3]**2
+            trace = rel[i, j, 0, 0] + rel[i, j, 1, 1] + rel[i, j, 2, 2]
+            mask[i, j] = t2 <= cart2 and trace >= mintrace
@@ -0,0 +1,187 @@
+"""multi-core versions of the batch functions in homog.homog and homog.quat
+
+with numba available the default backend runs prange loops over the
+per-element kernel_* functions; otherwise (or with backend='threads') the
+NumPy implementations are run on chunks in a ThreadPoolExecutor, which
+parallelizes because NumPy releases the GIL inside array operations."""
+
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from homog import homog as hm
+from homog import quat
+from homog.util import jit_parallel, prange
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+_num_threads = os.cpu_count() or 1
+
+
+def set_num_threads(n):
+    """threads used by both backends, capped by numba's NUMBA_NUM_THREADS"""
+    global _num_threads
+    _num_threads = max(1, int(n))
+    if default_backend() == 'numba':
+        nmax = numba.config.NUMBA_NUM_THREADS
+        numba.set_num_threads(min(_num_threads, nmax))
+
+
+def get_num_threads():
+    return _num_threads
+
+
+def default_backend():
+    return 'numba' if _prange_axis_angle is not None else 'threads'
+
+
+def threaded(func, *arrays, chunksize=2**14, nthreads=None):
+    """run func on chunks of arrays along axis 0 in a thread pool
+
+    arrays must share the length of axis 0 (or have length 1 to broadcast);
+    outputs, or each member of a tuple of outputs, are concatenated along
+    axis 0"""
+    arrays = [np.asarray(a) for a in arrays]
+    n = max(len(a) if a.ndim else 1 for a in arrays)
+    nthreads = nthreads or _num_threads
+    if nthreads == 1 or n <= chunksize:
+        return func(*arrays)
+    bounds = [(lb, min(lb + chunksize, n)) for lb in range(0, n, chunksize)]
+
+    def work(b):
+        return func(*(a[b[0]:b[1]] if a.ndim and len(a) == n else a
+                      for a in arrays))
+
+    with ThreadPoolExecutor(nthreads) as pool:
+        results = list(pool.map(work, bounds))
+    if isinstance(results[0], tuple):
+        return tuple(np.concatenate(r) for r in zip(*results))
+    return np.concatenate(results)
+
+
+def _flat_inputs(arrays, tails):
+    arrays = [np.asarray(a) for a in arrays]
+    shape = np.broadcast_shapes(*(a.shape[:a.ndim - len(t)]
+                                  for a, t in zip(arrays, tails)))
+    flat = [
+        np.ascontiguousarray(np.broadcast_to(a, shape + t)).reshape(-1, *t)
+        for a, t in zip(arrays, tails)
+    ]
+    return shape, flat
+
+
+@jit_parallel
+def _prange_axis_angle(xforms, axis, ang):
+    for i in prange(len(xforms)):
+        hm.kernel_axis_angle(xforms[i], axis[i], ang[i:i + 1])
+
+
+@jit_parallel
+def _prange_axis_angle_cen(xforms, axis, ang, cen):
+    for i in prange(len(xforms)):
+        hm.kernel_axis_angle_cen(xforms[i], axis[i], ang[i:i + 1], cen[i])
+
+
+@jit_parallel
+def _prange_rot_to_quat(xforms, quats):
+    for i in prange(len(xforms)):
+        quat.kernel_rot_to_quat(xforms[i], quats[i])
+
+
+@jit_parallel
+def _prange_line_line_distance(ray1, ray2, dist):
+    for i in prange(len(ray1)):
+        hm.kernel_line_line_distance_pa(ray1[i, :, 0], ray1[i, :, 1],
+                                        ray2[i, :, 0], ray2[i, :, 1],
+                                        dist[i:i + 1])
+
+
+@jit_parallel
+def _prange_intersect_planes(plane1, plane2, isect, status):
+    for i in prange(len(plane1)):
+        status[i] = hm.kernel_intersect_planes(plane1[i], plane2[i], isect[i])
+
+
+@jit_parallel
+def _prange_hxform(xforms, pts, out):
+    for i in prange(len(xforms)):
+        hm.kernel_hxform(xforms[i], pts[i], out[i])
+
+
+def _backend(backend):
+    backend = backend or default_backend()
+    if backend not in ('numba', 'threads'):
+        raise ValueError('unknown backend: ' + str(backend))
+    if backend == 'numba' and default_backend() != 'numba':
+        raise ValueError('numba backend not available')
+    return backend
+
+
+def axis_angle_of(xforms, backend=None):
+    if _backend(backend) == 'threads':
+        return threaded(hm.axis_angle_of, xforms)
+    shape, (x, ) = _flat_inputs([xforms], [(4, 4)])
+    axis = np.empty((len(x), 4), dtype=x.dtype)
+    ang = np.empty(len(x), dtype=x.dtype)
+    _prange_axis_angle(x, axis, ang)
+    return axis.reshape(shape + (4, )), ang.reshape(shape)
+
+
+def axis_ang_cen_of(xforms, backend=None):
+    if _backend(backend) == 'threads':
+        return threaded(hm.axis_ang_cen_of, xforms)
+    shape, (x, ) = _flat_inputs([xforms], [(4, 4)])
+    axis = np.empty((len(x), 4), dtype=x.dtype)
+    ang = np.empty(len(x), dtype=x.dtype)
+    cen = np.empty((len(x), 4), dtype=x.dtype)
+    _prange_axis_angle_cen(x, axis, ang, cen)
+    return (axis.reshape(shape + (4, )), ang.reshape(shape),
+            cen.reshape(shape + (4, )))
+
+
+def rot_to_quat(xforms, backend=None):
+    if _backend(backend) == 'threads':
+        return threaded(quat.rot_to_quat, xforms)
+    xforms = np.asarray(xforms)
+    shape, (x, ) = _flat_inputs([xforms], [xforms.shape[-2:]])
+    quats = np.empty((len(x), 4), dtype=x.dtype)
+    _prange_rot_to_quat(x, quats)
+    return quats.reshape(shape + (4, ))
+
+
+def quat_to_xform(quats, backend=None):
+    # pure elementwise arithmetic, threads are as good as a kernel here
+    return threaded(quat.quat_to_xform, quats)
+
+
+def line_line_distance(ray1, ray2, backend=None):
+    if _backend(backend) == 'threads':
+        return threaded(hm.line_line_distance, ray1, ray2)
+    shape, (r1, r2) = _flat_inputs([ray1, ray2], [(4, 2), (4, 2)])
+    dist = np.empty(len(r1), dtype=r1.dtype)
+    _prange_line_line_distance(r1, r2, dist)
+    return dist.reshape(shape)
+
+
+def intersect_planes(plane1, plane2, backend=None):
+    """like homog.intersect_planes, but status doesn't distinguish coincident
+    planes (2) from parallel ones (1) with the numba backend"""
+    if _backend(backend) == 'threads':
+        return threaded(hm.intersect_planes, plane1, plane2)
+    shape, (p1, p2) = _flat_inputs([plane1, plane2], [(4, 2), (4, 2)])
+    isect = np.empty((len(p1), 4, 2), dtype=p1.dtype)
+    status = np.empty(len(p1), dtype='i8')
+    _prange_intersect_planes(p1, p2, isect, status)
+    return isect.reshape(shape + (4, 2)), status.reshape(shape)
+
+
+def hxform(xforms, pts, backend=None):
+    pts = hm.hpoint(pts)
+    if _backend(backend) == 'threads':
+        return threaded(hm.hxform, xforms, pts)
+    shape, (x, p) = _flat_inputs([xforms, pts], [(4, 4), (4, )])
+    out = np.empty((len(x), 4), dtype=np.result_type(x, p))
+    _prange_hxform(x, p.astype(out.dtype), out)
+    return out.reshape(shape + (4, ))
@@ -1,26 +1,31 @@
 import numpy as np
-from homog.util import jit, guvec, float32, float64
+from homog.util import jit, guvec, float32, float64, resolve_dtype, as_rng
 
 
-def is_valid_quat_rot(quat):
-    assert quat.shape[-1] == 4
-    return np.isclose(1, np.linalg.norm(quat, axis=-1))
+def is_valid_quat_rot(quat, atol=1e-5):
+    """per quat mask, True where the quat is unit within atol"""
+    return quat_error(quat) <= atol
+
+
+def quat_error(quat):
+    """deviation of (..., 4) quats from unit length"""
+    quat = np.asarray(quat)
+    if quat.shape[-1] != 4: raise ValueError('quats must be (..., 4)')
+    return np.abs(np.linalg.norm(quat, axis=-1) - 1)
 
 
-def quat_to_upper_half(quat):
+def quat_to_upper_half(quat, out=None):
+    quat = np.asarray(quat)
     ineg0 = (quat[..., 0] < 0)
     ineg1 = (quat[..., 0] == 0) * (quat[..., 1] < 0)
     ineg2 = (quat[..., 0] == 0) * (quat[..., 1] == 0) * (quat[..., 2] < 0)
     ineg3 = ((quat[..., 0] == 0) * (quat[..., 1] == 0) * (quat[..., 2] == 0) *
              (quat[..., 3] < 0))
-    # print(ineg0.shape)
-    # print(ineg1.shape)
-    # print(ineg2.shape)
-    # print(ineg3.shape)
     ineg = ineg0 + ineg1 + ineg2 + ineg3
-    quat = quat.copy()
-    quat[ineg] = -quat[ineg]
-    return quat
+    if out is None: out = quat.copy()
+    elif out is not quat: out[...] = quat
+    np.negative(out, out=out, where=ineg[..., None])
+    return out
 
 
 @jit
@@ -41,51 +46,54 @@ def numba_quat_to_upper_half(quat):
     return ret
 
 
-def rand_quat(shape=()):
+def rand_quat(shape=(), dtype=None, rng=None):
     if isinstance(shape, int): shape = (shape, )
-    q = np.random.randn(*shape, 4)
+    q = as_rng(rng).standard_normal(shape + (4, ))
+    q = q.astype(resolve_dtype(dtype))
     q /= np.linalg.norm(q, axis=-1)[..., np.newaxis]
     return quat_to_upper_half(q)
 
 
-def rot_to_quat(xform):
+# numerators of each quat component for the four trace cases of
+# rot_to_quat, indexing [radicand, antisym(3), sym(3)] as built there
+_rot_to_quat_table = np.array([
+    [0, 1, 2, 3],
+    [1, 0, 4, 5],
+    [2, 4, 0, 6],
+    [3, 5, 6, 0],
+])
+_rot_to_quat_signs = np.array([
+    [1, 1, 1],
+    [1, -1, -1],
+    [-1, 1, -1],
+    [-1, -1, 1],
+], dtype='f4')
+
+
+def rot_to_quat(xform, dtype=None, out=None):
+    """rotation part of (..., 3|4, 3|4) xforms to upper half unit quats
+
+    all four trace cases are evaluated in one pass without boolean masks:
+    case picks the numerically stable radicand, then each component is a
+    gather from [radicand, antisymmetric part, symmetric part] / S"""
     x = np.asarray(xform)
     t0, t1, t2 = x[..., 0, 0], x[..., 1, 1], x[..., 2, 2]
-    tr = t0 + t1 + t2
-    quat = np.empty(x.shape[:-2] + (4, ))
-
-    case0 = tr > 0
-    S0 = np.sqrt(tr[case0] + 1) * 2
-    quat[case0, 0] = 0.25 * S0
-    quat[case0, 1] = (x[case0, 2, 1] - x[case0, 1, 2]) / S0
-    quat[case0, 2] = (x[case0, 0, 2] - x[case0, 2, 0]) / S0
-    quat[case0, 3] = (x[case0, 1, 0] - x[case0, 0, 1]) / S0
-
-    case1 = ~case0 * (t0 >= t1) * (t0 >= t2)
-    S1 = np.sqrt(1.0 + x[case1, 0, 0] - x[case1, 1, 1] - x[case1, 2, 2]) * 2
-    quat[case1, 0] = (x[case1, 2, 1] - x[case1, 1, 2]) / S1
-    quat[case1, 1] = 0.25 * S1
-    quat[case1, 2] = (x[case1, 0, 1] + x[case1, 1, 0]) / S1
-    quat[case1, 3] = (x[case1, 0, 2] + x[case1, 2, 0]) / S1
-
-    case2 = ~case0 * (t1 > t0) * (t1 >= t2)
-    S2 = np.sqrt(1.0 + x[case2, 1, 1] - x[case2, 0, 0] - x[case2, 2, 2]) * 2
-    quat[case2, 0] = (x[case2, 0, 2] - x[case2, 2, 0]) / S2
-    quat[case2, 1] = (x[case2, 0, 1] + x[case2, 1, 0]) / S2
-    quat[case2, 2] = 0.25 * S2
-    quat[case2, 3] = (x[case2, 1, 2] + x[case2, 2, 1]) / S2
-
-    case3 = ~case0 * (t2 > t0) * (t2 > t1)
-    S3 = np.sqrt(1.0 + x[case3, 2, 2] - x[case3, 0, 0] - x[case3, 1, 1]) * 2
-    quat[case3, 0] = (x[case3, 1, 0] - x[case3, 0, 1]) / S3
-    quat[case3, 1] = (x[case3, 0, 2] + x[case3, 2, 0]) / S3
-    quat[case3, 2] = (x[case3, 1, 2] + x[case3, 2, 1]) / S3
-    quat[case3, 3] = 0.25 * S3
-
-    assert (np.sum(case0) + np.sum(case1) + np.sum(case2) +
-            np.sum(case3) == np.prod(xform.shape[:-2]))
-
-    return quat_to_upper_half(quat)
+    case = np.where(t0 >= t1, np.where(t0 >= t2, 1, 3),
+                    np.where(t1 >= t2, 2, 3))
+    case[t0 + t1 + t2 > 0] = 0
+    s0, s1, s2 = np.moveaxis(_rot_to_quat_signs[case], -1, 0)
+    num = np.empty(x.shape[:-2] + (7, ), dtype=resolve_dtype(dtype, x))
+    num[..., 0] = 1 + s0 * t0 + s1 * t1 + s2 * t2
+    num[..., 1] = x[..., 2, 1] - x[..., 1, 2]
+    num[..., 2] = x[..., 0, 2] - x[..., 2, 0]
+    num[..., 3] = x[..., 1, 0] - x[..., 0, 1]
+    num[..., 4] = x[..., 0, 1] + x[..., 1, 0]
+    num[..., 5] = x[..., 0, 2] + x[..., 2, 0]
+    num[..., 6] = x[..., 1, 2] + x[..., 2, 1]
+    S = 2 * np.sqrt(num[..., 0, None])
+    quat = np.take_along_axis(num, _rot_to_quat_table[case], axis=-1)
+    quat = np.divide(quat, S, out=out if out is not None else quat)
+    return quat_to_upper_half(quat, out=quat)
 
 
 xform_to_quat = rot_to_quat
@@ -93,33 +101,35 @@ xform_to_quat = rot_to_quat
 
 @jit
 def kernel_rot_to_quat(xform, quat):
+    quat[0], quat[1], quat[2], quat[3] = scalar_rot_to_quat(xform)
+    kernel_quat_to_upper_half(quat, quat)
+
+
+@jit
+def scalar_rot_to_quat(xform):
+    """(w, x, y, z) of the rotation part of xform, either sign, for kernels
+    that keep the quat in scalar locals"""
     t0, t1, t2 = xform[0, 0], xform[1, 1], xform[2, 2]
     tr = t0 + t1 + t2
     if tr > 0:
         S0 = np.sqrt(tr + 1) * 2
-        quat[0] = 0.25 * S0
-        quat[1] = (xform[2, 1] - xform[1, 2]) / S0
-        quat[2] = (xform[0, 2] - xform[2, 0]) / S0
-        quat[3] = (xform[1, 0] - xform[0, 1]) / S0
+        return (0.25 * S0, (xform[2, 1] - xform[1, 2]) / S0,
+                (xform[0, 2] - xform[2, 0]) / S0,
+                (xform[1, 0] - xform[0, 1]) / S0)
     elif t0 >= t1 and t0 >= t2:
         S1 = np.sqrt(1.0 + xform[0, 0] - xform[1, 1] - xform[2, 2]) * 2
-        quat[0] = (xform[2, 1] - xform[1, 2]) / S1
-        quat[1] = 0.25 * S1
-        quat[2] = (xform[0, 1] + xform[1, 0]) / S1
-        quat[3] = (xform[0, 2] + xform[2, 0]) / S1
+        return ((xform[2, 1] - xform[1, 2]) / S1, 0.25 * S1,
+                (xform[0, 1] + xform[1, 0]) / S1,
+                (xform[0, 2] + xform[2, 0]) / S1)
     elif t1 > t0 and t1 >= t2:
         S2 = np.sqrt(1.0 + xform[1, 1] - xform[0, 0] - xform[2, 2]) * 2
-        quat[0] = (xform[0, 2] - xform[2, 0]) / S2
-        quat[1] = (xform[0, 1] + xform[1, 0]) / S2
-        quat[2] = 0.25 * S2
-        quat[3] = (xform[1, 2] + xform[2, 1]) / S2
-    elif t2 > t0 and t2 > t1:
-        S3 = np.sqrt(1.0 + xform[2, 2] - xform[0, 0] - xform[1, 1]) * 2
-        quat[0] = (xform[1, 0] - xform[0, 1]) / S3
-        quat[1] = (xform[0, 2] + xform[2, 0]) / S3
-        quat[2] = (xform[1, 2] + xform[2, 1]) / S3
-        quat[3] = 0.25 * S3
-    kernel_quat_to_upper_half(quat, quat)
+        return ((xform[0, 2] - xform[2, 0]) / S2,
+                (xform[0, 1] + xform[1, 0]) / S2, 0.25 * S2,
+                (xform[1, 2] + xform[2, 1]) / S2)
+    S3 = np.sqrt(1.0 + xform[2, 2] - xform[0, 0] - xform[1, 1]) * 2
+    return ((xform[1, 0] - xform[0, 1]) / S3,
+            (xform[0, 2] + xform[2, 0]) / S3,
+            (xform[1, 2] + xform[2, 1]) / S3, 0.25 * S3)
 
 
 @jit
@@ -135,15 +145,20 @@ gu_rot_to_quat = guvec([
 ], '(n,n)->(n)', kernel_rot_to_quat)
 
 
-def quat_to_rot(quat, dtype='f8', shape=(3, 3)):
+def quat_to_rot(quat, dtype=None, shape=(3, 3), out=None):
     quat = np.asarray(quat)
+    dtype = resolve_dtype(dtype, quat)
     assert quat.shape[-1] == 4
     qr = quat[..., 0]
     qi = quat[..., 1]
     qj = quat[..., 2]
     qk = quat[..., 3]
     outshape = quat.shape[:-1]
-    rot = np.zeros(outshape + shape, dtype=dtype)
+    if out is None:
+        rot = np.zeros(outshape + shape, dtype=dtype)
+    else:
+        rot = out
+        rot[...] = 0
     rot[..., 0, 0] = 1 - 2 * (qj**2 + qk**2)
     rot[..., 0, 1] = 2 * (qi * qj - qk * qr)
     rot[..., 0, 2] = 2 * (qi * qk + qj * qr)
@@ -156,23 +171,226 @@ def quat_to_rot(quat, dtype='f8', shape=(3, 3)):
     return rot
 
 
-def quat_to_xform(quat, dtype='f8'):
-    r = quat_to_rot(quat, dtype, shape=(4, 4))
+def quat_to_xform(quat, dtype=None, out=None):
+    r = quat_to_rot(quat, dtype, (4, 4), out)
     r[..., 3, 3] = 1
     return r
 
 
-def quat_multiply(q, r):
-    q, r = np.broadcast_arrays(q, r)
+def quat_multiply(q, r, out=None, use_numba='auto'):
+    """hamilton product q r of broadcasting (..., 4) quat arrays
+
+    float inputs go through gu_quat_multiply when numba is available. out may
+    be q or r for in place accumulation"""
+    q, r = np.asarray(q), np.asarray(r)
+    dtype = np.result_type(q, r)
+    if use_numba == 'auto':
+        use_numba = (gu_quat_multiply is not None
+                     and dtype in (np.float32, np.float64))
+    if use_numba:
+        q, r = q.astype(dtype, copy=False), r.astype(dtype, copy=False)
+        if out is None: return gu_quat_multiply(q, r)
+        return gu_quat_multiply(q, r, out=out)
+    if out is None:
+        out = np.empty(np.broadcast_shapes(q.shape, r.shape), dtype=dtype)
     q0, q1, q2, q3 = np.moveaxis(q, -1, 0)
     r0, r1, r2, r3 = np.moveaxis(r, -1, 0)
-    assert np.all(q1 == q[..., 1])
-    t = np.empty_like(q)
-    t[..., 0] = r0 * q0 - r1 * q1 - r2 * q2 - r3 * q3
-    t[..., 1] = r0 * q1 + r1 * q0 - r2 * q3 + r3 * q2
-    t[..., 2] = r0 * q2 + r1 * q3 + r2 * q0 - r3 * q1
-    t[..., 3] = r0 * q3 - r1 * q2 + r2 * q1 + r3 * q0
-    return t
+    # all terms before any write, out may alias q or r
+    t0 = r0 * q0 - r1 * q1 - r2 * q2 - r3 * q3
+    t1 = r0 * q1 + r1 * q0 - r2 * q3 + r3 * q2
+    t2 = r0 * q2 + r1 * q3 + r2 * q0 - r3 * q1
+    t3 = r0 * q3 - r1 * q2 + r2 * q1 + r3 * q0
+    out[..., 0], out[..., 1], out[..., 2], out[..., 3] = t0, t1, t2, t3
+    return out
+
+
+def quat_prod(quats, axis=0, use_numba='auto'):
+    """ordered product q[0] q[1] ... q[n-1] along axis, composing a chain"""
+    quats = np.moveaxis(np.asarray(quats), axis, -2)
+    if use_numba == 'auto':
+        use_numba = (gu_quat_prod is not None
+                     and quats.dtype in (np.float32, np.float64))
+    if use_numba: return gu_quat_prod(quats)
+    if quats.shape[-2] == 0:
+        out = np.zeros(quats.shape[:-2] + (4, ), dtype=quats.dtype)
+        out[..., 0] = 1
+        return out
+    # pairwise tree, log2(n) vectorized multiplies; product is associative
+    while quats.shape[-2] > 1:
+        n = quats.shape[-2]
+        prod = quat_multiply(quats[..., 0:n - 1:2, :], quats[..., 1::2, :],
+                             use_numba=False)
+        if n % 2: prod = np.concatenate([prod, quats[..., -1:, :]], axis=-2)
+        quats = prod
+    return quats[..., 0, :]
+
+
+def quat_cumprod(quats, axis=0, out=None, use_numba='auto'):
+    """running products q[0], q[0] q[1], ... along axis. out may be quats"""
+    quats = np.asarray(quats)
+    if out is None: out = np.empty(quats.shape, dtype=quats.dtype)
+    qv, ov = np.moveaxis(quats, axis, -2), np.moveaxis(out, axis, -2)
+    if use_numba == 'auto':
+        use_numba = (gu_quat_cumprod is not None
+                     and quats.dtype in (np.float32, np.float64))
+    if use_numba:
+        gu_quat_cumprod(qv, out=ov)
+        return out
+    # hillis-steele scan, log2(n) vectorized multiplies
+    ov[...] = qv
+    k = 1
+    while k < ov.shape[-2]:
+        ov[..., k:, :] = quat_multiply(ov[..., :-k, :], ov[..., k:, :],
+                                       use_numba=False)
+        k *= 2
+    return out
+
+
+def quat_rotate(quat, vec, out=None):
+    """rotate (..., 3) or (..., 4) vectors by unit quats, w component kept"""
+    quat, vec = np.asarray(quat), np.asarray(vec)
+    qw, qv = quat[..., 0, None], quat[..., 1:]
+    v = vec[..., :3]
+    t = 2 * np.cross(qv, v)
+    rotated = v + qw * t + np.cross(qv, t)
+    if out is None:
+        shape = np.broadcast(quat[..., 0], vec[..., 0]).shape
+        out = np.empty(shape + vec.shape[-1:],
+                       dtype=np.result_type(quat, vec))
+    if vec.shape[-1] == 4: out[..., 3] = vec[..., 3]
+    out[..., :3] = rotated
+    return out
+
+
+def xform_to_qt(xform, dtype=None):
+    """(..., 4, 4) or (..., 3, 4) xforms to (..., 7) quat + translation"""
+    xform = np.asarray(xform)
+    q = rot_to_quat(xform, dtype)
+    return np.concatenate([q, xform[..., :3, 3].astype(q.dtype)], axis=-1)
+
+
+def qt_to_xform(qt, dtype=None, shape=(4, 4)):
+    """(..., 7) quat + translation to (..., 4, 4) or shape=(3, 4) xforms"""
+    qt = np.asarray(qt)
+    x = quat_to_rot(qt[..., :4], dtype, shape=shape)
+    x[..., :3, 3] = qt[..., 4:]
+    if shape[0] == 4: x[..., 3, 3] = 1
+    return x
+
+
+def qt_inv(qt, out=None):
+    qt = np.asarray(qt)
+    if out is None: out = np.empty(qt.shape, dtype=qt.dtype)
+    t = -quat_rotate(quat_conj(qt[..., :4]), qt[..., 4:])
+    out[..., 0] = qt[..., 0]
+    out[..., 1:4] = -qt[..., 1:4]
+    out[..., 4:] = t
+    return out
+
+
+def qt_compose(a, b, out=None):
+    """qt equivalent of xform(a) @ xform(b)"""
+    a, b = np.asarray(a), np.asarray(b)
+    t = quat_rotate(a[..., :4], b[..., 4:]) + a[..., 4:]
+    q = quat_multiply(a[..., :4], b[..., :4])
+    if out is None:
+        out = np.empty(q.shape[:-1] + (7, ), dtype=q.dtype)
+    out[..., :4] = q
+    out[..., 4:] = t
+    return out
+
+
+def qt_xform(qt, pts, out=None):
+    """apply qt xforms to (..., 4) points/vectors (or (..., 3) points)"""
+    qt, pts = np.asarray(qt), np.asarray(pts)
+    if pts.shape[-1] == 3:
+        ones = np.ones(pts.shape[:-1] + (1, ), dtype=pts.dtype)
+        pts = np.concatenate([pts, ones], axis=-1)
+    rotated = quat_rotate(qt[..., :4], pts)
+    if out is None: out = rotated
+    else: out[...] = rotated
+    out[..., :3] += qt[..., 4:] * pts[..., 3, None]
+    return out
+
+
+def quat_conj(quat, out=None):
+    quat = np.asarray(quat)
+    if out is None: out = np.empty(quat.shape, dtype=quat.dtype)
+    out[..., 0] = quat[..., 0]
+    np.negative(quat[..., 1:], out=out[..., 1:])
+    return out
+
+
+def quat_inv(quat, out=None):
+    """inverse of any nonzero quat, equal to quat_conj for unit quats"""
+    quat = np.asarray(quat)
+    out = quat_conj(quat, out)
+    out /= np.sum(quat * quat, axis=-1)[..., None]
+    return out
+
+
+def quat_log(quat):
+    """(log|q|, theta * axis) for q = |q| (cos theta, sin theta axis)
+
+    the vector part is half the rotation vector of a unit quat. q = -|q|
+    has no defined axis and maps to a zero vector part"""
+    quat = np.asarray(quat)
+    vnorm = np.linalg.norm(quat[..., 1:], axis=-1)
+    theta = np.arctan2(vnorm, quat[..., 0])
+    ok = vnorm > np.finfo(vnorm.dtype).eps
+    scale = np.where(ok, theta / np.where(ok, vnorm, 1), 1 / quat[..., 0])
+    out = np.empty(quat.shape, dtype=theta.dtype)
+    out[..., 0] = np.log(np.linalg.norm(quat, axis=-1))
+    out[..., 1:] = quat[..., 1:] * scale[..., None]
+    return out
+
+
+def quat_exp(quat):
+    quat = np.asarray(quat)
+    vnorm = np.linalg.norm(quat[..., 1:], axis=-1)
+    mag = np.exp(quat[..., 0])
+    out = np.empty(quat.shape, dtype=mag.dtype)
+    out[..., 0] = mag * np.cos(vnorm)
+    # np.sinc(x / pi) is sin(x) / x, well behaved at 0
+    sinc = np.sinc(vnorm / np.pi).astype(mag.dtype)
+    out[..., 1:] = quat[..., 1:] * (mag * sinc)[..., None]
+    return out
+
+
+def quat_power(quat, t):
+    """quat**t, for unit quats a rotation by t times the angle"""
+    return quat_exp(quat_log(quat) * np.asarray(t)[..., None])
+
+
+def _interp_setup(q0, q1, t, shortest):
+    q0, q1, t = np.asarray(q0), np.asarray(q1), np.asarray(t)
+    dot = np.sum(q0 * q1, axis=-1)
+    if shortest:
+        q1 = np.where(dot[..., None] < 0, -q1, q1)
+        dot = np.abs(dot)
+    return q0, q1, t, dot
+
+
+def quat_nlerp(q0, q1, t, shortest=True):
+    """normalized linear interpolation, broadcasting over q0, q1 and t"""
+    q0, q1, t, dot = _interp_setup(q0, q1, t, shortest)
+    t = t[..., None]
+    q = (1 - t) * q0 + t * q1
+    return q / np.linalg.norm(q, axis=-1)[..., None]
+
+
+def quat_slerp(q0, q1, t, shortest=True):
+    """spherical linear interpolation of unit quats, broadcasting over q0, q1
+    and t. shortest takes the short way around by flipping q1 if needed"""
+    q0, q1, t, dot = _interp_setup(q0, q1, t, shortest)
+    theta = np.arccos(np.clip(dot, -1, 1))
+    sin = np.sin(theta)
+    near = sin < 1e-6  # nearly identical, fall back to nlerp weights
+    sin = np.where(near, 1, sin)
+    w0 = np.where(near, 1 - t, np.sin((1 - t) * theta) / sin)
+    w1 = np.where(near, t, np.sin(t * theta) / sin)
+    q = w0[..., None] * q0 + w1[..., None] * q1
+    return q / np.linalg.norm(q, axis=-1)[..., None]
 
 
 @jit
@@ -185,8 +403,10 @@ def kernel_quat_multiply(q, r, out):
     out[3] = r0 * q3 - r1 * q2 + r2 * q1 + r3 * q0
 
 
-gu_quat_multiply = guvec([(float64[:], float64[:], float64[:])],
-                         '(n),(n)->(n)', kernel_quat_multiply)
+gu_quat_multiply = guvec([
+    (float64[:], float64[:], float64[:]),
+    (float32[:], float32[:], float32[:]),
+], '(n),(n)->(n)', kernel_quat_multiply)
 
 
 @jit
@@ -194,3 +414,138 @@ def numba_quat_multiply(q, r):
     out = np.empty(4, dtype=q.dtype)
     kernel_quat_multiply(q, r, out)
     return out
+
+
+@jit
+def kernel_quat_prod(quats, out):
+    out[0], out[1], out[2], out[3] = 1, 0, 0, 0
+    for i in range(len(quats)):
+        kernel_quat_multiply(out, quats[i], out)
+
+
+gu_quat_prod = guvec([
+    (float64[:, :], float64[:]),
+    (float32[:, :], float32[:]),
+], '(m,n)->(n)', kernel_quat_prod)
+
+
+@jit
+def kernel_quat_cumprod(quats, out):
+    if len(quats) == 0: return
+    out[0, :] = quats[0]
+    for i in range(1, len(quats)):
+        kernel_quat_multiply(out[i - 1], quats[i], out[i])
+
+
+gu_quat_cumprod = guvec([
+    (float64[:, :], float64[:, :]),
+    (float32[:, :], float32[:, :]),
+], '(m,n)->(m,n)', kernel_quat_cumprod)
+
+
+@jit
+def kernel_quat_conj(q, out):
+    out[0] = q[0]
+    for i in range(1, 4):
+        out[i] = -q[i]
+
+
+@jit
+def kernel_quat_inv(q, out):
+    n2 = q[0] * q[0] + q[1] * q[1] + q[2] * q[2] + q[3] * q[3]
+    out[0] = q[0] / n2
+    for i in range(1, 4):
+        out[i] = -q[i] / n2
+
+
+@jit
+def kernel_quat_rotate(q, v, out):
+    qw, qx, qy, qz = q[0], q[1], q[2], q[3]
+    vx, vy, vz = v[0], v[1], v[2]
+    tx = 2 * (qy * vz - qz * vy)
+    ty = 2 * (qz * vx - qx * vz)
+    tz = 2 * (qx * vy - qy * vx)
+    out[0] = vx + qw * tx + qy * tz - qz * ty
+    out[1] = vy + qw * ty + qz * tx - qx * tz
+    out[2] = vz + qw * tz + qx * ty - qy * tx
+    for i in range(3, len(v)):
+        out[i] = v[i]
+
+
+@jit
+def kernel_quat_log(q, out):
+    vnorm = np.sqrt(q[1] * q[1] + q[2] * q[2] + q[3] * q[3])
+    norm = np.sqrt(q[0] * q[0] + vnorm * vnorm)
+    theta = np.arctan2(vnorm, q[0])
+    scale = theta / vnorm if vnorm > 1e-12 else 1.0 / q[0]
+    out[0] = np.log(norm)
+    for i in range(1, 4):
+        out[i] = q[i] * scale
+
+
+@jit
+def kernel_quat_exp(q, out):
+    """out may be q, all of q is read before out is written"""
+    w, x, y, z = q[0], q[1], q[2], q[3]
+    vnorm = np.sqrt(x * x + y * y + z * z)
+    mag = np.exp(w)
+    sinc = np.sin(vnorm) / vnorm if vnorm > 1e-12 else 1.0
+    out[0] = mag * np.cos(vnorm)
+    out[1], out[2], out[3] = x * mag * sinc, y * mag * sinc, z * mag * sinc
+
+
+@jit
+def kernel_quat_power(q, t, out):
+    kernel_quat_log(q, out)
+    for i in range(4):
+        out[i] *= t
+    kernel_quat_exp(out, out)
+
+
+@jit
+def kernel_quat_slerp(q0, q1, t, out):
+    dot = q0[0] * q1[0] + q0[1] * q1[1] + q0[2] * q1[2] + q0[3] * q1[3]
+    sign = 1.0
+    if dot < 0:
+        sign, dot = -1.0, -dot
+    theta = np.arccos(min(dot, 1.0))
+    sin = np.sin(theta)
+    if sin < 1e-6:
+        w0, w1 = 1 - t, t
+    else:
+        w0, w1 = np.sin((1 - t) * theta) / sin, np.sin(t * theta) / sin
+    norm2 = 0.0
+    for i in range(4):
+        out[i] = w0 * q0[i] + sign * w1 * q1[i]
+        norm2 += out[i] * out[i]
+    norm = np.sqrt(norm2)
+    for i in range(4):
+        out[i] /= norm
+
+
+def _gu_unary(kernel):
+    return guvec([
+        (float64[:], float64[:]),
+        (float32[:], float32[:]),
+    ], '(n)->(n)', kernel)
+
+
+gu_quat_conj = _gu_unary(kernel_quat_conj)
+gu_quat_inv = _gu_unary(kernel_quat_inv)
+gu_quat_log = _gu_unary(kernel_quat_log)
+gu_quat_exp = _gu_unary(kernel_quat_exp)
+
+gu_quat_rotate = guvec([
+    (float64[:], float64[:], float64[:]),
+    (float32[:], float32[:], float32[:]),
+], '(n),(m)->(m)', kernel_quat_rotate)
+
+gu_quat_power = guvec([
+    (float64[:], float64, float64[:]),
+    (float32[:], float32, float32[:]),
+], '(n),()->(n)', kernel_quat_power)
+
+gu_quat_slerp = guvec([
+    (float64[:], float64[:], float64, float64[:]),
+    (float32[:], float32[:], float32, float32[:]),
+], '(n),(n),()->(n)', kernel_quat_slerp)
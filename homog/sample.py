@@ -0,0 +1,119 @@
+"""random rotations and transforms from np.random.Generator streams
+
+every sampler takes rng, anything np.random.default_rng accepts (a seed,
+SeedSequence or Generator), and out= to fill a preallocated buffer. For
+reproducible multi-process sampling give each worker its own stream from
+spawn_rngs(seed, nworkers) instead of sharing one generator or the global
+np.random state. sample_chunks streams samples through a reusable buffer."""
+
+import numpy as np
+from homog import homog as hm
+from homog import quat
+from homog.util import resolve_dtype
+
+
+def spawn_rngs(seed, n):
+    """n independent Generators, e.g. one per worker, from a single seed"""
+    return [np.random.default_rng(s)
+            for s in np.random.SeedSequence(seed).spawn(n)]
+
+
+def _shape(shape):
+    return (shape, ) if isinstance(shape, int) else tuple(shape)
+
+
+def uniform_quat(shape=(), rng=None, dtype=None, out=None):
+    """unit quats uniform over SO(3), upper half (w >= 0)
+
+    uses shoemake's method, three uniform draws per quat"""
+    rng = np.random.default_rng(rng)
+    shape = _shape(shape)
+    dtype = resolve_dtype(dtype) if out is None else out.dtype
+    if out is None: out = np.empty(shape + (4, ), dtype=dtype)
+    u = rng.random((3, ) + out.shape[:-1], dtype=dtype)
+    r1, r2 = np.sqrt(1 - u[0]), np.sqrt(u[0])
+    u[1:] *= 2 * np.pi
+    out[..., 0] = r2 * np.cos(u[2])
+    out[..., 1] = r1 * np.sin(u[1])
+    out[..., 2] = r1 * np.cos(u[1])
+    out[..., 3] = r2 * np.sin(u[2])
+    return quat.quat_to_upper_half(out, out=out)
+
+
+def uniform_rot(shape=(), rng=None, dtype=None, out=None):
+    """(..., 4, 4) pure rotations uniform over SO(3)"""
+    dtype = resolve_dtype(dtype) if out is None else out.dtype
+    q = uniform_quat(shape if out is None else out.shape[:-2], rng, dtype)
+    return quat.quat_to_xform(q, out=out)
+
+
+def uniform_xform(shape=(), rng=None, cart_sd=1, cart_cen=0, cart_box=None,
+                  layout='x44', dtype=None, out=None):
+    """rigid xforms with rotation uniform over SO(3)
+
+    translations are normal(cart_cen, cart_sd) or, if cart_box is given,
+    uniform in cart_cen +- cart_box per coordinate. layout is 'x44', 'x34'
+    or 'qt' (see homog.xform_layout) and must match out if given"""
+    rng = np.random.default_rng(rng)
+    dtype = resolve_dtype(dtype) if out is None else out.dtype
+    tail = dict(x44=(4, 4), x34=(3, 4), qt=(7, ))[layout]
+    if out is None: out = np.empty(_shape(shape) + tail, dtype=dtype)
+    shape = out.shape[:out.ndim - len(tail)]
+    if layout == 'qt':
+        uniform_quat(shape, rng, out=out[..., :4])
+        trans = out[..., 4:]
+    else:
+        q = uniform_quat(shape, rng, dtype)
+        quat.quat_to_rot(q, out=out)
+        if layout == 'x44': out[..., 3, 3] = 1
+        trans = out[..., :3, 3]
+    if cart_box is None:
+        trans[...] = rng.standard_normal(shape + (3, ), dtype=dtype)
+        trans *= cart_sd
+    else:
+        trans[...] = rng.random(shape + (3, ), dtype=dtype)
+        trans *= 2 * np.asarray(cart_box, dtype=dtype)
+        trans -= cart_box
+    trans += cart_cen
+    return out
+
+
+def perturb(xforms, shape=None, rng=None, ang_sd=0.1, cart_sd=0.1,
+            dtype=None, out=None):
+    """xforms @ delta, delta a small random rigid motion in the local frame
+
+    delta's rotation vector and translation are normal with sdev ang_sd
+    (radians) and cart_sd per coordinate. shape (default xforms' batch shape)
+    broadcasts against the batch shape, e.g. perturb(x, 1000) samples 1000
+    xforms around a single x"""
+    rng = np.random.default_rng(rng)
+    xforms = np.asarray(xforms)
+    dtype = resolve_dtype(dtype, xforms) if out is None else out.dtype
+    if out is None:
+        batch = xforms.shape[:-2] if shape is None else _shape(shape)
+        out = np.empty(
+            np.broadcast_shapes(batch, xforms.shape[:-2]) + (4, 4), dtype)
+    shape = out.shape[:-2]
+    # delta = exp of the tangent vector, w part zero
+    v = np.zeros(shape + (4, ), dtype=dtype)
+    v[..., 1:] = rng.standard_normal(shape + (3, ), dtype=dtype)
+    v[..., 1:] *= ang_sd / 2
+    delta = quat.quat_to_xform(quat.quat_exp(v), dtype=dtype)
+    delta[..., :3, 3] = rng.standard_normal(shape + (3, ), dtype=dtype)
+    delta[..., :3, 3] *= cart_sd
+    return hm.hcompose(xforms.astype(dtype, copy=False), delta, out=out)
+
+
+def sample_chunks(n, chunksize=2**16, sampler=uniform_xform, rng=None, **kw):
+    """yield n samples as chunks of up to chunksize from sampler(m, rng=rng,
+    out=buf, **kw), reusing one buffer. Consume or copy each chunk before
+    asking for the next, it is overwritten"""
+    rng = np.random.default_rng(rng)
+    buf = None
+    for lb in range(0, n, chunksize):
+        m = min(chunksize, n - lb)
+        if buf is None:
+            buf = sampler(m, rng=rng, **kw)
+            yield buf
+        else:
+            yield sampler(m, rng=rng, out=buf[:m], **kw)
@@ -0,0 +1,250 @@
+"""within-cutoff queries over large sets of rays / lines
+
+lines are infinite, so pairs are only reported if their closest approach
+(the midpoint of the closest points, or for parallel lines the point of the
+first line nearest center) lies within bound of center. Inside that ball
+each line is a segment; segments are sampled, hashed into cubic cells of
+cellsize, and the samples of the indexed set are dilated by cutoff plus the
+sample spacing so a query only needs to look in the cells of its own
+samples. Candidate pairs sharing a cell are refined with the exact line
+distance. bound=None skips the hashing and tests all pairs."""
+
+import numpy as np
+from homog import homog as hm
+from homog.util import jit
+
+
+class RayIndex:
+    """spatial hash of hray (..., 4, 2) rays for within-cutoff line queries
+
+    >>> index = RayIndex(rays, cutoff=1, bound=50)
+    >>> i, j, dist = index.query(other_rays)  # other_rays[i] near rays[j]"""
+
+    def __init__(self, rays, cutoff, bound=100.0, center=(0, 0, 0),
+                 cellsize=None):
+        self.rays = np.asarray(rays, dtype='f8').reshape(-1, 4, 2)
+        self.cutoff, self.bound = float(cutoff), bound
+        self.center = hm.hpoint(center).astype('f8')
+        if bound is None: return
+        radius = self.bound + self.cutoff
+        # at most ~256 cells along any line
+        self.cellsize = cellsize or max(4 * self.cutoff, radius / 128)
+        if self.cellsize < 4 * self.cutoff:
+            raise ValueError('cellsize must be at least 4 * cutoff')
+        # dilated samples then span at most two cells per dimension
+        self.spacing = 0.49 * self.cellsize - self.cutoff
+        self.ncell = int(np.ceil(radius / self.cellsize)) + 2
+        self.keys, self.ray = self._entries(self.rays, dilate=True)
+
+    def __len__(self):
+        return len(self.rays)
+
+    def query(self, rays, use_numba='auto', exclude_self=False):
+        """(i, j, dist) for all rays[i], self.rays[j] with line distance <=
+        cutoff and closest approach within bound. sorted by i then j.
+        exclude_self keeps only i < j, for rays that are the indexed set"""
+        rays = np.asarray(rays, dtype='f8').reshape(-1, 4, 2)
+        if use_numba == 'auto': use_numba = _join_refine is not None
+        if self.bound is None:
+            # everything in a single cell
+            keys1, ray1 = np.zeros(len(rays), 'i8'), np.arange(len(rays))
+            keys2, ray2 = np.zeros(len(self), 'i8'), np.arange(len(self))
+        else:
+            keys1, ray1 = self._entries(rays)
+            keys2, ray2 = self.keys, self.ray
+        if use_numba:
+            bound = -1.0 if self.bound is None else self.bound
+            i, j, dist = _join_refine(keys1, ray1, keys2, ray2, rays,
+                                      self.rays, self.cutoff, bound,
+                                      self.center, exclude_self)
+        else:
+            i, j = _join_numpy(keys1, ray1, keys2, ray2)
+            if exclude_self: i, j = i[i < j], j[i < j]
+            i, j, dist = _refine_numpy(i, j, rays, self.rays, self.cutoff,
+                                       self.bound, self.center)
+        # the same pair can be found in several cells
+        pair = np.unique(i * len(self) + j, return_index=True)[1]
+        return i[pair], j[pair], dist[pair]
+
+    def _entries(self, rays, dilate=False, chunksize=4096):
+        """sorted unique (cell key, ray) of the samples of each ray, with
+        dilate also the cells within cutoff + spacing of each sample"""
+        keys, ray = list(), list()
+        r = self.cutoff + self.spacing
+        for lb in range(0, len(rays), chunksize):
+            pts, cray = self._samples(rays[lb:lb + chunksize])
+            cray += lb
+            if dilate:
+                lo, hi = self._cells(pts - r), self._cells(pts + r)
+                ck = [self._key(np.where(c, hi, lo))
+                      for c in np.ndindex(2, 2, 2)]
+                ck, cray = np.concatenate(ck), np.tile(cray, 8)
+            else:
+                ck = self._key(self._cells(pts))
+            ck, cray = _sorted_unique(ck, cray)
+            keys.append(ck)
+            ray.append(cray)
+        if not keys: return np.zeros(0, 'i8'), np.zeros(0, 'i8')
+        return _sorted_unique(np.concatenate(keys), np.concatenate(ray))
+
+    def _samples(self, rays):
+        """points at most spacing apart along each line inside the ball"""
+        pt, ax = rays[:, :3, 0], rays[:, :3, 1]
+        ax = ax / np.linalg.norm(ax, axis=-1)[:, None]
+        t0 = np.sum((self.center[:3] - pt) * ax, axis=-1)
+        foot = pt + t0[:, None] * ax
+        dist2 = np.sum((foot - self.center[:3])**2, axis=-1)
+        halfchord = np.sqrt(np.maximum((self.bound + self.cutoff)**2 - dist2,
+                                       0))
+        n = np.where(dist2 <= (self.bound + self.cutoff)**2,
+                     np.ceil(2 * halfchord / self.spacing).astype('i8') + 1, 0)
+        ray = np.repeat(np.arange(len(rays)), n)
+        start = np.cumsum(n) - n
+        k = np.arange(len(ray)) - start[ray]
+        step = 2 * halfchord / np.maximum(n - 1, 1)
+        t = -halfchord[ray] + k * step[ray]
+        return foot[ray] + t[:, None] * ax[ray], ray
+
+    def _cells(self, pts):
+        return np.floor((pts - self.center[:3]) / self.cellsize).astype('i8')
+
+    def _key(self, cells):
+        m = 2 * self.ncell + 1
+        cells = cells + self.ncell
+        return (cells[:, 0] * m + cells[:, 1]) * m + cells[:, 2]
+
+
+def ray_pairs_within(rays1, rays2=None, cutoff=1.0, bound=100.0,
+                     center=(0, 0, 0), **kw):
+    """(i, j, dist) for line pairs rays1[i], rays2[j] within cutoff whose
+    closest approach is within bound of center. With rays2=None, pairs
+    i < j within rays1. see RayIndex"""
+    index = RayIndex(rays1 if rays2 is None else rays2, cutoff, bound, center)
+    return index.query(rays1, exclude_self=rays2 is None, **kw)
+
+
+def _sorted_unique(keys, ray):
+    """(key, ray) entries sorted by key then ray, duplicates removed"""
+    if len(ray) == 0: return keys, ray
+    nray = ray.max() + 1
+    packed = np.sort(keys * nray + ray)  # one int64 sort beats lexsort
+    keep = np.ones(len(packed), dtype='?')
+    keep[1:] = packed[1:] != packed[:-1]
+    packed = packed[keep]
+    return packed // nray, packed % nray
+
+
+def _join_numpy(keys1, ray1, keys2, ray2):
+    """all (ray1, ray2) pairs with equal keys, both sorted by key"""
+    ukeys, start2, count2 = np.unique(keys2, return_index=True,
+                                      return_counts=True)
+    pos = np.searchsorted(ukeys, keys1)
+    pos = np.minimum(pos, len(ukeys) - 1)
+    hit = (len(ukeys) > 0) & (ukeys[pos] == keys1)
+    i, pos = ray1[hit], pos[hit]
+    n = count2[pos]
+    i = np.repeat(i, n)
+    offset = np.arange(len(i)) - np.repeat(np.cumsum(n) - n, n)
+    j = ray2[np.repeat(start2[pos], n) + offset]
+    return i, j
+
+
+def _closest_mid(pt1, ax1, pt2, ax2, center):
+    """numpy midpoint of closest points, see module docstring"""
+    w = pt1 - pt2
+    b = hm.hdot(ax1, ax2)
+    d, e = hm.hdot(ax1, w), hm.hdot(ax2, w)
+    denom = 1 - b * b
+    parallel = np.abs(b) > 0.9999
+    denom = np.where(parallel, 1, denom)
+    t1 = np.where(parallel, hm.hdot(ax1, center - pt1), (b * e - d) / denom)
+    q1 = pt1 + t1[..., None] * ax1
+    t2 = np.where(parallel, hm.hdot(ax2, q1 - pt2), (e - b * d) / denom)
+    q2 = pt2 + t2[..., None] * ax2
+    return np.where(parallel[..., None], q1, (q1 + q2) / 2)
+
+
+def _refine_numpy(i, j, rays1, rays2, cutoff, bound, center):
+    pt1, ax1 = rays1[i, :, 0], rays1[i, :, 1]
+    pt2, ax2 = rays2[j, :, 0], rays2[j, :, 1]
+    dist = hm.line_line_distance_pa(pt1, ax1, pt2, ax2)
+    ok = dist <= cutoff
+    if bound is not None:
+        mid = _closest_mid(pt1[ok], ax1[ok], pt2[ok], ax2[ok], center)
+        ok[ok] = hm.hnorm(mid - center) <= bound
+    return i[ok], j[ok], dist[ok]
+
+
+@jit
+def _closest_mid_in_bound(pt1, ax1, pt2, ax2, center, bound):
+    w0, w1, w2 = pt1[0] - pt2[0], pt1[1] - pt2[1], pt1[2] - pt2[2]
+    b = ax1[0] * ax2[0] + ax1[1] * ax2[1] + ax1[2] * ax2[2]
+    d = ax1[0] * w0 + ax1[1] * w1 + ax1[2] * w2
+    e = ax2[0] * w0 + ax2[1] * w1 + ax2[2] * w2
+    if abs(b) > 0.9999:
+        t1 = 0.0
+        for k in range(3):
+            t1 += ax1[k] * (center[k] - pt1[k])
+        r2 = 0.0
+        for k in range(3):
+            r2 += (pt1[k] + t1 * ax1[k] - center[k])**2
+        return r2 <= bound * bound
+    t1 = (b * e - d) / (1 - b * b)
+    t2 = (e - b * d) / (1 - b * b)
+    r2 = 0.0
+    for k in range(3):
+        mid = (pt1[k] + t1 * ax1[k] + pt2[k] + t2 * ax2[k]) / 2
+        r2 += (mid - center[k])**2
+    return r2 <= bound * bound
+
+
+@jit
+def _join_refine(keys1, ray1, keys2, ray2, rays1, rays2, cutoff, bound,
+                 center, exclude_self):
+    """merge join of the sorted key arrays, exact test of each pair in a
+    shared cell. bound < 0 means no bound"""
+    cap = 1024
+    oi = np.empty(cap, dtype=np.int64)
+    oj = np.empty(cap, dtype=np.int64)
+    od = np.empty(cap, dtype=np.float64)
+    dist = np.empty(1, dtype=np.float64)
+    n, a, b = 0, 0, 0
+    while a < len(keys1) and b < len(keys2):
+        if keys1[a] < keys2[b]:
+            a += 1
+            continue
+        if keys1[a] > keys2[b]:
+            b += 1
+            continue
+        bend = b
+        while bend < len(keys2) and keys2[bend] == keys1[a]:
+            bend += 1
+        key = keys1[a]
+        while a < len(keys1) and keys1[a] == key:
+            i = ray1[a]
+            for jj in range(b, bend):
+                j = ray2[jj]
+                if exclude_self and i >= j: continue
+                r1, r2 = rays1[i], rays2[j]
+                hm.kernel_line_line_distance_pa(r1[:, 0], r1[:, 1], r2[:, 0],
+                                                r2[:, 1], dist)
+                if dist[0] > cutoff: continue
+                if bound >= 0 and not _closest_mid_in_bound(
+                        r1[:, 0], r1[:, 1], r2[:, 0], r2[:, 1], center,
+                        bound):
+                    continue
+                if n == cap:
+                    cap *= 2
+                    oi, oj, od = _grow(oi, cap), _grow(oj, cap), _grow(od, cap)
+                oi[n], oj[n], od[n] = i, j, dist[0]
+                n += 1
+            a += 1
+        b = bend
+    return oi[:n], oj[:n], od[:n]
+
+
+@jit
+def _grow(a, cap):
+    new = np.empty(cap, dtype=a.dtype)
+    new[:len(a)] = a
+    return new
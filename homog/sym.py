@@ -1,400 +1,173 @@
+import re
+import functools
 from homog import *
+from homog.util import jit, guvec, float32, float64, int64
 
+_phi = (1 + np.sqrt(5)) / 2
 
-tetrahedral_axes = {2: hnormalized([1, 0, 0]),
-                    3: hnormalized([1, 1, 1]),
-                    7: hnormalized([1, 1, -1])}  # other c3
-octahedral_axes = {2: hnormalized([1, 1, 0]),
-                   3: hnormalized([1, 1, 1]),
-                   4: hnormalized([1, 0, 0])}
-icosahedral_axes = {2: hnormalized([1, 0, 0]),
-                    3: hnormalized([0.934172, 0.000000, 0.356822]),
-                    5: hnormalized([0.850651, 0.525731, 0.000000])}
-
-
-tetrahedral_frames = np.array([((+1.000000, +0.000000, +0.000000, +0.000000),
-                                (+0.000000, +1.000000, -0.000000, +0.000000),
-                                (+0.000000, +0.000000, +1.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+1.000000, +0.000000, +0.000000, +0.000000),
-                                (+0.000000, -1.000000, +0.000000, +0.000000),
-                                (+0.000000, -0.000000, -1.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.000000, +1.000000, -0.000000, +0.000000),
-                                (-0.000000, +0.000000, +1.000000, +0.000000),
-                                (+1.000000, -0.000000, +0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.000000, -1.000000, +0.000000, +0.000000),
-                                (-0.000000, -0.000000, -1.000000, +0.000000),
-                                (+1.000000, +0.000000, -0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.000000, +1.000000, -0.000000, +0.000000),
-                                (+0.000000, -0.000000, -1.000000, +0.000000),
-                                (-1.000000, +0.000000, -0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.000000, +0.000000, +1.000000, +0.000000),
-                                (+1.000000, -0.000000, +0.000000, +0.000000),
-                                (+0.000000, +1.000000, -0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.000000, -1.000000, +0.000000, +0.000000),
-                                (+0.000000, +0.000000, +1.000000, +0.000000),
-                                (-1.000000, -0.000000, +0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.000000, -0.000000, -1.000000, +0.000000),
-                                (+1.000000, +0.000000, -0.000000, +0.000000),
-                                (+0.000000, -1.000000, +0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.000000, -0.000000, -1.000000, +0.000000),
-                                (-1.000000, -0.000000, -0.000000, +0.000000),
-                                (-0.000000, +1.000000, -0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.000000, +0.000000, +1.000000, +0.000000),
-                                (-1.000000, +0.000000, -0.000000, +0.000000),
-                                (-0.000000, -1.000000, +0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-1.000000, -0.000000, -0.000000, +0.000000),
-                                (-0.000000, +1.000000, +0.000000, +0.000000),
-                                (+0.000000, +0.000000, -1.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-1.000000, +0.000000, -0.000000, +0.000000),
-                                (-0.000000, -1.000000, +0.000000, +0.000000),
-                                (-0.000000, +0.000000, +1.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000))])
-
-octahedral_frames = np.array([((+0.000000, +1.000000, +0.000000, +0.000000),
-                               (+1.000000, +0.000000, -0.000000, +0.000000),
-                               (-0.000000, +0.000000, -1.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+0.000000, -0.000000, +1.000000, +0.000000),
-                               (+1.000000, +0.000000, -0.000000, +0.000000),
-                               (-0.000000, +1.000000, +0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+1.000000, +0.000000, -0.000000, +0.000000),
-                               (+0.000000, +1.000000, +0.000000, +0.000000),
-                               (+0.000000, -0.000000, +1.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+1.000000, +0.000000, -0.000000, +0.000000),
-                               (+0.000000, -0.000000, +1.000000, +0.000000),
-                               (+0.000000, -1.000000, -0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((-0.000000, +0.000000, -1.000000, +0.000000),
-                               (+0.000000, +1.000000, +0.000000, +0.000000),
-                               (+1.000000, -0.000000, -0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((-0.000000, +1.000000, +0.000000, +0.000000),
-                               (+0.000000, -0.000000, +1.000000, +0.000000),
-                               (+1.000000, +0.000000, -0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+0.000000, +1.000000, +0.000000, +0.000000),
-                               (-0.000000, +0.000000, -1.000000, +0.000000),
-                               (-1.000000, +0.000000, +0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+0.000000, -0.000000, +1.000000, +0.000000),
-                               (-0.000000, +1.000000, +0.000000, +0.000000),
-                               (-1.000000, -0.000000, +0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+0.000000, -1.000000, -0.000000, +0.000000),
-                               (+1.000000, +0.000000, +0.000000, +0.000000),
-                               (+0.000000, -0.000000, +1.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+1.000000, -0.000000, -0.000000, +0.000000),
-                               (-0.000000, +0.000000, -1.000000, +0.000000),
-                               (+0.000000, +1.000000, +0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+1.000000, +0.000000, +0.000000, +0.000000),
-                               (+0.000000, -1.000000, -0.000000, +0.000000),
-                               (-0.000000, +0.000000, -1.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((-0.000000, +0.000000, -1.000000, +0.000000),
-                               (+1.000000, -0.000000, -0.000000, +0.000000),
-                               (-0.000000, -1.000000, -0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((-1.000000, +0.000000, +0.000000, +0.000000),
-                               (+0.000000, +1.000000, -0.000000, +0.000000),
-                               (-0.000000, +0.000000, -1.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((-1.000000, -0.000000, +0.000000, +0.000000),
-                               (+0.000000, +0.000000, +1.000000, +0.000000),
-                               (-0.000000, +1.000000, +0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+0.000000, -0.000000, +1.000000, +0.000000),
-                               (+0.000000, -1.000000, -0.000000, +0.000000),
-                               (+1.000000, +0.000000, +0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+0.000000, +1.000000, -0.000000, +0.000000),
-                               (-1.000000, +0.000000, +0.000000, +0.000000),
-                               (+0.000000, -0.000000, +1.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+0.000000, +0.000000, +1.000000, +0.000000),
-                               (-1.000000, -0.000000, +0.000000, +0.000000),
-                               (+0.000000, -1.000000, -0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+0.000000, -1.000000, -0.000000, +0.000000),
-                               (-0.000000, -0.000000, +1.000000, +0.000000),
-                               (-1.000000, -0.000000, -0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((-0.000000, -1.000000, -0.000000, +0.000000),
-                               (-0.000000, +0.000000, -1.000000, +0.000000),
-                               (+1.000000, -0.000000, -0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((-0.000000, +0.000000, -1.000000, +0.000000),
-                               (-1.000000, +0.000000, +0.000000, +0.000000),
-                               (+0.000000, +1.000000, -0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+0.000000, +0.000000, -1.000000, +0.000000),
-                               (-0.000000, -1.000000, -0.000000, +0.000000),
-                               (-1.000000, +0.000000, +0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((-1.000000, +0.000000, +0.000000, +0.000000),
-                               (-0.000000, +0.000000, -1.000000, +0.000000),
-                               (-0.000000, -1.000000, +0.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((-1.000000, -0.000000, -0.000000, +0.000000),
-                               (+0.000000, -1.000000, -0.000000, +0.000000),
-                               (-0.000000, -0.000000, +1.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000)),
-                              ((+0.000000, -1.000000, -0.000000, +0.000000),
-                               (-1.000000, -0.000000, -0.000000, +0.000000),
-                               (+0.000000, +0.000000, -1.000000, +0.000000),
-                               (+0.000000, +0.000000, +0.000000, +1.000000))])
-
-icosahedral_frames = np.array([((+1.000000, +0.000000, +0.000000, +0.000000),
-                                (+0.000000, +1.000000, +0.000000, +0.000000),
-                                (+0.000000, -0.000000, +1.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.809017, +0.309017, +0.500000, +0.000000),
-                                (+0.309017, +0.500000, -0.809017, +0.000000),
-                                (-0.500000, +0.809017, +0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+1.000000, +0.000000, +0.000000, +0.000000),
-                                (+0.000000, -1.000000, -0.000000, +0.000000),
-                                (+0.000000, +0.000000, -1.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.809017, +0.309017, +0.500000, +0.000000),
-                                (-0.309017, -0.500000, +0.809017, +0.000000),
-                                (+0.500000, -0.809017, -0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.809017, +0.309017, -0.500000, +0.000000),
-                                (+0.309017, +0.500000, +0.809017, +0.000000),
-                                (+0.500000, -0.809017, +0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.809017, +0.309017, -0.500000, +0.000000),
-                                (-0.309017, -0.500000, -0.809017, +0.000000),
-                                (-0.500000, +0.809017, -0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.809017, -0.309017, +0.500000, +0.000000),
-                                (+0.309017, -0.500000, -0.809017, +0.000000),
-                                (+0.500000, +0.809017, -0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.809017, -0.309017, +0.500000, +0.000000),
-                                (-0.309017, +0.500000, +0.809017, +0.000000),
-                                (-0.500000, -0.809017, +0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.809017, -0.309017, -0.500000, +0.000000),
-                                (+0.309017, -0.500000, +0.809017, +0.000000),
-                                (-0.500000, -0.809017, -0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.809017, -0.309017, -0.500000, +0.000000),
-                                (-0.309017, +0.500000, -0.809017, +0.000000),
-                                (+0.500000, +0.809017, +0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.500000, +0.809017, +0.309017, +0.000000),
-                                (+0.809017, -0.309017, -0.500000, +0.000000),
-                                (-0.309017, +0.500000, -0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.500000, +0.809017, +0.309017, +0.000000),
-                                (-0.809017, +0.309017, +0.500000, +0.000000),
-                                (+0.309017, -0.500000, +0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.500000, +0.809017, -0.309017, +0.000000),
-                                (+0.809017, -0.309017, +0.500000, +0.000000),
-                                (+0.309017, -0.500000, -0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.500000, +0.809017, -0.309017, +0.000000),
-                                (-0.809017, +0.309017, -0.500000, +0.000000),
-                                (-0.309017, +0.500000, +0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.500000, -0.809017, +0.309017, +0.000000),
-                                (+0.809017, +0.309017, -0.500000, +0.000000),
-                                (+0.309017, +0.500000, +0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.500000, -0.809017, +0.309017, +0.000000),
-                                (-0.809017, -0.309017, +0.500000, +0.000000),
-                                (-0.309017, -0.500000, -0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.500000, -0.809017, -0.309017, +0.000000),
-                                (+0.809017, +0.309017, +0.500000, +0.000000),
-                                (-0.309017, -0.500000, +0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.500000, -0.809017, -0.309017, +0.000000),
-                                (-0.809017, -0.309017, -0.500000, +0.000000),
-                                (+0.309017, +0.500000, -0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.309017, +0.500000, +0.809017, +0.000000),
-                                (+0.500000, -0.809017, +0.309017, +0.000000),
-                                (+0.809017, +0.309017, -0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.309017, +0.500000, +0.809017, +0.000000),
-                                (-0.500000, +0.809017, -0.309017, +0.000000),
-                                (-0.809017, -0.309017, +0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.309017, +0.500000, -0.809017, +0.000000),
-                                (+0.500000, -0.809017, -0.309017, +0.000000),
-                                (-0.809017, -0.309017, -0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.309017, +0.500000, -0.809017, +0.000000),
-                                (-0.500000, +0.809017, +0.309017, +0.000000),
-                                (+0.809017, +0.309017, +0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.309017, -0.500000, +0.809017, +0.000000),
-                                (+0.500000, +0.809017, +0.309017, +0.000000),
-                                (-0.809017, +0.309017, +0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.309017, -0.500000, +0.809017, +0.000000),
-                                (-0.500000, -0.809017, -0.309017, +0.000000),
-                                (+0.809017, -0.309017, -0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.309017, -0.500000, -0.809017, +0.000000),
-                                (+0.500000, +0.809017, -0.309017, +0.000000),
-                                (+0.809017, -0.309017, +0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.309017, -0.500000, -0.809017, +0.000000),
-                                (-0.500000, -0.809017, +0.309017, +0.000000),
-                                (-0.809017, +0.309017, -0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.000000, +1.000000, +0.000000, +0.000000),
-                                (+0.000000, -0.000000, +1.000000, +0.000000),
-                                (+1.000000, -0.000000, -0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.000000, +1.000000, +0.000000, +0.000000),
-                                (-0.000000, +0.000000, -1.000000, +0.000000),
-                                (-1.000000, +0.000000, +0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.000000, +0.000000, +1.000000, +0.000000),
-                                (+1.000000, -0.000000, -0.000000, +0.000000),
-                                (+0.000000, +1.000000, -0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.000000, +0.000000, +1.000000, +0.000000),
-                                (-1.000000, +0.000000, +0.000000, +0.000000),
-                                (-0.000000, -1.000000, +0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.000000, -1.000000, +0.000000, +0.000000),
-                                (+0.000000, +0.000000, +1.000000, +0.000000),
-                                (-1.000000, -0.000000, +0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.000000, -1.000000, +0.000000, +0.000000),
-                                (-0.000000, -0.000000, -1.000000, +0.000000),
-                                (+1.000000, +0.000000, -0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.000000, -0.000000, -1.000000, +0.000000),
-                                (+1.000000, +0.000000, +0.000000, +0.000000),
-                                (+0.000000, -1.000000, +0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((+0.000000, -0.000000, -1.000000, +0.000000),
-                                (-1.000000, -0.000000, -0.000000, +0.000000),
-                                (-0.000000, +1.000000, -0.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-1.000000, -0.000000, +0.000000, +0.000000),
-                                (+0.000000, -1.000000, -0.000000, +0.000000),
-                                (+0.000000, +0.000000, +1.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-1.000000, -0.000000, +0.000000, +0.000000),
-                                (-0.000000, +1.000000, +0.000000, +0.000000),
-                                (-0.000000, -0.000000, -1.000000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.809017, +0.309017, +0.500000, +0.000000),
-                                (+0.309017, -0.500000, +0.809017, +0.000000),
-                                (+0.500000, +0.809017, +0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.809017, +0.309017, +0.500000, +0.000000),
-                                (-0.309017, +0.500000, -0.809017, +0.000000),
-                                (-0.500000, -0.809017, -0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.809017, +0.309017, -0.500000, +0.000000),
-                                (+0.309017, -0.500000, -0.809017, +0.000000),
-                                (-0.500000, -0.809017, +0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.809017, +0.309017, -0.500000, +0.000000),
-                                (-0.309017, +0.500000, +0.809017, +0.000000),
-                                (+0.500000, +0.809017, -0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.809017, -0.309017, +0.500000, +0.000000),
-                                (+0.309017, +0.500000, +0.809017, +0.000000),
-                                (-0.500000, +0.809017, -0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.809017, -0.309017, +0.500000, +0.000000),
-                                (-0.309017, -0.500000, -0.809017, +0.000000),
-                                (+0.500000, -0.809017, +0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.809017, -0.309017, -0.500000, +0.000000),
-                                (+0.309017, +0.500000, -0.809017, +0.000000),
-                                (+0.500000, -0.809017, -0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.809017, -0.309017, -0.500000, +0.000000),
-                                (-0.309017, -0.500000, +0.809017, +0.000000),
-                                (-0.500000, +0.809017, +0.309017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.500000, +0.809017, +0.309017, +0.000000),
-                                (+0.809017, +0.309017, +0.500000, +0.000000),
-                                (+0.309017, +0.500000, -0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.500000, +0.809017, +0.309017, +0.000000),
-                                (-0.809017, -0.309017, -0.500000, +0.000000),
-                                (-0.309017, -0.500000, +0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.500000, +0.809017, -0.309017, +0.000000),
-                                (+0.809017, +0.309017, -0.500000, +0.000000),
-                                (-0.309017, -0.500000, -0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.500000, +0.809017, -0.309017, +0.000000),
-                                (-0.809017, -0.309017, +0.500000, +0.000000),
-                                (+0.309017, +0.500000, +0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.500000, -0.809017, +0.309017, +0.000000),
-                                (+0.809017, -0.309017, +0.500000, +0.000000),
-                                (-0.309017, +0.500000, +0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.500000, -0.809017, +0.309017, +0.000000),
-                                (-0.809017, +0.309017, -0.500000, +0.000000),
-                                (+0.309017, -0.500000, -0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.500000, -0.809017, -0.309017, +0.000000),
-                                (+0.809017, -0.309017, -0.500000, +0.000000),
-                                (+0.309017, -0.500000, +0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.500000, -0.809017, -0.309017, +0.000000),
-                                (-0.809017, +0.309017, +0.500000, +0.000000),
-                                (-0.309017, +0.500000, -0.809017, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.309017, +0.500000, +0.809017, +0.000000),
-                                (+0.500000, +0.809017, -0.309017, +0.000000),
-                                (-0.809017, +0.309017, -0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.309017, +0.500000, +0.809017, +0.000000),
-                                (-0.500000, -0.809017, +0.309017, +0.000000),
-                                (+0.809017, -0.309017, +0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.309017, +0.500000, -0.809017, +0.000000),
-                                (+0.500000, +0.809017, +0.309017, +0.000000),
-                                (+0.809017, -0.309017, -0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.309017, +0.500000, -0.809017, +0.000000),
-                                (-0.500000, -0.809017, -0.309017, +0.000000),
-                                (-0.809017, +0.309017, +0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.309017, -0.500000, +0.809017, +0.000000),
-                                (+0.500000, -0.809017, -0.309017, +0.000000),
-                                (+0.809017, +0.309017, +0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.309017, -0.500000, +0.809017, +0.000000),
-                                (-0.500000, +0.809017, +0.309017, +0.000000),
-                                (-0.809017, -0.309017, -0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.309017, -0.500000, -0.809017, +0.000000),
-                                (+0.500000, -0.809017, +0.309017, +0.000000),
-                                (-0.809017, -0.309017, +0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000)),
-                               ((-0.309017, -0.500000, -0.809017, +0.000000),
-                                (-0.500000, +0.809017, -0.309017, +0.000000),
-                                (+0.809017, +0.309017, -0.500000, +0.000000),
-                                (+0.000000, +0.000000, +0.000000, +1.000000))])
+
+def axes(group):
+    """dict of nfold -> symmetry axis for group name like 'C3', 'D5', 'I'"""
+    kind, n = _parse_group(group)
+    if kind == 'C':
+        return {n: hnormalized([0, 0, 1])}
+    if kind == 'D':
+        return {n: hnormalized([0, 0, 1]), 2: hnormalized([1, 0, 0])}
+    if kind == 'T':
+        return {2: hnormalized([1, 0, 0]),
+                3: hnormalized([1, 1, 1]),
+                7: hnormalized([1, 1, -1])}  # other c3
+    if kind == 'O':
+        return {2: hnormalized([1, 1, 0]),
+                3: hnormalized([1, 1, 1]),
+                4: hnormalized([1, 0, 0])}
+    return {2: hnormalized([1, 0, 0]),
+            3: hnormalized([_phi**2, 0, 1]),
+            5: hnormalized([_phi, 1, 0])}
+
+
+def frames(group, dtype='f8'):
+    """full precision (n, 4, 4) rotations of group like 'C3', 'D5', 'T', 'O'
+    or 'I'
+
+    T, O and I frames come in the order of the old hard coded tables, which
+    puts identity at frame 2 for O; for every other group identity is frame
+    0. Returned arrays are cached and read-only"""
+    return _frames(group.upper(), np.dtype(dtype).str)
+
+
+def _parse_group(group):
+    m = re.fullmatch(r'([CD])(\d+)|([TOI])', group.upper())
+    if not m or m.group(2) == '0':
+        raise ValueError('unknown symmetry group: ' + str(group))
+    if m.group(3): return m.group(3), None
+    return m.group(1), int(m.group(2))
+
+
+def _closure(generators, tol=1e-6):
+    generated = np.eye(4)[None]
+    while True:
+        cand = (generators[:, None] @ generated[None]).reshape(-1, 4, 4)
+        cand = np.concatenate([generated, cand])
+        diff = np.abs(cand[:, None, :3, :3] - cand[None, :, :3, :3])
+        same = np.all(diff.reshape(len(cand), len(cand), 9) < tol, axis=-1)
+        cand = cand[~np.any(np.tril(same, -1), axis=1)]
+        if len(cand) == len(generated): return generated
+        generated = cand
+
+
+# closure order -> order of the tables tetrahedral_frames etc. used to be
+_legacy_order = dict(
+    T=[0, 1, 5, 9, 7, 2, 8, 4, 6, 3, 10, 11],
+    O=[4, 1, 0, 8, 7, 3, 17, 14, 12, 2, 6, 9, 20, 18, 5, 10, 11, 15, 13, 16,
+       22, 23, 19, 21],
+    I=[0, 2, 5, 3, 8, 23, 1, 10, 11, 13, 6, 7, 12, 14, 15, 31, 20, 22, 4, 18,
+       35, 17, 19, 21, 16, 34, 9, 27, 24, 30, 43, 26, 39, 46, 56, 58, 33, 51,
+       57, 41, 52, 53, 50, 59, 32, 38, 36, 37, 48, 54, 49, 55, 28, 29, 40, 47,
+       25, 42, 44, 45])
+
+
+@functools.lru_cache(maxsize=None)
+def _frames(group, dtype):
+    kind, n = _parse_group(group)
+    ax = axes(group)
+    if kind in 'CD':
+        x = hrot(ax[n], np.arange(n) * 2 * np.pi / n, degrees=False)
+        if kind == 'D':
+            x = np.concatenate([x, hrot([1, 0, 0], np.pi) @ x])
+    else:
+        nfold = dict(T=(2, 3), O=(3, 4), I=(3, 5))[kind]
+        gens = np.stack([hrot(ax[i], 2 * np.pi / i) for i in nfold])
+        x = _closure(gens)[_legacy_order[kind]]
+    x = x.astype(dtype)
+    x.flags.writeable = False
+    return x
+
+
+tetrahedral_axes = axes('T')
+octahedral_axes = axes('O')
+icosahedral_axes = axes('I')
+
+tetrahedral_frames = frames('T').copy()
+octahedral_frames = frames('O').copy()
+icosahedral_frames = frames('I').copy()
+
+
+@jit
+def kernel_nearest_quat(q, fquats, idx, maxdot):
+    best, ibest = -1.0, 0
+    for i in range(len(fquats)):
+        d = abs(q[0] * fquats[i, 0] + q[1] * fquats[i, 1] +
+                q[2] * fquats[i, 2] + q[3] * fquats[i, 3])
+        if d > best:
+            best, ibest = d, i
+    idx[0] = ibest
+    maxdot[0] = best
+
+
+gu_nearest_quat = guvec([
+    (float64[:], float64[:, :], int64[:], float64[:]),
+    (float32[:], float32[:, :], int64[:], float32[:]),
+], '(n),(m,n)->(),()', kernel_nearest_quat)
+
+
+class SymFrameIndex:
+    """nearest-frame lookup for a stack of symmetry frames
+
+    frames are precomputed as unit quaternions in the upper half (w >= 0),
+    so the nearest frame to a rotation R is an argmax of |q_R . q_frame|
+    over the table, no xforms composed, and the rotational distance is
+    2 * arccos of that dot. Translations are ignored."""
+
+    def __init__(self, frames):
+        self.frames = np.asarray(frames)
+        self.quats = quat.rot_to_quat(self.frames, dtype='f8')
+        self.quats.flags.writeable = False
+        self._quats32 = self.quats.astype('f4')
+
+    def __len__(self):
+        return len(self.frames)
+
+    def nearest(self, xforms, quats=False, use_numba='auto',
+                chunksize=2**16):
+        """(frame index, rotational distance in radians) for each xform or
+        3x3 rotation, or for each (..., 4) quat if quats"""
+        xforms = np.asarray(xforms)
+        if use_numba == 'auto': use_numba = gu_nearest_quat is not None
+        if quats:
+            q = xforms
+        elif (use_numba and xforms.shape[-2:] == (4, 4) and
+              xforms.dtype in (np.float32, np.float64)):
+            q = quat.gu_rot_to_quat(xforms)
+        else:
+            q = quat.rot_to_quat(xforms)
+        fquats = self._quats32 if q.dtype == np.float32 else self.quats
+        q = q.astype(fquats.dtype, copy=False)
+        if use_numba:
+            idx, maxdot = gu_nearest_quat(q, fquats)
+        else:
+            shape, q = q.shape[:-1], q.reshape(-1, 4)
+            idx = np.empty(len(q), dtype='i8')
+            maxdot = np.empty(len(q), dtype=q.dtype)
+            for lb in range(0, len(q), chunksize):
+                dots = np.abs(q[lb:lb + chunksize] @ fquats.T)
+                best = np.argmax(dots, axis=-1)
+                idx[lb:lb + chunksize] = best
+                maxdot[lb:lb + chunksize] = dots[np.arange(len(dots)), best]
+            idx, maxdot = idx.reshape(shape), maxdot.reshape(shape)
+        return idx, 2 * np.arccos(np.clip(maxdot, -1, 1))
+
+
+_frame_index_cache = dict()
+
+
+def frame_index(group):
+    """cached SymFrameIndex for any group accepted by frames()"""
+    group = group.upper()
+    if group not in _frame_index_cache:
+        _frame_index_cache[group] = SymFrameIndex(frames(group))
+    return _frame_index_cache[group]
+
+
+def nearest_frame(xforms, group, **kw):
+    return frame_index(group).nearest(xforms, **kw)
@@ -0,0 +1,29 @@
+import json
+from homog import bench
+
+
+def test_bench_run():
+    res = bench.run(sizes=[1, 10], names=['hinv', 'rot_to_quat'],
+                    min_time=0.0001, verbose=False)
+    assert {r['name'] for r in res['results']} == {'hinv', 'rot_to_quat'}
+    assert {r['dtype'] for r in res['results']} == {'f4', 'f8'}
+    assert 'numpy' in {r['backend'] for r in res['results']}
+    assert all(r['seconds'] > 0 for r in res['results'])
+    assert 'numpy' in res['meta']
+    json.dumps(res)
+
+
+def test_bench_compare(tmpdir):
+    rec = lambda sec, n: dict(name='hinv', backend='numpy', dtype='f8', n=n,
+                              seconds=sec)
+    old = dict(meta={}, results=[rec(1.0, 1), rec(1.0, 10), rec(1.0, 100)])
+    new = dict(meta={}, results=[rec(1.05, 1), rec(2.0, 10), rec(0.5, 100)])
+    report = bench.compare(old, new, tolerance=0.1)
+    assert [r[-1] for r in report] == [False, True, False]
+    assert report[1][3] == 2.0
+
+    fold, fnew = str(tmpdir.join('old.json')), str(tmpdir.join('new.json'))
+    json.dump(old, open(fold, 'w'))
+    json.dump(new, open(fnew, 'w'))
+    assert bench.main(['compare', fold, fnew]) == 1
+    assert bench.main(['compare', fold, fold]) == 0
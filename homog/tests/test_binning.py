@@ -0,0 +1,57 @@
+import numpy as np
+import homog
+from homog import sample
+from homog.binning import XformBinner
+
+try:
+    import numba
+    only_if_numba = lambda f: f
+except ImportError:
+    import pytest
+    only_if_numba = pytest.mark.skip
+
+
+def test_binner_key_center_roundtrip():
+    b = XformBinner(cart_resl=0.5, ori_resl=12)
+    x = sample.uniform_xform((100, 10), rng=0, cart_sd=10)
+    keys = b.key(x, use_numba=False)
+    assert keys.shape == (100, 10) and keys.dtype == np.int64
+    assert np.all(keys >= 0)
+    cen = b.center(keys)
+    assert np.all(b.key(cen, use_numba=False) == keys)
+    assert np.all(np.abs(cen[..., :3, 3] - x[..., :3, 3]) <= 0.25 + 1e-9)
+    ang = homog.angle_of(homog.hinv_compose(cen, x))
+    assert np.degrees(np.max(ang)) < 12
+    # translations past cart_bound
+    far = x[0, :2].copy()
+    far[1, 0, 3] = 2 * b.cart_bound
+    assert list(b.key(far, use_numba=False)) == [keys[0, 0], -1]
+
+
+def test_binner_neighbor_keys():
+    b = XformBinner(cart_resl=1, ori_resl=15)
+    x = sample.uniform_xform(200, rng=1, cart_sd=5)
+    keys = b.key(x, use_numba=False)
+    near = b.neighbor_keys(keys)
+    assert near.shape == (200, 3**6)
+    assert np.all(np.any(near == keys[:, None], axis=1))
+    moved = homog.hcompose(
+        x, sample.perturb(np.eye(4), 200, rng=2, ang_sd=0.03, cart_sd=0.2))
+    mkeys = b.key(moved, use_numba=False)
+    assert np.mean(np.any(near == mkeys[:, None], axis=1)) > 0.99
+    assert b.neighbor_keys(keys[0], radius=0).shape == (1, )
+    # every neighbor is a real bin, the key of its own center
+    valid = near[near >= 0]
+    assert np.all(b.key(b.center(valid), use_numba=False) == valid)
+    edge = b.key(homog.htrans([b.cart_bound - 0.5, 0, 0]), use_numba=False)
+    assert np.sum(b.neighbor_keys(edge) == -1) == 3**5
+
+
+@only_if_numba
+def test_binner_numba_key():
+    b = XformBinner(cart_resl=1, ori_resl=10)
+    x = sample.uniform_xform(10000, rng=3, cart_sd=50)
+    x[0, 2, 3] = -2 * b.cart_bound
+    assert np.all(b.key(x) == b.key(x, use_numba=False))
+    x4 = x.astype('f4')
+    assert np.mean(b.key(x4) == b.key(x)) > 0.99
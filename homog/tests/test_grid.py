@@ -0,0 +1,63 @@
+import os
+import pytest
+import numpy as np
+import homog
+from homog import grid, sample
+
+try:
+    import numba
+    only_if_numba = lambda f: f
+except ImportError:
+    only_if_numba = pytest.mark.skip
+
+
+@pytest.fixture(autouse=True)
+def tmp_grid_cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(grid, 'grid_cache_dir', str(tmpdir))
+
+
+def test_so3_grid_cover(tmpdir):
+    grid._so3_grid.cache_clear()
+    q = grid.so3_grid(20)
+    assert q.shape == (1872, 4)
+    assert not q.flags.writeable
+    assert np.allclose(np.linalg.norm(q, axis=-1), 1)
+    assert os.listdir(str(tmpdir)) == ['so3_hopf_20deg_float64.npy']
+    grid._so3_grid.cache_clear()
+    assert np.all(grid.so3_grid(20) == q)
+    assert grid.so3_grid(20, dtype='f4').dtype == np.float32
+    # rotation angle between quats is 2 arccos |dot|
+    rand = sample.uniform_quat(3000, rng=0)
+    cover = 2 * np.arccos(np.minimum(np.max(np.abs(rand @ q.T), axis=1), 1))
+    assert np.degrees(np.max(cover)) < 20
+    assert homog.is_homog_xform(grid.so3_grid_xforms(30))
+
+
+def test_grid_nearest_numpy_matches_brute_force():
+    g = grid.grid_index(15)
+    q = sample.uniform_quat(2000, rng=1)
+    x = homog.quat.quat_to_xform(q)
+    idx, ang = g.nearest(x.reshape(40, 50, 4, 4), use_numba=False)
+    assert idx.shape == (40, 50)
+    dots = np.abs(q @ g.quats.T)
+    assert np.all(idx.reshape(-1) == np.argmax(dots, axis=-1))
+    assert np.allclose(ang.reshape(-1),
+                       2 * np.arccos(np.minimum(dots.max(axis=-1), 1)))
+    gidx, gang = grid.nearest_grid_index(g.xforms(idx), 15, use_numba=False)
+    assert np.all(gidx == idx) and np.allclose(gang, 0, atol=1e-6)
+    # a (4, 4) stack of quats is not one 4x4 xform
+    qidx, qang = g.nearest(q[:4], quats=True, use_numba=False)
+    assert qidx.shape == (4, ) and np.all(qidx == idx.reshape(-1)[:4])
+
+
+@only_if_numba
+def test_grid_nearest_numba():
+    g = grid.grid_index(10)
+    q = sample.uniform_quat(5000, rng=2)
+    idx, ang = g.nearest(q, quats=True)
+    idx2, ang2 = g.nearest(q, quats=True, use_numba=False)
+    assert np.all(idx == idx2)
+    assert np.allclose(ang, ang2)
+    g4 = grid.grid_index(10, 'f4')
+    idx4, ang4 = g4.nearest(q.astype('f4'), quats=True)
+    assert np.mean(idx4 == idx) > 0.999
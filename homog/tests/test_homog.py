@@ -1,4 +1,5 @@
 from homog import *
+from homog import util
 import numpy as np
 from numpy.testing import assert_allclose
 import pytest
@@ -23,6 +24,49 @@ def test_sym():
     assert np.all(x[..., :3, 3] == 0)
 
 
+def test_sym_frames_generated():
+    sizes = dict(C1=1, C3=3, C7=7, D2=4, D5=10, T=12, O=24, I=60)
+    for group, n in sizes.items():
+        f = sym.frames(group)
+        assert f.shape == (n, 4, 4)
+        assert_allclose(f[2 if group == 'O' else 0], np.eye(4), atol=1e-12)
+        assert is_homog_xform(f)
+        # closed under composition
+        prod = (f[:, None] @ f[None]).reshape(-1, 1, 4, 4)
+        assert np.all(np.any(np.all(np.abs(prod - f) < 1e-9, axis=(-2, -1)),
+                             axis=-1))
+        for nfold, axis in sym.axes(group).items():
+            if nfold > 6: continue
+            xrot = hrot(axis, 2 * np.pi / nfold)
+            assert np.min(np.abs(f - xrot).max(axis=(-2, -1))) < 1e-9
+    assert sym.frames('i') is sym.frames('I')
+    assert sym.frames('O', 'f4').dtype == np.float32
+    assert not sym.frames('O').flags.writeable
+    assert sym.icosahedral_frames.flags.writeable
+    with pytest.raises(ValueError):
+        sym.frames('Q3')
+    with pytest.raises(ValueError):
+        sym.frames('C0')
+
+
+def test_sym_frames_legacy_order():
+    # order weighted checksums of the old hard coded tables
+    for frames, checksum in ((sym.tetrahedral_frames, -38.0),
+                             (sym.octahedral_frames, -226.0),
+                             (sym.icosahedral_frames, -623.94)):
+        rounded = np.round(frames[:, :3, :3], 3)
+        weighted = np.arange(len(frames))[:, None, None] * rounded
+        assert np.sum(weighted) == pytest.approx(checksum)
+    assert_allclose(sym.octahedral_frames[0, :3, :3],
+                    [[0, 1, 0], [1, 0, 0], [0, 0, -1]], atol=1e-12)
+    assert_allclose(sym.tetrahedral_frames[2, :3, :3],
+                    [[0, 1, 0], [0, 0, 1], [1, 0, 0]], atol=1e-12)
+    assert_allclose(sym.icosahedral_frames[-1, :3, :3],
+                    [[-0.309017, -0.5, -0.809017],
+                     [-0.5, 0.809017, -0.309017],
+                     [0.809017, 0.309017, -0.5]], atol=1e-6)
+
+
 def test_homo_rotation_single():
     axis0 = hnormalized(np.random.randn(3))
     ang0 = np.pi / 4.0
@@ -112,6 +156,28 @@ def test_axis_angle_of():
     assert 1e-5 > abs(an - np.pi / 2)
 
 
+@pytest.mark.parametrize('use_numba', [False, 'auto'])
+def test_axis_angle_of_near_0_pi(use_numba):
+    axis = hnormalized(np.random.randn(1000, 3))
+    for ang in (1e-12, 1e-6, 1.0, np.pi - 1e-6, np.pi - 1e-12, np.pi):
+        x = hrot(axis, np.full(1000, ang), degrees=False)
+        ax, an = axis_angle_of(x, use_numba=use_numba)
+        assert_allclose(an, ang, atol=1e-12)
+        # axis sign is arbitrary at pi
+        sign = np.where(hdot(ax, axis) < 0, -1, 1)[:, None]
+        assert_allclose(ax * sign, axis, atol=1e-9)
+        for sub in (x[:, :3], x[:, :3, :3]):
+            ax2, an2 = axis_angle_of(sub, use_numba=use_numba)
+            assert_allclose(ax2, ax)
+            assert_allclose(an2, an)
+    ax, an = axis_angle_of(htrans([[1, 2, 3]] * 2), use_numba=use_numba)
+    assert_allclose(ax, [[1, 0, 0, 0]] * 2)
+    assert_allclose(an, 0)
+    ax, an = axis_angle_of(x.astype('f4'), use_numba=use_numba)
+    assert ax.dtype == an.dtype == np.float32
+    assert_allclose(an, np.pi, atol=1e-3)
+
+
 def test_axis_angle_of_rand():
     shape = (
         4,
@@ -135,6 +201,27 @@ def test_is_valid_rays():
     assert is_valid_rays([[0, 0], [0, 1], [0, 0], [1, 0]])
 
 
+def test_rand_int_seed_streams():
+    # an int seed makes one stream for all draws, not one per draw
+    x = rand_xform(5, rng=3)
+    assert np.all(x == rand_xform(5, rng=3))
+    rng = np.random.default_rng(3)
+    assert_allclose(x, quat.quat_to_xform(quat.rand_quat(5, rng=rng)) +
+                    htrans(rng.standard_normal((5, 3))) - np.eye(4))
+    restart = np.random.default_rng(3).standard_normal((5, 4))
+    assert not np.allclose(x[:, :3, 3], restart[:, :3])
+    x = rand_xform_aac(4, rng=3)
+    rng = np.random.default_rng(3)
+    axis = rand_unit(4, rng=rng)
+    ang = 2 * np.arccos(quat.rand_quat(4, rng=rng)[:, 0])
+    cen = rand_point(4, rng=rng)
+    assert_allclose(x, hrot(axis, ang, cen, degrees=False))
+    assert not np.allclose(axis, hnormalized(cen - [0, 0, 0, 1]))
+    assert not np.allclose(ang, hnorm(axis))
+    assert_allclose(rand_xform_aac(4, ang=90, rng=3)[..., :3, :3],
+                    hrot(axis, 90)[..., :3, :3])
+
+
 def test_rand_ray():
     r = rand_ray()
     assert np.all(r[..., 3, :] == (1, 0))
@@ -292,6 +379,56 @@ def test_axis_ang_cen_of_rand():
     assert_allclose(cen + helical_trans, cenhat, rtol=1e-5, atol=1e-5)
 
 
+def test_axis_ang_cen_of_chunked(tmpdir):
+    shape = (5, 6, 7)
+    axis0 = hnormalized(np.random.randn(*shape, 3))
+    ang0 = np.random.random(shape) * (np.pi - 0.1) + 0.1
+    cen0 = np.random.randn(*shape, 3) * 100.0
+    rot = hrot(axis0, ang0, cen0, dtype='f8')
+    ref = axis_ang_cen_of(rot)
+    for r, c in zip(ref, axis_ang_cen_of_chunked(rot, chunksize=17)):
+        assert_allclose(r, c)
+
+    fname = str(tmpdir.join('xforms.dat'))
+    mm = np.memmap(fname, dtype='f8', mode='w+', shape=rot.shape)
+    mm[:] = rot
+    out = tuple(np.memmap(str(tmpdir.join(n)), dtype='f8', mode='w+',
+                          shape=r.shape) for n, r in zip('abc', ref))
+    res = axis_ang_cen_of_chunked(mm, chunksize=50, out=out)
+    assert all(o is r for o, r in zip(out, res))
+    for r, c in zip(ref, out):
+        assert_allclose(r, c)
+    with pytest.raises(ValueError):
+        bad = np.empty(shape[::-1] + (4, )).swapaxes(0, 2)
+        axis_ang_cen_of_chunked(rot, out=(bad, out[1], out[2]))
+    axis, ang, cen = axis_ang_cen_of_chunked(np.zeros((0, 4, 4)))
+    assert axis.shape == cen.shape == (0, 4) and ang.shape == (0, )
+
+
+@only_if_numba
+def test_numba_axis_angle_cen():
+    shape = (5, 6, 7)
+    axis0 = hnormalized(np.random.randn(*shape, 3))
+    ang0 = np.random.random(shape) * (np.pi - 0.1) + 0.1
+    cen0 = np.random.randn(*shape, 3) * 100.0
+    helical_trans = np.random.randn(*shape)[..., None] * axis0
+    rot = hrot(axis0, ang0, cen0, dtype='f8')
+    rot[..., :, 3] += helical_trans
+    ref = axis_ang_cen_of(rot)
+    for res in (gu_axis_angle_cen(rot),
+                parallel.axis_ang_cen_of(rot, backend='numba')):
+        for r, c in zip(ref, res):
+            assert r.shape == c.shape
+            assert_allclose(r, c, atol=1e-6)
+    axis, ang, cen = numba_axis_angle_cen(rot[1, 2, 3])
+    assert_allclose(axis, ref[0][1, 2, 3])
+    assert_allclose(ang, ref[1][1, 2, 3])
+    assert_allclose(cen, ref[2][1, 2, 3], atol=1e-6)
+    axis, ang, cen = gu_axis_angle_cen(rot.astype('f4'))
+    assert axis.dtype == ang.dtype == cen.dtype == np.float32
+    assert np.all(np.isnan(numba_axis_angle_cen(htrans([1, 2, 3]))[2]))
+
+
 def test_hinv_rand():
     shape = (
         5,
@@ -309,6 +446,118 @@ def test_hinv_rand():
     assert np.allclose(np.eye(4), hinv(rot) @ rot)
 
 
+def test_hinv_rigid():
+    x = rand_xform((10, 11), cart_sd=10)
+    xinv = hinv_rigid(x)
+    assert_allclose(xinv, np.linalg.inv(x), atol=1e-8)
+    assert_allclose(hinv(x, check=True), xinv)
+    assert_allclose(hinv(x, check=False), xinv)
+    y = x.copy()
+    hinv_rigid(y, out=y)
+    assert_allclose(y, xinv)
+    assert hinv_rigid(x.astype('f4')).dtype == np.float32
+
+
+def test_hinv_nonrigid_fallback():
+    x = rand_xform((7, ))
+    x[..., :3, :3] *= 2.0
+    assert not is_homog_xform(x)
+    assert_allclose(hinv(x) @ x, np.broadcast_to(np.eye(4), x.shape),
+                    atol=1e-8)
+    assert_allclose(hinv(x, check=True), np.linalg.inv(x))
+
+
+@only_if_numba
+def test_gu_hinv():
+    x = rand_xform((10, 11), cart_sd=10)
+    assert_allclose(gu_hinv(x), hinv_rigid(x), atol=1e-10)
+    assert_allclose(numba_hinv(x[3, 4]), hinv_rigid(x[3, 4]), atol=1e-10)
+    x32 = x.astype('f4')
+    assert gu_hinv(x32).dtype == np.float32
+    assert_allclose(gu_hinv(x32), hinv_rigid(x), atol=1e-4)
+
+
+def test_hxform():
+    x = rand_xform((5, 6))
+    p = rand_point((5, 6))
+    v = rand_vec((5, 6))
+    assert_allclose(hxform(x, p), (x @ p[..., None])[..., 0])
+    assert_allclose(hxform(x, v), (x @ v[..., None])[..., 0])
+    assert_allclose(hxform(x, p[..., :3]), hxform(x, p))
+    assert hxform(x[:, :, None], p[:, None]).shape == (5, 6, 6, 4)
+    out = np.empty((5, 6, 4))
+    assert hxform(x, p, out=out) is out
+    ref = hxform(x, p)
+    hxform(x, p, out=p)
+    assert_allclose(p, ref)
+
+
+def test_hcompose():
+    a = rand_xform((5, 6), cart_sd=10)
+    b = rand_xform((5, 6), cart_sd=10)
+    assert_allclose(hcompose(a, b), a @ b, atol=1e-10)
+    assert_allclose(hinv_compose(a, b), hinv(a) @ b, atol=1e-10)
+    assert hcompose(a[:, None], b[None]).shape == (5, 5, 6, 4, 4)
+    ref = a @ b
+    hcompose(a, b, out=a)
+    assert_allclose(a, ref, atol=1e-10)
+    ref = hinv(b) @ b
+    hinv_compose(b, b, out=b)
+    assert_allclose(b, ref, atol=1e-10)
+
+
+@only_if_numba
+def test_gu_hxform_hcompose():
+    a = rand_xform((5, 6), cart_sd=10)
+    b = rand_xform((5, 6), cart_sd=10)
+    p = rand_point((5, 6))
+    assert_allclose(gu_hxform(a, p), hxform(a, p), atol=1e-10)
+    assert_allclose(gu_hcompose(a, b), hcompose(a, b), atol=1e-10)
+    assert_allclose(gu_hinv_compose(a, b), hinv_compose(a, b), atol=1e-10)
+    assert gu_hcompose(a[:, None], b[None]).shape == (5, 5, 6, 4, 4)
+    a32 = a.astype('f4')
+    assert gu_hinv_compose(a32, a32).dtype == np.float32
+
+
+def test_compact_layouts():
+    x = rand_xform((5, 6), cart_sd=10)
+    x34 = hcompact(x)
+    assert x34.shape == (5, 6, 3, 4)
+    assert np.shares_memory(x34, x)
+    qt = hcompact(x, 'qt')
+    assert qt.shape == (5, 6, 7)
+    assert [xform_layout(a) for a in (x, x34, qt)] == ['x44', 'x34', 'qt']
+    assert_allclose(hexpand(x34), x)
+    assert_allclose(hexpand(qt), x, atol=1e-12)
+    assert_allclose(hcompact(qt, 'x34'), x34, atol=1e-12)
+    assert_allclose(hcompact(hcompact(qt, 'x34'), 'qt'), qt, atol=1e-12)
+    assert hexpand(x) is x
+    with pytest.raises(ValueError):
+        xform_layout(np.zeros((5, 4)))
+
+
+def test_compact_ops():
+    a = rand_xform((5, 6), cart_sd=10)
+    b = rand_xform((5, 6), cart_sd=10)
+    p = rand_point((5, 6))
+    for layout in ('x34', 'qt'):
+        ac, bc = hcompact(a, layout), hcompact(b, layout)
+        inv = hinv(ac)
+        assert xform_layout(inv) == layout
+        assert_allclose(hexpand(inv), hinv(a), atol=1e-10)
+        comp = hcompose(ac, bc)
+        assert xform_layout(comp) == layout
+        assert_allclose(hexpand(comp), a @ b, atol=1e-10)
+        icomp = hinv_compose(ac, bc)
+        assert xform_layout(icomp) == layout
+        assert_allclose(hexpand(icomp), hinv(a) @ b, atol=1e-10)
+        assert_allclose(hxform(ac, p), hxform(a, p), atol=1e-10)
+        assert_allclose(hxform(ac, p[..., :3]), hxform(a, p), atol=1e-10)
+    assert_allclose(hcompose(a, hcompact(b)), a @ b, atol=1e-10)
+    with pytest.raises(ValueError):
+        hcompose(a, hcompact(b, 'qt'))
+
+
 def test_hstub():
     sh = (5, 6, 7, 8, 9)
     u = h_rand_points(sh)
@@ -320,6 +569,34 @@ def test_hstub():
     assert is_homog_xform(hstub([1, 2, 3], [5, 6, 4], [9, 7, 8]))
 
 
+@pytest.mark.parametrize('use_numba', [False, 'auto'])
+def test_hstub_batch(use_numba):
+    u, v, w = (rand_point(100) for i in range(3))
+    s = hstub(u, v, w, use_numba=use_numba)
+    assert is_homog_xform(s)
+    assert np.allclose(s[:, :, 3], u)
+    assert np.allclose(hnormalized(s[:, :, 0]), hnormalized(u - v))
+    assert np.allclose(hdot(s[:, :, 2], w - v), 0)
+    assert np.allclose(hstub(u, v, w, cen=w, use_numba=use_numba)[:, :, 3],
+                       w)
+    x = hstub(u[0, :3], v, w[:, :3], use_numba=use_numba)
+    assert x.shape == (100, 4, 4)
+    assert np.allclose(x, hstub(np.tile(u[0], (100, 1)), v, w))
+    coords = np.stack([u, v, w], axis=1).reshape(-1, 4)[:, :3].astype('f4')
+    out = np.empty((100, 3, 4), dtype='f4')
+    x = hstub_idx(coords, stride=3, out=out, use_numba=use_numba)
+    assert x is out and np.allclose(x, s[:, :3], atol=1e-4)
+    idx = np.arange(300).reshape(100, 3)
+    x = hstub_idx(coords, idx[:, [0, 1, 2, 1]], use_numba=use_numba)
+    assert x.dtype == np.float32 and np.allclose(x[:, :, 3], v, atol=1e-5)
+    qt = hstub_idx(coords, idx, layout='qt', use_numba=use_numba)
+    assert np.allclose(quat.qt_to_xform(qt), s, atol=1e-4)
+    for bad in (-1, 300):
+        idx[7, 1] = bad
+        with pytest.raises(IndexError):
+            hstub_idx(coords, idx, use_numba=use_numba)
+
+
 def test_line_line_dist():
     lld = line_line_distance
     assert lld(hray([0, 0, 0], [1, 0, 0]), hray([0, 0, 0], [1, 0, 0])) == 0
@@ -393,6 +670,31 @@ def test_dihedral():
         assert abs(ang - d) < 0.000001
 
 
+@pytest.mark.parametrize('use_numba', [False, 'auto'])
+def test_dihedral_batch(use_numba):
+    p = [rand_point(100) for i in range(4)]
+    a, b, c = (hnormalized(p[i + 1] - p[i]) for i in range(3))
+    ref = np.arctan2(hdot(a, hcross(b, c)), hdot(a, b) * hdot(b, c) -
+                     hdot(a, c))
+    assert np.allclose(dihedral(*p, use_numba=use_numba), ref)
+    p3 = [x[:, :3].astype('f4') for x in p]
+    d = dihedral(*p3, use_numba=use_numba)
+    assert d.dtype == np.float32 and np.allclose(d, ref, atol=1e-4)
+    coords = np.concatenate(p3)
+    idx = np.arange(400).reshape(4, 100).T
+    out = np.empty(100, dtype='f4')
+    d = dihedral(coords, idx, out=out, use_numba=use_numba)
+    assert d is out and np.allclose(d, ref, atol=1e-4)
+    idx = idx.astype('i4').reshape(10, 10, 4)
+    assert np.allclose(
+        dihedral(coords, idx, use_numba=use_numba), ref.reshape(10, 10),
+        atol=1e-4)
+    for bad in (-1, 400):
+        idx[3, 4, 2] = bad
+        with pytest.raises(IndexError):
+            dihedral(coords, idx, use_numba=use_numba)
+
+
 def test_angle():
     assert 0.0001 > abs(angle([1, 0, 0], [0, 1, 0]) - np.pi / 2)
     assert 0.0001 > abs(angle([1, 1, 0], [0, 1, 0]) - np.pi / 4)
@@ -443,6 +745,22 @@ def test_align_vectors_una_case():
     assert np.allclose(x @ ax2, tax2, atol=1e-2)
 
 
+@only_if_numba
+def test_gu_axis_angle_registered():
+    assert util.kernel_registry['gu_axis_angle'] is gu_axis_angle
+    ax, an = axis_angle_of(rand_xform(7)[:, :3, :3], use_numba=True)
+    assert ax.shape == (7, 4)
+
+
+@only_if_numba
+def test_gu_hstub_registered():
+    names = ['gu_hstub', 'gu_hstub_idx']
+    assert util.warmup(*names) == names
+    assert util.kernel_registry['gu_hstub'] is gu_hstub
+    assert util.kernel_registry['gu_hstub_idx'].is_compiled
+    assert not any(k.startswith('_') for k in util.kernel_registry)
+
+
 @only_if_numba
 def test_numba_axis_angle_of():
     x = rand_xform((100, ))
@@ -564,3 +882,148 @@ def test_numba_intersect_planes_rand():
         isect = numba_intersect_planes(plane1, plane2)
         assert np.all(ray_in_plane(plane1, isect))
         assert np.all(ray_in_plane(plane2, isect))
+
+
+def test_sym_nearest_frame():
+    for group, frames in (('T', sym.tetrahedral_frames),
+                          ('O', sym.octahedral_frames),
+                          ('I', sym.icosahedral_frames)):
+        idx, dist = sym.nearest_frame(frames, group, use_numba=False)
+        assert np.all(idx == np.arange(len(frames)))
+        assert np.all(dist < 1e-4)
+        perturb = hrot(rand_unit(len(frames)), 0.05)
+        idx, dist = sym.nearest_frame(frames @ perturb, group,
+                                      use_numba=False, chunksize=7)
+        assert np.all(idx == np.arange(len(frames)))
+        assert_allclose(dist, 0.05, atol=1e-4)
+
+    x = rand_xform((10, 11))
+    assert np.all(sym.nearest_frame(sym.frames('D6'), 'D6')[0] == range(12))
+    idx, dist = sym.nearest_frame(x, 'I', use_numba=False)
+    assert idx.shape == dist.shape == (10, 11)
+    rel = hinv(sym.icosahedral_frames)[:, None, None] @ x
+    bfdist = angle_of(rel)
+    assert np.all(idx == np.argmin(bfdist, axis=0))
+    assert_allclose(dist, np.min(bfdist, axis=0), atol=1e-5)
+    index = sym.frame_index('I')
+    assert np.all(index.quats[:, 0] >= 0)
+    for rot in (x[..., :3, :3], x.astype('f4')):
+        ridx, rdist = index.nearest(rot, use_numba=False)
+        assert np.all(ridx == idx)
+        assert_allclose(rdist, dist, atol=1e-3)
+    ridx, rdist = index.nearest(quat.rot_to_quat(x), quats=True,
+                                use_numba=False)
+    assert np.all(ridx == idx) and np.allclose(rdist, dist)
+    # a (4, 4) stack of quats is not one 4x4 xform
+    q = quat.rot_to_quat(x[0, :4])
+    for use_numba in (False, 'auto'):
+        qidx, qdist = sym.nearest_frame(q, 'I', quats=True,
+                                        use_numba=use_numba)
+        assert qidx.shape == (4, ) and np.all(qidx == idx[0, :4])
+
+
+@only_if_numba
+def test_sym_nearest_frame_numba():
+    x = rand_xform((10, 11))
+    idx, dist = sym.nearest_frame(x, 'O', use_numba=False)
+    nidx, ndist = sym.nearest_frame(x, 'O', use_numba=True)
+    assert np.all(idx == nidx)
+    assert_allclose(dist, ndist, atol=1e-6)
+    fidx, fdist = sym.nearest_frame(quat.rot_to_quat(x), 'O', quats=True)
+    assert np.all(fidx == idx) and fdist.dtype == np.float64
+    fidx, fdist = sym.nearest_frame(x[..., :3, :3].astype('f4'), 'O')
+    assert np.all(fidx == idx) and fdist.dtype == np.float32
+
+
+def test_float32_no_upcast():
+    f4 = np.float32
+    p = np.random.randn(5, 3).astype(f4)
+    assert hpoint(p).dtype == f4
+    assert hvec(p).dtype == f4
+    assert hnormalized(p).dtype == f4
+    assert hray(p, p).dtype == f4
+    assert hstub(p, p + 1, p * 2).dtype == f4
+    assert htrans(p).dtype == f4
+    assert rot(p, np.ones(5, dtype=f4)).dtype == f4
+    assert hrot(p, np.ones(5, dtype=f4)).dtype == f4
+    x = hrot(p, np.ones(5, dtype=f4), p)
+    assert x.dtype == f4
+    assert hinv(x).dtype == f4
+    assert hxform(x, hpoint(p)).dtype == f4
+    assert hcompose(x, x).dtype == f4
+    assert fast_axis_of(x).dtype == f4
+    assert axis_angle_of(x)[0].dtype == f4
+    assert axis_angle_of(x)[1].dtype == f4
+    for f in (rand_point, rand_vec, rand_unit, rand_ray, rand_xform,
+              rand_xform_aac, h_rand_points):
+        assert f((3, ), dtype=f4).dtype == f4
+    assert hpoint([1, 2, 3], dtype=f4).dtype == f4
+    axis = np.array([1, 0, 0], dtype=f4)
+    assert rot(axis, 1.0).dtype == f4
+    assert hrot(axis, np.pi / 2).dtype == f4
+    assert hrot(axis, 90, [1, 2, 3]).dtype == f4
+    assert hrot(axis, np.float64(1.0)).dtype == f4
+    assert hrot([1, 0, 0], np.ones(2, dtype=f4)).dtype == f4
+    assert hpoint([1, 2, 3]).dtype == np.float64
+
+
+def test_default_dtype():
+    try:
+        util.set_default_dtype('f4')
+        assert util.get_default_dtype() == np.float32
+        assert hpoint([1, 2, 3]).dtype == np.float32
+        assert rand_xform(3).dtype == np.float32
+        assert hrot([1, 0, 0], 1).dtype == np.float32
+        assert hrot([1, 0, 0], 1.0, dtype='f8').dtype == np.float64
+        assert hpoint(np.zeros(3)).dtype == np.float64
+    finally:
+        util.set_default_dtype('f8')
+
+
+def test_align_batched():
+    a1, a2, b1, b2 = (rand_vec(500) for i in range(4))
+    x = align_vector(a1, b1)
+    assert x.shape == (500, 4, 4)
+    assert np.allclose(hnormalized(hxform(x, a1)), hnormalized(b1))
+    assert np.allclose(align_vector([1, 0, 0], [-1, 0, 0]) @ [1, 0, 0, 0],
+                       [-1, 0, 0, 0])
+    x = align_around_axis(a1, a2, b2)
+    assert np.allclose(line_angle(a1, hxform(x, a1)), 0, atol=1e-6)
+    x = align_vectors(a1, a2, b1, b2)
+    assert x.shape == (500, 4, 4) and is_homog_xform(x)
+    assert np.allclose(x, align_vectors(a1, a2, b1, b2, method='svd'))
+    # consistent pairs are aligned exactly
+    r = hrot(rand_unit(500), np.random.rand(500) * np.pi, degrees=False)
+    assert np.allclose(align_vectors(a1, a2, hxform(r, a1), hxform(r, a2)),
+                       r)
+    w = np.random.rand(2, 500)
+    x = align_vectors(a1, a2, b1, b2, weights=w)
+    assert np.allclose(x, align_vectors(a1, a2, b1, b2, weights=w,
+                                        method='svd'))
+    # weighted optimum beats the unweighted rotation on the weighted score
+    score = lambda x: (w[0] * hdot(hxform(x, hnormalized(a1)), hnormalized(
+        b1)) + w[1] * hdot(hxform(x, hnormalized(a2)), hnormalized(b2)))
+    assert np.all(score(x) >= score(align_vectors(a1, a2, b1, b2)) - 1e-9)
+
+
+@only_if_numba
+def test_align_kernels():
+    a1, a2, b1, b2 = (rand_vec(500) for i in range(4))
+    w1, w2 = np.random.rand(2, 500)
+    assert np.allclose(gu_align_vector(a1, b1), align_vector(a1, b1))
+    assert np.allclose(gu_align_around_axis(a1, a2, b1),
+                       align_around_axis(a1, a2, b1))
+    assert np.allclose(gu_align_vectors(a1, a2, b1, b2, 1.0, 1.0),
+                       align_vectors(a1, a2, b1, b2))
+    assert np.allclose(gu_align_vectors(a1, a2, b1, b2, w1, w2),
+                       align_vectors(a1, a2, b1, b2, weights=(w1, w2)))
+    x = np.array([1., 0, 0, 0])
+    assert np.allclose(gu_align_vector(x, -x) @ x, -x)
+    assert np.allclose(gu_align_vectors(x, x, -x, -x, 1.0, 1.0) @ x, -x)
+    for v in np.eye(4)[1:3]:
+        assert np.allclose(gu_align_vector(v, -v) @ v, -v)
+    f4 = [v.astype('f4') for v in (a1, a2, b1, b2)]
+    r = gu_align_vectors(*f4, w1.astype('f4'), w2.astype('f4'))
+    assert r.dtype == np.float32
+    assert np.allclose(r, align_vectors(a1, a2, b1, b2, weights=(w1, w2)),
+                       atol=1e-4)
@@ -0,0 +1,66 @@
+import numpy as np
+from numpy.testing import assert_allclose
+import pytest
+import homog
+from homog import io
+
+
+def test_archive_roundtrip(tmpdir):
+    fname = str(tmpdir.join('x.hxf'))
+    x = homog.rand_xform(100)
+    io.save_archive(fname, x, metadata=dict(source='test'))
+    arc = io.load_archive(fname)
+    assert len(arc) == 100
+    assert arc.layout == 'x44' and arc.dtype == np.float64
+    assert arc.metadata == dict(source='test')
+    assert isinstance(arc.array, np.memmap)
+    assert isinstance(arc[10:20], np.memmap)
+    assert_allclose(arc[10:20], x[10:20])
+    assert_allclose(arc.array, x)
+    with pytest.raises(IOError):
+        arc.append(x)
+
+
+@pytest.mark.parametrize('layout', ['x44', 'x34', 'qt'])
+def test_archive_append_layouts(tmpdir, layout):
+    fname = str(tmpdir.join('x.hxf'))
+    x = homog.rand_xform(250, cart_sd=10)
+    with io.XformArchive(fname, 'w', layout=layout, dtype='f4',
+                         chunksize=64) as arc:
+        for lb in range(0, 250, 30):
+            arc.append(x[lb:lb + 30])
+        assert arc.capacity == 256
+    with io.XformArchive(fname, 'a') as arc:
+        arc.append(homog.hcompact(x[:6], 'qt'))
+        assert len(arc) == 256 and arc.capacity == 256
+        arc.append(x[6:7])
+        assert arc.capacity == 320
+    arc = io.load_archive(fname)
+    assert len(arc) == 257
+    assert arc.dtype == np.float32
+    assert arc.record_shape == io.record_shapes[layout]
+    got = homog.hexpand(np.asarray(arc[:]))
+    ref = np.concatenate([x, x[:7]])
+    assert_allclose(got, ref, atol=1e-4)
+    assert sum(len(c) for c in arc.chunks(100)) == 257
+
+
+def test_archive_kernels_on_memmap(tmpdir):
+    fname = str(tmpdir.join('x.hxf'))
+    x = homog.rand_xform(300)
+    io.save_archive(fname, x, chunksize=50)
+    arc = io.load_archive(fname)
+    angs = np.concatenate([a for _, a in arc.map_chunks(homog.axis_angle_of)])
+    assert_allclose(angs, homog.angle_of(x))
+    assert_allclose(homog.hinv(arc[:7]), homog.hinv(x[:7]))
+    out = homog.axis_ang_cen_of_chunked(arc.array, chunksize=64)
+    assert_allclose(out[1], angs)
+
+
+def test_archive_bad_file(tmpdir):
+    fname = str(tmpdir.join('bad'))
+    open(fname, 'wb').write(b'not an archive' * 1000)
+    with pytest.raises(IOError):
+        io.load_archive(fname)
+    with pytest.raises(ValueError):
+        io.XformArchive(str(tmpdir.join('x')), 'w', layout='x33')
@@ -0,0 +1,46 @@
+import numpy as np
+import homog
+from homog import pairs
+from homog.binning import XformBinner
+import pytest
+
+
+@pytest.mark.parametrize('use_numba', [False, 'auto'])
+def test_pair_map(use_numba):
+    a, b = homog.rand_xform(37), homog.rand_xform(23)
+    rel = homog.hinv(a)[:, None] @ b
+    assert np.allclose(pairs.pair_xforms(a, b, use_numba=use_numba), rel)
+    axis, ang = pairs.pair_map(a, b, homog.axis_angle_of, tilesize=10,
+                               nthreads=3, use_numba=use_numba)
+    refaxis, refang = homog.axis_angle_of(rel)
+    assert axis.shape == (37, 23, 4) and ang.shape == (37, 23)
+    assert np.allclose(axis, refaxis) and np.allclose(ang, refang)
+    binner = XformBinner(1, 20)
+    keys = pairs.pair_map(a, b, binner.key, tilesize=8, use_numba=use_numba)
+    assert np.all(keys == binner.key(rel))
+    compact = pairs.pair_map(a[:, :3], b[:, :3], homog.axis_angle_of)
+    assert np.allclose(compact[1], refang)
+
+
+@pytest.mark.parametrize('use_numba', [False, 'auto'])
+def test_pair_hits(use_numba):
+    a = homog.rand_xform(60, cart_sd=3)
+    b = homog.rand_xform(45, cart_sd=3)
+    rel = homog.hinv(a)[:, None] @ b
+    cart, ori = 4, 2
+    ref = ((homog.hnorm(rel[..., :, 3] - [0, 0, 0, 1]) <= cart) &
+           (homog.angle_of(rel) <= ori))
+    i, j = pairs.pair_hits(a, b, pairs.within(cart, ori), tilesize=16,
+                           nthreads=2, use_numba=use_numba)
+    assert 0 < len(i) < ref.size
+    assert np.all(i == np.nonzero(ref)[0]) and np.all(j == np.nonzero(ref)[1])
+
+    def select(rel):
+        ang = homog.angle_of(rel)
+        return ang < 1, ang
+
+    i, j, ang = pairs.pair_hits(a, b, select, tilesize=7)
+    assert np.allclose(ang, homog.angle_of(rel[i, j])) and np.all(ang < 1)
+    assert len(i) == np.sum(homog.angle_of(rel) < 1)
+    i, j = pairs.pair_hits(a[:0], b, pairs.within(1))
+    assert len(i) == len(j) == 0
@@ -0,0 +1,80 @@
+import numpy as np
+from numpy.testing import assert_allclose
+import homog
+from homog import parallel
+import pytest
+
+try:
+    import numba
+    only_if_numba = lambda f: f
+except ImportError:
+    import pytest
+    only_if_numba = pytest.mark.skip
+
+backends = ['threads']
+if parallel.default_backend() == 'numba': backends.append('numba')
+
+
+@pytest.mark.parametrize('backend', backends)
+def test_parallel_axis_angle(backend):
+    x = homog.rand_xform((100, 3))
+    for a, b in zip(homog.axis_angle_of(x),
+                    parallel.axis_angle_of(x, backend=backend)):
+        assert_allclose(a, b, atol=1e-10)
+    x = homog.rand_xform((50, ))
+    for a, b in zip(homog.axis_ang_cen_of(x),
+                    parallel.axis_ang_cen_of(x, backend=backend)):
+        assert_allclose(a, b, atol=1e-6)
+
+
+@pytest.mark.parametrize('backend', backends)
+def test_parallel_quat(backend):
+    x = homog.rand_xform((100, 3))
+    q = parallel.rot_to_quat(x, backend=backend)
+    assert_allclose(q, homog.quat.rot_to_quat(x), atol=1e-10)
+    assert_allclose(parallel.quat_to_xform(q, backend=backend)[..., :3, :3],
+                    x[..., :3, :3], atol=1e-10)
+
+
+@pytest.mark.parametrize('backend', backends)
+def test_parallel_lines_planes(backend):
+    r1, r2 = homog.rand_ray((2, 100, 3))
+    assert_allclose(
+        parallel.line_line_distance(r1, r2, backend=backend),
+        homog.line_line_distance(r1, r2), atol=1e-6)
+    isect, status = parallel.intersect_planes(r1, r2, backend=backend)
+    assert isect.shape == (100, 3, 4, 2)
+    assert np.all(status == 0)
+    assert np.all(homog.ray_in_plane(r1, isect))
+    assert np.all(homog.ray_in_plane(r2, isect))
+
+
+@pytest.mark.parametrize('backend', backends)
+def test_parallel_hxform(backend):
+    x = homog.rand_xform((100, 3))
+    p = homog.rand_point((100, 1))
+    assert_allclose(
+        parallel.hxform(x, p, backend=backend), homog.hxform(x, p))
+
+
+def test_threaded_chunks():
+    x = homog.rand_xform(1000)
+    ref = homog.axis_angle_of(x)
+    res = parallel.threaded(homog.axis_angle_of, x, chunksize=77, nthreads=4)
+    for a, b in zip(ref, res):
+        assert_allclose(a, b)
+    r1, r2 = homog.rand_ray((2, 1000))
+    assert_allclose(
+        parallel.threaded(homog.line_line_distance, r1, r2[:1], chunksize=77,
+                          nthreads=3), homog.line_line_distance(r1, r2[:1]))
+
+
+def test_set_num_threads():
+    n = parallel.get_num_threads()
+    try:
+        parallel.set_num_threads(3)
+        assert parallel.get_num_threads() == 3
+    finally:
+        parallel.set_num_threads(n)
+    with pytest.raises(ValueError):
+        parallel.axis_angle_of(homog.rand_xform(3), backend='gpu')
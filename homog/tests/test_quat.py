@@ -114,3 +114,147 @@ def test_rot_quat_conversion_cases():
     q = xform_to_quat(x)
     assert np.all(is_valid_quat_rot(q))
     assert np.allclose(cases, q)
+
+
+def test_quat_float32_no_upcast():
+    x = homog.rand_xform((5, 6), dtype='f4')
+    assert x.dtype == np.float32
+    q = rot_to_quat(x)
+    assert q.dtype == np.float32
+    assert quat_to_xform(q).dtype == np.float32
+    assert quat_to_rot(q).dtype == np.float32
+    assert quat_multiply(q, q).dtype == np.float32
+    assert rand_quat(3, dtype='f4').dtype == np.float32
+    assert np.allclose(quat_to_rot(q), x[..., :3, :3], atol=1e-5)
+
+
+@only_if_numba
+def test_gu_float32_no_upcast():
+    x = homog.rand_xform((5, 6), dtype='f4')
+    q = gu_rot_to_quat(x)
+    assert q.dtype == np.float32
+    assert gu_quat_multiply(q, q).dtype == np.float32
+    assert np.allclose(gu_quat_multiply(q, q), quat_multiply(q, q),
+                       atol=1e-6)
+
+
+def test_quat_rotate():
+    q = rand_quat((5, 6))
+    v = homog.rand_vec((5, 6))
+    p = homog.rand_point((5, 6))
+    x = quat_to_xform(q)
+    assert np.allclose(quat_rotate(q, v), homog.hxform(x, v))
+    assert np.allclose(quat_rotate(q, p), homog.hxform(x, p))
+    assert np.allclose(quat_rotate(q, p[..., :3]), homog.hxform(x, p)[..., :3])
+    assert np.allclose(quat_to_rot(quat_multiply(q, q[:, ::-1])),
+                       quat_to_rot(q) @ quat_to_rot(q[:, ::-1]))
+
+
+def test_rot_to_quat_all_cases_out():
+    # 180 degree rotations about each axis hit every trace case
+    x = np.concatenate([
+        homog.hrot(np.eye(3), np.pi),
+        homog.hrot(homog.rand_unit(100), np.random.rand(100) * np.pi),
+        homog.hrot(homog.rand_unit(100), np.pi - np.random.rand(100) * 0.1),
+    ])
+    out = np.empty(x.shape[:-2] + (4, ))
+    q = rot_to_quat(x, out=out)
+    assert q is out
+    assert np.allclose(quat_to_rot(q), x[..., :3, :3])
+    assert np.all(q[..., 0] >= 0)
+    assert np.allclose(rot_to_quat(x[..., :3, :3]), q)
+
+
+@only_if_numba
+def test_rot_to_quat_matches_kernel():
+    x = np.concatenate([
+        homog.hrot(np.eye(3), np.pi),
+        homog.hrot(homog.rand_unit(1000), np.random.rand(1000) * np.pi),
+    ])
+    assert np.allclose(rot_to_quat(x), gu_rot_to_quat(x))
+
+
+def test_quat_inv_log_exp_power():
+    q = rand_quat(100)
+    ident = np.array([1, 0, 0, 0])
+    assert np.allclose(quat_multiply(q, quat_conj(q)), ident)
+    q2 = 3 * q
+    assert np.allclose(quat_multiply(q2, quat_inv(q2)), ident)
+    assert np.allclose(quat_exp(quat_log(q2)), q2)
+    assert np.allclose(quat_exp(quat_log(ident)), ident)
+    assert np.allclose(quat_power(q, 2), quat_multiply(q, q))
+    half = quat_power(q, 0.5)
+    assert np.allclose(quat_multiply(half, half), q)
+    # half the rotation vector
+    axis, ang = homog.axis_angle_of(quat_to_xform(q))
+    assert np.allclose(quat_log(q)[..., 1:],
+                       axis[..., :3] * ang[..., None] / 2)
+
+
+def test_quat_slerp():
+    q0, q1 = rand_quat(100), rand_quat(100)
+    assert np.allclose(quat_slerp(q0, q1, 0), q0)
+    assert np.allclose(quat_to_rot(quat_slerp(q0, q1, 1)), quat_to_rot(q1))
+    mid = quat_slerp(q0, q1, 0.5)
+    d0 = np.abs(np.sum(mid * q0, axis=-1))
+    d1 = np.abs(np.sum(mid * q1, axis=-1))
+    assert np.allclose(d0, d1)
+    # slerp is q0 (q0^-1 q1)^t
+    q1 = np.where(np.sum(q0 * q1, axis=-1)[:, None] < 0, -q1, q1)
+    t = np.random.rand(100)
+    rel = quat_multiply(quat_conj(q0), q1)
+    assert np.allclose(
+        quat_slerp(q0, q1, t), quat_multiply(q0, quat_power(rel, t)))
+    # broadcast a trajectory over t
+    traj = quat_slerp(q0[0], q1[0], np.linspace(0, 1, 11))
+    assert traj.shape == (11, 4)
+    assert np.allclose(quat_slerp(q0, q0, 0.3), q0)
+    nl = quat_nlerp(q0, q1, t)
+    assert np.allclose(np.linalg.norm(nl, axis=-1), 1)
+
+
+@only_if_numba
+def test_quat_engine_kernels():
+    q0, q1 = rand_quat(100), rand_quat(100)
+    t = np.random.rand(100)
+    v = homog.rand_point(100)
+    assert np.allclose(gu_quat_conj(q0), quat_conj(q0))
+    assert np.allclose(gu_quat_inv(2 * q0), quat_inv(2 * q0))
+    assert np.allclose(gu_quat_log(q0), quat_log(q0))
+    assert np.allclose(gu_quat_exp(q0), quat_exp(q0))
+    inplace = q0.copy()
+    assert gu_quat_exp(inplace, out=inplace) is inplace
+    assert np.allclose(inplace, quat_exp(q0))
+    assert np.allclose(gu_quat_power(q0, t), quat_power(q0, t))
+    assert np.allclose(gu_quat_slerp(q0, q1, t), quat_slerp(q0, q1, t))
+    assert np.allclose(gu_quat_rotate(q0, v), quat_rotate(q0, v))
+    q32, v32 = q0.astype('f4'), v.astype('f4')
+    assert gu_quat_rotate(q32, v32).dtype == np.float32
+    assert np.allclose(gu_quat_rotate(q32, v32), quat_rotate(q0, v),
+                       atol=1e-5)
+
+
+@pytest.mark.parametrize('use_numba', [False, 'auto'])
+def test_quat_multiply_out_prod_cumprod(use_numba):
+    q, r = rand_quat((7, 5)), rand_quat(5)
+    ref = quat_to_rot(q) @ quat_to_rot(r)
+    assert np.allclose(quat_to_rot(quat_multiply(q, r, use_numba=use_numba)),
+                       ref)
+    out = q.copy()
+    assert quat_multiply(out, r, out=out, use_numba=use_numba) is out
+    assert np.allclose(quat_to_rot(out), ref)
+
+    chain = rand_quat((9, 3))
+    rots = quat_to_rot(chain)
+    cum = quat_cumprod(chain, use_numba=use_numba)
+    acc = rots[0]
+    for i in range(9):
+        if i: acc = acc @ rots[i]
+        assert np.allclose(quat_to_rot(cum[i]), acc)
+    assert np.allclose(quat_prod(chain, use_numba=use_numba), cum[-1])
+    assert np.allclose(
+        quat_prod(chain.swapaxes(0, 1), axis=1, use_numba=use_numba), cum[-1])
+    inplace = chain.swapaxes(0, 1).copy()
+    quat_cumprod(inplace, axis=1, out=inplace, use_numba=use_numba)
+    assert np.allclose(inplace.swapaxes(0, 1), cum)
+    assert np.allclose(quat_prod(chain[:0], use_numba=use_numba), [1, 0, 0, 0])
@@ -0,0 +1,68 @@
+import numpy as np
+import homog
+from homog import sample
+
+
+def test_uniform_quat_reproducible_uniform():
+    q = sample.uniform_quat(100000, rng=7)
+    assert np.allclose(q, sample.uniform_quat(100000, rng=7))
+    assert np.allclose(np.linalg.norm(q, axis=-1), 1)
+    assert np.all(q[..., 0] >= 0)
+    rots = homog.quat.quat_to_rot(q)
+    assert np.allclose(np.mean(rots, axis=0), 0, atol=0.01)
+    # mean rotation angle over SO(3) is pi/2 + 2/pi
+    ang = 2 * np.arccos(np.minimum(q[..., 0], 1))
+    assert abs(np.mean(ang) - np.pi / 2 - 2 / np.pi) < 0.01
+    q4 = sample.uniform_quat((3, 4), rng=0, dtype='f4')
+    assert q4.shape == (3, 4, 4) and q4.dtype == np.float32
+
+
+def test_rand_xform_aac_uniform_angle():
+    x = homog.rand_xform_aac(100000, rng=np.random.default_rng(1))
+    assert homog.is_homog_xform(x)
+    ang = homog.angle_of(x)
+    assert abs(np.mean(ang) - np.pi / 2 - 2 / np.pi) < 0.01
+    assert np.allclose(homog.rand_xform(10, rng=3),
+                       homog.rand_xform(10, rng=3))
+
+
+def test_uniform_xform_layouts():
+    x = sample.uniform_xform(1000, rng=0, cart_sd=3, cart_cen=(1, 2, 3))
+    assert homog.is_homog_xform(x)
+    assert np.allclose(np.mean(x[:, :3, 3], axis=0), [1, 2, 3], atol=0.5)
+    assert 2.5 < np.std(x[:, :3, 3]) < 3.5
+    box = sample.uniform_xform(1000, rng=0, cart_box=2, layout='x34')
+    assert box.shape == (1000, 3, 4)
+    assert np.all(np.abs(box[..., 3]) <= 2)
+    qt = sample.uniform_xform(1000, rng=0, layout='qt', dtype='f4')
+    assert qt.shape == (1000, 7) and qt.dtype == np.float32
+    assert homog.is_homog_xform(homog.hexpand(qt))
+
+
+def test_perturb():
+    base = homog.rand_xform()
+    x = sample.perturb(base, 10000, rng=0, ang_sd=0.05, cart_sd=0.2)
+    assert x.shape == (10000, 4, 4)
+    assert homog.is_homog_xform(x)
+    delta = homog.hinv_compose(base, x)
+    assert np.allclose(np.std(delta[:, :3, 3], axis=0), 0.2, atol=0.02)
+    # rotation vector components have sdev ang_sd, its norm is chi(3)
+    ang = homog.angle_of(delta)
+    assert abs(np.mean(ang) - 0.05 * np.sqrt(8 / np.pi)) < 0.002
+    x = sample.perturb(homog.rand_xform(5), rng=0)
+    assert x.shape == (5, 4, 4)
+
+
+def test_sample_chunks_and_spawn():
+    rngs = sample.spawn_rngs(0, 3)
+    a, b = (sample.uniform_quat(10, rng=r) for r in rngs[:2])
+    assert not np.allclose(a, b)
+    assert np.allclose(a, sample.uniform_quat(10, sample.spawn_rngs(0, 3)[0]))
+    chunks = list(
+        c.copy() for c in sample.sample_chunks(1000, 300, rng=1, cart_sd=2))
+    assert [len(c) for c in chunks] == [300, 300, 300, 100]
+    assert homog.is_homog_xform(np.concatenate(chunks))
+    bufs = [c for c in sample.sample_chunks(1000, 300, rng=1)]
+    assert all(np.may_share_memory(b, bufs[0]) for b in bufs)
+    qs = sample.sample_chunks(10, 4, sampler=sample.uniform_quat, rng=2)
+    assert sum(len(q) for q in qs) == 10
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import homog
+from homog import spatial
+
+try:
+    import numba
+    only_if_numba = lambda f: f
+except ImportError:
+    only_if_numba = pytest.mark.skip
+
+
+def _rays(n, rng):
+    return homog.hray(rng.normal(size=(n, 3)) * 20, rng.normal(size=(n, 3)))
+
+
+def _brute(rays1, rays2, cutoff, bound):
+    r1, r2 = rays1[:, None], rays2[None]
+    dist = homog.line_line_distance(r1, r2)
+    ok = dist <= cutoff
+    if bound is not None:
+        args = np.broadcast_arrays(r1[..., 0], r1[..., 1], r2[..., 0],
+                                   r2[..., 1])
+        mid = spatial._closest_mid(*args, homog.hpoint([0, 0, 0]))
+        ok &= homog.hnorm(mid) <= bound
+    return ok, dist
+
+
+@pytest.mark.parametrize('use_numba', [False, 'auto'])
+@pytest.mark.parametrize('bound', [30, None])
+def test_ray_index_matches_brute_force(use_numba, bound):
+    rng = np.random.default_rng(0)
+    rays1, rays2 = _rays(400, rng), _rays(300, rng)
+    rays2[:10] = rays1[:10]  # some exact and parallel pairs
+    rays2[10:20, :3, 0] += 0.1
+    ok, dist = _brute(rays1, rays2, 0.5, bound)
+    index = spatial.RayIndex(rays2, cutoff=0.5, bound=bound)
+    i, j, d = index.query(rays1, use_numba=use_numba)
+    assert np.all(ok[i, j])
+    assert len(i) == np.sum(ok)
+    assert np.allclose(d, dist[i, j])
+    assert np.all(np.diff(i * len(rays2) + j) > 0)
+
+
+@pytest.mark.parametrize('use_numba', [False, 'auto'])
+def test_ray_pairs_within_self(use_numba):
+    rng = np.random.default_rng(1)
+    rays = _rays(500, rng)
+    ok, dist = _brute(rays, rays, 0.3, 25)
+    ok = np.triu(ok, 1)
+    i, j, d = spatial.ray_pairs_within(rays, cutoff=0.3, bound=25,
+                                       use_numba=use_numba)
+    assert np.all(i < j)
+    assert len(i) == np.sum(ok) and np.all(ok[i, j])
+    with pytest.raises(ValueError):
+        spatial.RayIndex(rays, cutoff=1, bound=10, cellsize=1)
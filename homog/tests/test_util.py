@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+import numpy as np
+from homog import util
+import pytest
+
+try:
+    import numba
+    only_if_numba = lambda f: f
+except ImportError:
+    only_if_numba = pytest.mark.skip
+
+
+def kernel_test_add_one(a, out):
+    for i in range(len(a)):
+        out[i] = a[i] + 1
+
+
+@pytest.fixture
+def gu_add_one():
+    # guvec registers globally, keep the test kernel out of other tests
+    yield util.guvec([(util.float64[:], util.float64[:])], '(n)->(n)',
+                     kernel_test_add_one)
+    util.kernel_registry.pop('gu_test_add_one', None)
+
+
+@only_if_numba
+def test_guvec_is_lazy(gu_add_one):
+    gu = gu_add_one
+    assert gu.name == 'gu_test_add_one'
+    assert util.kernel_registry['gu_test_add_one'] is gu
+    assert not gu.is_compiled
+    assert np.all(gu(np.arange(3.0)) == [1, 2, 3])
+    assert gu.is_compiled
+
+
+@only_if_numba
+def test_warmup(gu_add_one):
+    gu = gu_add_one
+    assert not gu.is_compiled
+    assert util.warmup('gu_test_add_one') == ['gu_test_add_one']
+    assert gu.is_compiled
+    assert 'gu_rot_to_quat' in util.kernel_registry
+    util.warmup(util.kernel_registry['gu_quat_multiply'])
+    assert util.kernel_registry['gu_quat_multiply'].is_compiled
+
+
+@only_if_numba
+def test_cache_dir_local_to_homog(tmpdir):
+    # fresh process, the locator is installed at import
+    code = ('import numba, homog; homog.util.warmup("gu_quat_conj"); '
+            'print(repr(numba.config.CACHE_DIR))')
+    env = dict(os.environ, HOMOG_CACHE_DIR=str(tmpdir))
+    env.pop('NUMBA_CACHE_DIR', None)
+    root = os.path.dirname(os.path.dirname(util.__file__))
+    res = subprocess.run([sys.executable, '-c', code], env=env, cwd=root,
+                         capture_output=True, text=True, check=True)
+    assert res.stdout.strip() == "''"
+    assert any('kernel_quat_conj' in f for _, _, files in os.walk(tmpdir)
+               for f in files)
@@ -0,0 +1,69 @@
+import numpy as np
+import homog
+from homog import validate
+import pytest
+
+
+def _drift(x, scale, seed=0):
+    x = x.copy()
+    noise = np.random.default_rng(seed).standard_normal(x[..., :3, :3].shape)
+    x[..., :3, :3] += scale * noise
+    return x
+
+
+@pytest.mark.parametrize('use_numba', [False, 'auto'])
+def test_check_xforms(use_numba):
+    x = homog.rand_xform((10, 20))
+    rep = validate.check_xforms(x, use_numba=use_numba)
+    assert rep and rep.mask.shape == (10, 20) and rep.max_error < 1e-12
+    x[3, 4, :3, :3] *= 1.01
+    x[5, 6, 0] *= -1  # reflection
+    x[7, 8, 3, 0] = 1e-3
+    rep = validate.check_xforms(x, use_numba=use_numba)
+    assert not rep and not homog.is_homog_xform(x)
+    assert np.all(rep.bad == [64, 106, 148])
+    assert np.isclose(rep.max_error, 2)
+    assert np.allclose(rep.error, homog.xform_error(x, use_numba=False))
+    assert validate.check_xforms(x[..., :3, :], use_numba=use_numba).bad[0] \
+        == 64
+    assert validate.check_xforms(x, atol=3).ok
+
+
+def test_check_sampled():
+    x = homog.rand_xform(1000)
+    x[::2, 0, 0] += 0.1
+    rep = validate.check_xforms(x, sample=50, rng=1)
+    assert rep.error.shape == (50, ) and len(rep.index) == 50
+    assert np.all(rep.mask == (rep.index % 2 == 1))
+    assert np.all(rep.bad % 2 == 0) and not rep
+    assert validate.check_xforms(x[1::2].reshape(20, 25, 4, 4), sample=10)
+    r = homog.rand_ray(100)
+    assert validate.check_rays(r) and validate.check_rays(r, sample=5)
+    r[7, :3, 1] *= 2
+    assert validate.check_rays(r).bad[0] == 7 and not homog.is_valid_rays(r)
+    q = homog.quat.rand_quat(100)
+    assert validate.check_quats(q, sample=10)
+    q[3] *= 1.1
+    assert np.all(validate.check_quats(q).bad == [3])
+    with pytest.raises(ValueError):
+        validate.check_quats(q[:, :3])
+
+
+@pytest.mark.parametrize('use_numba', [False, 'auto'])
+def test_orthonormalize(use_numba):
+    x = homog.rand_xform(100)
+    y = _drift(x, 1e-3)
+    assert not homog.is_homog_xform(y)
+    z = validate.orthonormalize(y, use_numba=use_numba)
+    assert homog.is_homog_xform(z) and np.max(homog.xform_error(z)) < 1e-12
+    assert np.allclose(z, x, atol=1e-2)
+    assert np.allclose(z[:, :3, 3], y[:, :3, 3])
+    svd = validate.orthonormalize(y, method='svd')
+    assert np.allclose(z, svd)
+    validate.orthonormalize(y[:, :3], out=y[:, :3], use_numba=use_numba)
+    assert np.allclose(y, z)
+    qt = homog.hcompact(x, 'qt') * 1.01
+    assert validate.check_quats(
+        validate.orthonormalize(qt)[:, :4]).max_error < 1e-12
+    with pytest.raises(ValueError):
+        validate.orthonormalize(y, method='foo')
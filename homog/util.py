@@ -1,20 +1,139 @@
+import numpy as np
+
+_default_dtype = np.dtype('f8')
+
+
+def set_default_dtype(dtype):
+    """float dtype used by constructors when it can't be taken from inputs"""
+    global _default_dtype
+    _default_dtype = np.dtype(dtype)
+
+
+def get_default_dtype():
+    return _default_dtype
+
+
+def resolve_dtype(dtype, *arrays):
+    """explicit dtype, else common float dtype of arrays, else the default.
+    0-d arrays, e.g. from python scalars, only count if nothing else is float,
+    so an f4 axis with a scalar angle stays f4"""
+    if dtype is not None: return np.dtype(dtype)
+    floats = [a for a in arrays if np.issubdtype(a.dtype, np.floating)]
+    floats = [a for a in floats if a.ndim] or floats
+    return (np.result_type(*[a.dtype for a in floats])
+            if floats else _default_dtype)
+
+
+def as_rng(rng):
+    """np.random.Generator from a seed, SeedSequence or Generator, or the
+    global np.random state if rng is None. Call once per sampler and pass
+    the result down, an int seed would otherwise restart the stream"""
+    if rng is None or rng is np.random: return np.random
+    return np.random.default_rng(rng)
+
+
 try:
     import os
     if 'NUMBA_DISABLE_JIT' in os.environ:
         raise ImportError
     import numba
+    from numba.core import caching
     from numba.types import float64, float32, int64, int32
-    jit = numba.njit(nogil=True, fastmath=True)
 
-    def guvec(sigs, layout, func):
-        return numba.guvectorize(
-            sigs, layout, nopython=True, fastmath=True)(func)  # nogil not supported
+    # compiled kernels are persisted here (numba's default location if unset)
+    cache_dir = os.environ.get('HOMOG_CACHE_DIR') or numba.config.CACHE_DIR
+    _homog_dir = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+    class _HomogCacheLocator(caching.UserProvidedCacheLocator):
+        """HOMOG_CACHE_DIR for kernels defined in homog only, other numba
+        users in the process keep numba.config.CACHE_DIR"""
+
+        def __init__(self, py_func, py_file):
+            self._py_file = py_file
+            self._lineno = py_func.__code__.co_firstlineno
+            self._cache_path = os.path.join(
+                os.path.expanduser(cache_dir),
+                self.get_suitable_cache_subpath(py_file))
+
+        @classmethod
+        def from_function(cls, py_func, py_file):
+            if not os.path.abspath(py_file).startswith(_homog_dir): return
+            parent = super(caching.UserProvidedCacheLocator, cls)
+            return parent.from_function(py_func, py_file)
+
+    if os.environ.get('HOMOG_CACHE_DIR'):
+        caching.CacheImpl._locator_classes.insert(0, _HomogCacheLocator)
+
+    jit = numba.njit(nogil=True, fastmath=True, cache=True)
+    jit_parallel = numba.njit(
+        nogil=True, fastmath=True, cache=True, parallel=True)
+    prange = numba.prange
+
+    class LazyGufunc:
+        """numba gufunc compiled on first call or by warmup(), not at import"""
+
+        def __init__(self, sigs, layout, func, name=None):
+            self.sigs, self.layout = sigs, layout
+            self.func = getattr(func, 'py_func', func)
+            self.name = name or self.func.__name__.replace('kernel_', 'gu_', 1)
+            self._gufunc = None
+
+        @property
+        def is_compiled(self):
+            return self._gufunc is not None
+
+        @property
+        def gufunc(self):
+            if self._gufunc is None:
+                self._gufunc = numba.guvectorize(
+                    self.sigs, self.layout, nopython=True, fastmath=True,
+                    cache=True)(self.func)  # nogil not supported
+            return self._gufunc
+
+        def __call__(self, *args, **kw):
+            return self.gufunc(*args, **kw)
+
+        def __getattr__(self, name):
+            if name.startswith('_'): raise AttributeError(name)
+            return getattr(self.gufunc, name)
+
+        def __repr__(self):
+            state = 'compiled' if self.is_compiled else 'lazy'
+            return '<LazyGufunc %s %s %s>' % (self.name, self.layout, state)
+
+    kernel_registry = dict()
+
+    def guvec(sigs, layout, func, name=None):
+        """lazy gufunc of kernel func, registered as name, by default func's
+        name with kernel_ replaced by gu_"""
+        lazy = LazyGufunc(sigs, layout, func, name)
+        kernel_registry[lazy.name] = lazy
+        return lazy
+
+    def warmup(*kernels):
+        """compile registered gufuncs (all of them if none given)
+
+        kernels may be registry names like 'gu_rot_to_quat' or the gufunc
+        objects themselves. Call in a parent process before forking workers so
+        they inherit compiled code; results are also cached in cache_dir"""
+        import homog  # make sure all kernel modules are registered
+        if not kernels: kernels = list(kernel_registry.values())
+        for k in kernels:
+            k = kernel_registry[k] if isinstance(k, str) else k
+            k.gufunc
+        return [k if isinstance(k, str) else k.name for k in kernels]
 
 except ImportError:
-    import numpy
     # dummy
-    float64 = float32 = int64 = int32 = numpy.empty((1, 1, 1, 1, 1, 1, 1))
+    float64 = float32 = int64 = int32 = np.empty((1, 1, 1, 1, 1, 1, 1))
     jit = lambda f: None
+    jit_parallel = lambda f: None
+    prange = range
+    cache_dir = None
+    kernel_registry = dict()
 
-    def guvec(sigs, layout, func):
+    def guvec(sigs, layout, func, name=None):
         return None
+
+    def warmup(*kernels):
+        return []
@@ -0,0 +1,142 @@
+"""validation reports for xforms, rays and quats, and repair of drifted xforms
+
+check_xforms / check_rays / check_quats report the per element error (see
+homog.xform_error, homog.ray_error, quat.quat_error) and a mask of the
+elements within atol. With sample=k only k random elements are checked, in
+O(k) whatever the size of the input, cheap enough to leave on in production.
+orthonormalize projects xforms that drifted through long chains of
+compositions back onto rigid motions."""
+
+import numpy as np
+from homog import homog as hm
+from homog import quat
+from homog.util import jit, guvec, float32, float64, int64, resolve_dtype
+
+
+class ValidationReport:
+    """result of a check: ok, the per element mask and error, max_error and
+    index, the flat indices of the checked elements if sampled (else None).
+    True if ok"""
+
+    def __init__(self, error, atol, index=None):
+        self.error, self.atol, self.index = error, atol, index
+        self.mask = error <= atol
+        self.ok = bool(np.all(self.mask))
+        self.max_error = float(np.max(error)) if error.size else 0.0
+
+    def __bool__(self):
+        return self.ok
+
+    @property
+    def bad(self):
+        """flat indices of the elements outside atol"""
+        bad = np.flatnonzero(~self.mask)
+        return bad if self.index is None else self.index[bad]
+
+    def __repr__(self):
+        n = self.error.size
+        return 'ValidationReport(ok=%s, %i of %i bad, max_error=%g)' % (
+            self.ok, n - np.sum(self.mask), n, self.max_error)
+
+
+def check_xforms(xforms, atol=1e-5, sample=None, rng=None, use_numba='auto'):
+    """report on (..., 4, 4) or (..., 3, 4) xforms, see hm.xform_error"""
+    xforms = np.asarray(xforms)
+    return _check(
+        lambda x: hm.xform_error(x, use_numba=use_numba), xforms,
+        xforms.shape[-2:], atol, sample, rng)
+
+
+def check_rays(rays, atol=1e-6, sample=None, rng=None):
+    """report on (..., 4, 2) rays, see hm.ray_error"""
+    return _check(hm.ray_error, np.asarray(rays), (4, 2), atol, sample, rng)
+
+
+def check_quats(quats, atol=1e-5, sample=None, rng=None):
+    """report on (..., 4) quats, see quat.quat_error"""
+    return _check(quat.quat_error, np.asarray(quats), (4, ), atol, sample,
+                  rng)
+
+
+def _check(error, x, tail, atol, sample, rng):
+    if x.shape[x.ndim - len(tail):] != tuple(tail):
+        raise ValueError('bad shape %s for elements %s' % (x.shape, tail))
+    n = int(np.prod(x.shape[:x.ndim - len(tail)]))
+    if sample is None or sample >= n:
+        return ValidationReport(error(x), atol)
+    index = np.random.default_rng(rng).integers(0, n, sample)
+    # unravel so only the sampled elements are gathered, no flat copy
+    elems = x[np.unravel_index(index, x.shape[:x.ndim - len(tail)])]
+    return ValidationReport(error(elems), atol, index)
+
+
+def orthonormalize(xforms, out=None, iters=4, method='bjorck',
+                   use_numba='auto'):
+    """nearest rigid xforms to nearly rigid (..., 4, 4), (..., 3, 4) or qt
+    (..., 7) xforms, translations kept
+
+    method 'bjorck' iterates R <- R (3 I - R^T R) / 2, converging
+    quadratically to the orthonormal polar factor for drift well below 1;
+    'svd' is exact for any nonsingular R but much slower. qt xforms just
+    get their quats normalized"""
+    xforms = np.asarray(xforms)
+    dtype = resolve_dtype(None, xforms) if out is None else out.dtype
+    if hm.xform_layout(xforms) == 'qt':
+        if out is None: out = xforms.astype(dtype)
+        elif out is not xforms: out[...] = xforms
+        out[..., :4] /= np.linalg.norm(out[..., :4], axis=-1)[..., None]
+        return out
+    if out is None: out = np.empty(xforms.shape, dtype=dtype)
+    if method not in ('bjorck', 'svd'):
+        raise ValueError('unknown method: ' + str(method))
+    if use_numba == 'auto': use_numba = gu_orthonormalize is not None
+    if method == 'bjorck' and use_numba:
+        return gu_orthonormalize(xforms.astype(out.dtype, copy=False), iters,
+                                 out=out)
+    rot = xforms[..., :3, :3]
+    if method == 'svd':
+        u, s, vt = np.linalg.svd(rot)
+        # flip the last singular vector of reflections
+        u[..., :, 2] *= np.sign(np.linalg.det(np.matmul(u, vt)))[..., None]
+        rot = np.matmul(u, vt)
+    else:
+        for i in range(iters):
+            rtr = np.matmul(rot.swapaxes(-1, -2), rot)
+            rot = 1.5 * rot - 0.5 * np.matmul(rot, rtr)
+    out[..., :3, 3] = xforms[..., :3, 3]
+    out[..., :3, :3] = rot
+    if out.shape[-2] == 4:
+        out[..., 3, :3] = 0
+        out[..., 3, 3] = 1
+    return out
+
+
+@jit
+def kernel_orthonormalize(xform, iters, out):
+    rot = np.empty((3, 3), dtype=out.dtype)
+    rtr = np.empty((3, 3), dtype=out.dtype)
+    for i in range(3):
+        for j in range(3):
+            rot[i, j] = xform[i, j]
+    for it in range(iters):
+        for i in range(3):
+            for j in range(3):
+                rtr[i, j] = (rot[0, i] * rot[0, j] + rot[1, i] * rot[1, j] +
+                             rot[2, i] * rot[2, j])
+        for i in range(3):
+            r0, r1, r2 = rot[i, 0], rot[i, 1], rot[i, 2]
+            for j in range(3):
+                rot[i, j] = 1.5 * rot[i, j] - 0.5 * (
+                    r0 * rtr[0, j] + r1 * rtr[1, j] + r2 * rtr[2, j])
+    for i in range(3):
+        for j in range(3):
+            out[i, j] = rot[i, j]
+        out[i, 3] = xform[i, 3]
+    if out.shape[0] == 4:
+        out[3, 0], out[3, 1], out[3, 2], out[3, 3] = 0, 0, 0, 1
+
+
+gu_orthonormalize = guvec([
+    (float64[:, :], int64, float64[:, :]),
+    (float32[:, :], int64, float32[:, :]),
+], '(n,m),()->(n,m)', kernel_orthonormalize)